@@ -9,7 +9,13 @@ from io import BytesIO
 import json
 
 # Agregar el directorio padre al path
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, AGENT_DIR)
+
+# Módulos compartidos de la Lambda de embeddings (`lib.*`), al final del path
+# para no tapar los módulos del agente
+EMBEDDINGS_LAMBDA_DIR = os.path.join(os.path.dirname(AGENT_DIR), "rag_lmbd_embeddings")
+sys.path.append(EMBEDDINGS_LAMBDA_DIR)
 
 
 # =============================================================================
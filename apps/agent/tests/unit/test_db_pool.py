@@ -0,0 +1,195 @@
+"""
+Tests unitarios para lib/db_pool.py (Lambdas de embeddings y query)
+"""
+import pytest
+import psycopg2
+from psycopg2 import extensions
+from unittest.mock import MagicMock
+
+
+class FakeClock:
+    """Reloj controlable para los tiempos de inactividad y vida del pool."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_raw_connection():
+    """Conexión psycopg2 simulada, abierta y sin transacción."""
+    raw = MagicMock()
+    raw.closed = 0
+    raw.get_transaction_status.return_value = extensions.TRANSACTION_STATUS_IDLE
+    return raw
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def connect():
+    """Factory de conexiones: cada llamada devuelve una conexión nueva."""
+    return MagicMock(side_effect=lambda **kwargs: make_raw_connection())
+
+
+@pytest.fixture
+def pool(connect, clock):
+    from lib.db_pool import ConnectionPool
+    return ConnectionPool({"dbname": "test"}, max_idle=2, health_check_after=30, connect=connect, clock=clock)
+
+
+class TestConnectionPool:
+    """Tests para ConnectionPool."""
+
+    def test_closed_connection_is_reused(self, pool, connect):
+        """Verifica que close() devuelve la conexión al pool y se reutiliza."""
+        first = pool.getconn()
+        raw = first.raw
+        first.close()
+
+        second = pool.getconn()
+
+        assert second.raw is raw
+        assert connect.call_count == 1
+        raw.close.assert_not_called()
+        assert pool.stats()["reuses"] == 1
+
+    def test_connect_kwargs_are_passed(self, pool, connect):
+        """Verifica que la conexión se abre con la configuración del pool."""
+        pool.getconn()
+
+        connect.assert_called_once_with(dbname="test")
+
+    def test_on_connect_runs_once_per_physical_connection(self, connect, clock):
+        """Verifica que on_connect (p. ej. register_vector) se ejecuta una vez por conexión."""
+        from lib.db_pool import ConnectionPool
+        on_connect = MagicMock()
+        pool = ConnectionPool({}, connect=connect, clock=clock, on_connect=on_connect)
+
+        for _ in range(3):
+            pool.getconn().close()
+
+        on_connect.assert_called_once()
+
+    def test_open_transaction_is_rolled_back_on_release(self, pool):
+        """Verifica que una transacción abierta se descarta al devolver la conexión."""
+        conn = pool.getconn()
+        raw = conn.raw
+        raw.get_transaction_status.return_value = extensions.TRANSACTION_STATUS_INTRANS
+
+        conn.close()
+
+        raw.rollback.assert_called_once()
+        assert pool.stats()["idle"] == 1
+
+    def test_connection_in_unknown_state_is_discarded(self, pool):
+        """Verifica que una conexión en estado desconocido no vuelve al pool."""
+        conn = pool.getconn()
+        raw = conn.raw
+        raw.get_transaction_status.return_value = extensions.TRANSACTION_STATUS_UNKNOWN
+
+        conn.close()
+
+        raw.close.assert_called_once()
+        assert pool.stats()["idle"] == 0
+
+    def test_closed_raw_connection_is_replaced(self, pool, connect):
+        """Verifica que una conexión cerrada por el servidor se reemplaza transparentemente."""
+        conn = pool.getconn()
+        raw = conn.raw
+        conn.close()
+        raw.closed = 1
+
+        replacement = pool.getconn()
+
+        assert replacement.raw is not raw
+        assert connect.call_count == 2
+
+    def test_recent_connection_skips_health_check(self, pool, clock):
+        """Verifica que una conexión usada hace poco se presta sin round trips."""
+        conn = pool.getconn()
+        raw = conn.raw
+        conn.close()
+        clock.now = 10
+
+        pool.getconn()
+
+        raw.cursor.assert_not_called()
+        assert pool.stats()["health_checks"] == 0
+
+    def test_idle_connection_is_health_checked(self, pool, clock):
+        """Verifica que una conexión inactiva se valida con SELECT 1 antes de prestarla."""
+        conn = pool.getconn()
+        raw = conn.raw
+        conn.close()
+        clock.now = 60
+
+        again = pool.getconn()
+
+        assert again.raw is raw
+        cursor = raw.cursor.return_value.__enter__.return_value
+        cursor.execute.assert_called_once_with("SELECT 1")
+        assert pool.stats()["health_checks"] == 1
+
+    def test_failed_health_check_reconnects(self, pool, clock, connect):
+        """Verifica que una conexión caída (Lambda congelado) se reemplaza por una nueva."""
+        conn = pool.getconn()
+        stale = conn.raw
+        conn.close()
+        stale.cursor.return_value.__enter__.return_value.execute.side_effect = psycopg2.OperationalError("SSL SYSCALL error")
+        clock.now = 60
+
+        fresh = pool.getconn()
+
+        assert fresh.raw is not stale
+        stale.close.assert_called_once()
+        assert connect.call_count == 2
+
+    def test_connection_older_than_max_lifetime_is_renewed(self, connect, clock):
+        """Verifica que las conexiones se renuevan después de max_lifetime."""
+        from lib.db_pool import ConnectionPool
+        pool = ConnectionPool({}, max_lifetime=100, health_check_after=1000, connect=connect, clock=clock)
+        conn = pool.getconn()
+        old = conn.raw
+        conn.close()
+        clock.now = 150
+
+        assert pool.getconn().raw is not old
+
+    def test_connections_beyond_max_idle_are_closed(self, pool):
+        """Verifica que solo se conservan max_idle conexiones inactivas."""
+        conns = [pool.getconn() for _ in range(3)]
+        raws = [conn.raw for conn in conns]
+
+        for conn in conns:
+            conn.close()
+
+        assert pool.stats()["idle"] == 2
+        raws[2].close.assert_called_once()
+
+    def test_forked_child_does_not_reuse_parent_connections(self, pool, connect, monkeypatch):
+        """Verifica que después de un fork no se usan (ni cierran) las conexiones del padre."""
+        from lib import db_pool
+        conn = pool.getconn()
+        parent_raw = conn.raw
+        conn.close()
+        monkeypatch.setattr(db_pool.os, "getpid", lambda: -1)
+
+        child_conn = pool.getconn()
+
+        assert child_conn.raw is not parent_raw
+        parent_raw.close.assert_not_called()
+
+    def test_connection_cannot_be_used_after_close(self, pool):
+        """Verifica que una conexión devuelta al pool no se puede seguir usando."""
+        conn = pool.getconn()
+        conn.close()
+
+        assert conn.closed
+        with pytest.raises(psycopg2.InterfaceError):
+            conn.cursor()
+
@@ -0,0 +1,75 @@
+"""
+Tests unitarios para lib/document_registry.py (Lambda de embeddings)
+"""
+import pytest
+from unittest.mock import MagicMock
+
+from lib.document_registry import (
+    CLAIM_ACQUIRED,
+    STATUS_COMPLETED,
+    STATUS_PROCESSING,
+    claim_document,
+    touch_document,
+)
+
+
+def make_conn(*rows):
+    """Conexión simulada cuyo cursor devuelve `rows` en llamadas sucesivas a fetchone()."""
+    conn = MagicMock()
+    cur = conn.cursor.return_value.__enter__.return_value
+    cur.fetchone.side_effect = list(rows)
+    cur.rowcount = 0
+    return conn, cur
+
+
+def claim(conn):
+    return claim_document(conn, "tenant", "agent", "sha", "etag", "doc-id", "doc.pdf")
+
+
+class TestClaimDocument:
+    """Tests para claim_document."""
+
+    def test_new_document_is_acquired(self):
+        """Verifica que un documento nuevo se reclama sin descartar chunks."""
+        conn, cur = make_conn((False,))
+
+        assert claim(conn) == CLAIM_ACQUIRED
+        assert cur.execute.call_count == 1
+        conn.commit.assert_called_once()
+
+    def test_reclaimed_document_discards_partial_chunks(self):
+        """Verifica que al reclamar un intento abandonado se eliminan sus chunks parciales."""
+        conn, cur = make_conn((True,))
+
+        assert claim(conn) == CLAIM_ACQUIRED
+        statements = [call.args[0] for call in cur.execute.call_args_list]
+        assert any("DELETE FROM tenant.documents" in sql for sql in statements)
+
+    @pytest.mark.parametrize("status", [STATUS_COMPLETED, STATUS_PROCESSING])
+    def test_not_claimed_returns_existing_status(self, status):
+        """Verifica que sin reclamo se devuelve el estado del registro existente."""
+        conn, _ = make_conn(None, (status,))
+
+        assert claim(conn) == status
+        conn.commit.assert_called_once()
+
+    def test_row_removed_between_queries_is_retryable(self):
+        """Verifica que un registro que desaparece entre consultas se trata como en curso."""
+        conn, _ = make_conn(None, None)
+
+        assert claim(conn) == STATUS_PROCESSING
+
+
+class TestTouchDocument:
+    """Tests para touch_document."""
+
+    def test_refreshes_processing_row(self):
+        """Verifica que el heartbeat solo refresca el registro PROCESSING y confirma."""
+        conn, cur = make_conn()
+
+        touch_document(conn, "tenant", "agent", "doc-id")
+
+        sql, params = cur.execute.call_args.args
+        assert "SET updated_at = NOW()" in sql
+        assert params == ("agent", "doc-id", STATUS_PROCESSING)
+        conn.commit.assert_called_once()
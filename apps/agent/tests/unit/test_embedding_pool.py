@@ -0,0 +1,156 @@
+"""
+Tests unitarios para lib/embedding_pool.py (Lambda de embeddings)
+"""
+import threading
+
+import pytest
+from botocore.exceptions import ClientError
+
+from lib.embedding_pool import AdaptiveConcurrencyPool, is_throttling_error
+
+
+def throttling_error():
+    """ClientError de Bedrock por throttling."""
+    return ClientError({"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}}, "InvokeModel")
+
+
+@pytest.fixture
+def pool():
+    return AdaptiveConcurrencyPool(max_concurrency=4, initial_concurrency=4, base_backoff=0, max_backoff=0)
+
+
+class TestIsThrottlingError:
+    """Tests para is_throttling_error."""
+
+    def test_client_error_throttling(self):
+        """Verifica que un ClientError con código de throttling se detecta."""
+        assert is_throttling_error(throttling_error())
+
+    def test_client_error_other_code(self):
+        """Verifica que otros ClientError no se tratan como throttling."""
+        error = ClientError({"Error": {"Code": "ValidationException"}}, "InvokeModel")
+        assert not is_throttling_error(error)
+
+    def test_generic_exception(self):
+        """Verifica que una excepción común no es throttling."""
+        assert not is_throttling_error(ValueError("x"))
+
+
+class TestAdaptiveConcurrencyPool:
+    """Tests para AdaptiveConcurrencyPool."""
+
+    def test_map_preserves_order(self, pool):
+        """Verifica que los resultados se devuelven en el orden de los items."""
+        assert pool.map(lambda x: x * 2, range(20)) == [x * 2 for x in range(20)]
+
+    def test_success_increases_limit(self):
+        """Verifica el aumento aditivo del límite con requests exitosos."""
+        pool = AdaptiveConcurrencyPool(max_concurrency=8, initial_concurrency=2)
+        pool.map(lambda x: x, range(10))
+
+        assert pool.limit > 2
+        assert pool.stats()["requests"] == 10
+
+    def test_limit_never_exceeds_max(self):
+        """Verifica que el límite no supera max_concurrency."""
+        pool = AdaptiveConcurrencyPool(max_concurrency=3, initial_concurrency=2)
+        pool.map(lambda x: x, range(50))
+
+        assert pool.limit == 3
+
+    def test_throttled_items_are_retried(self, pool):
+        """Verifica que los items con throttling se reintentan y terminan bien."""
+        calls = {}
+        lock = threading.Lock()
+
+        def fn(x):
+            with lock:
+                calls[x] = calls.get(x, 0) + 1
+                first = calls[x] == 1
+            if first and x % 3 == 0:
+                raise throttling_error()
+            return x
+
+        assert pool.map(fn, range(9)) == list(range(9))
+        assert pool.stats()["throttles"] == 3
+        assert calls[0] == 2 and calls[1] == 1
+
+    def test_non_throttling_error_propagates(self, pool):
+        """Verifica que un error que no es throttling se propaga sin reintentos."""
+        def fn(x):
+            if x == 2:
+                raise ValueError("boom")
+            return x
+
+        with pytest.raises(ValueError):
+            pool.map(fn, range(5))
+
+    def test_max_retries_exceeded(self):
+        """Verifica que tras max_retries throttles se propaga el error."""
+        pool = AdaptiveConcurrencyPool(max_retries=2, base_backoff=0, max_backoff=0)
+        calls = []
+
+        def fn(x):
+            calls.append(x)
+            raise throttling_error()
+
+        with pytest.raises(ClientError):
+            pool.map(fn, [1])
+        assert len(calls) == 3
+
+    def test_slots_released_after_error(self, pool):
+        """Verifica que un error no deja lugares ocupados en el pool."""
+        with pytest.raises(ValueError):
+            pool.map(lambda x: (_ for _ in ()).throw(ValueError("x")), range(4))
+
+        assert pool._active == 0
+        assert pool.map(lambda x: x, range(4)) == list(range(4))
+
+
+class TestDecreaseOncePerWindow:
+    """Tests para la reducción del límite a lo sumo una vez por ventana."""
+
+    def test_throttle_from_previous_window_is_ignored(self, pool):
+        """Verifica que un throttle de un request anterior a la reducción no vuelve a reducir."""
+        window = pool._decreases
+
+        assert pool._on_throttle(window) is True
+        assert pool.limit == 2
+        assert pool._on_throttle(window) is False
+        assert pool.limit == 2
+
+        assert pool._on_throttle(pool._decreases) is True
+        assert pool.limit == 1
+        assert pool.stats()["throttles"] == 3
+
+    def test_limit_respects_min_concurrency(self):
+        """Verifica que el límite no baja de min_concurrency."""
+        pool = AdaptiveConcurrencyPool(max_concurrency=4, initial_concurrency=1, min_concurrency=1)
+        pool._on_throttle(pool._decreases)
+
+        assert pool.limit == 1
+
+    def test_concurrent_throttles_halve_once(self, pool):
+        """Verifica que varios throttles simultáneos reducen el límite una sola vez."""
+        barrier = threading.Barrier(4, timeout=5)
+        lock = threading.Lock()
+        calls = {}
+        limits_on_retry = []
+
+        def fn(x):
+            with lock:
+                calls[x] = calls.get(x, 0) + 1
+                first = calls[x] == 1
+            if first:
+                # Los 4 requests están en vuelo a la vez y todos sufren throttling
+                barrier.wait()
+                raise throttling_error()
+            with lock:
+                limits_on_retry.append(pool.limit)
+            return x
+
+        assert pool.map(fn, range(4)) == list(range(4))
+        assert pool.stats()["throttles"] == 4
+        assert pool._decreases == 1
+        # Con la reducción compuesta el límite habría bajado a 1 (4 -> 2 -> 1 -> ...)
+        assert min(limits_on_retry) >= 2
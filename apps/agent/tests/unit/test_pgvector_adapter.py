@@ -0,0 +1,57 @@
+"""
+Tests unitarios para lib/pgvector_adapter.py (Lambdas de embeddings y query)
+"""
+import pytest
+from unittest.mock import MagicMock
+
+from lib import pgvector_adapter
+from lib.pgvector_adapter import add_column_if_missing
+
+
+@pytest.fixture(autouse=True)
+def clear_column_cache():
+    pgvector_adapter.invalidate_table_columns()
+    yield
+    pgvector_adapter.invalidate_table_columns()
+
+
+def make_cursor(columns):
+    """Cursor simulado cuyo catálogo devuelve `columns` para la tabla."""
+    cur = MagicMock()
+    cur.fetchall.return_value = [(name, "int4", -1) for name in columns]
+    return cur
+
+
+def executed(cur):
+    return [call.args[0] for call in cur.execute.call_args_list]
+
+
+class TestAddColumnIfMissing:
+    """Tests para add_column_if_missing."""
+
+    def test_existing_column_skips_alter(self):
+        """Verifica que no se ejecuta ALTER TABLE si la columna ya existe."""
+        cur = make_cursor(["id", "chunk_hash"])
+
+        assert add_column_if_missing(cur, "t.documents", "chunk_hash", "BYTEA") is False
+        assert not any("ALTER TABLE" in sql for sql in executed(cur))
+
+    def test_cached_columns_skip_catalog_query(self):
+        """Verifica que una segunda verificación usa las columnas cacheadas."""
+        cur = make_cursor(["id", "chunk_hash"])
+
+        add_column_if_missing(cur, "t.documents", "chunk_hash", "BYTEA")
+        add_column_if_missing(cur, "t.documents", "chunk_hash", "BYTEA")
+
+        assert cur.execute.call_count == 1
+
+    def test_missing_column_added_with_lock_timeout(self):
+        """Verifica que la columna faltante se agrega con lock_timeout y se invalida el cache."""
+        cur = make_cursor(["id"])
+
+        assert add_column_if_missing(cur, "t.documents", "token_count", "INT") is True
+
+        statements = executed(cur)
+        assert "set_config('lock_timeout'" in statements[1]
+        assert statements[2] == "ALTER TABLE t.documents ADD COLUMN IF NOT EXISTS token_count INT"
+        assert "t.documents" not in pgvector_adapter._TABLE_COLUMNS
@@ -0,0 +1,217 @@
+"""
+Tests unitarios para lib/s3_range_file.py (Lambda de embeddings)
+"""
+import io
+
+import pytest
+from botocore.exceptions import ClientError
+
+from lib.s3_range_file import MAX_READAHEAD_BLOCKS, LocalDirectoryS3, S3RangeFile
+
+BLOCK = 16
+DATA = bytes(range(256)) * 2      # 512 bytes = 32 bloques
+
+
+@pytest.fixture
+def s3(tmp_path):
+    """S3 local con el objeto s3://bucket/doc.pdf."""
+    (tmp_path / "bucket").mkdir()
+    (tmp_path / "bucket" / "doc.pdf").write_bytes(DATA)
+    return LocalDirectoryS3(str(tmp_path))
+
+
+def open_file(s3, **kwargs):
+    kwargs.setdefault("block_size", BLOCK)
+    kwargs.setdefault("cache_blocks", 64)
+    return S3RangeFile(s3, "bucket", "doc.pdf", **kwargs)
+
+
+def ranges(s3):
+    """Rangos (inicio, fin) pedidos con get_object, en orden."""
+    result = []
+    for call, _, byte_range in s3.calls:
+        if call == "get_object":
+            start, end = byte_range[len("bytes="):].split("-")
+            result.append((int(start), int(end)))
+    return result
+
+
+def read_block(f, index):
+    f.seek(index * BLOCK)
+    return f.read(BLOCK)
+
+
+class TestReads:
+    """Tests de lectura y posicionamiento."""
+
+    def test_random_reads_match_object(self, s3):
+        """Verifica que lecturas en posiciones arbitrarias devuelven los bytes del objeto."""
+        f = open_file(s3)
+
+        for start, size in [(0, 1), (5, 40), (100, 16), (15, 2), (500, 100), (511, 1)]:
+            f.seek(start)
+            assert f.read(size) == DATA[start:start + size]
+
+    def test_read_all_and_eof(self, s3):
+        """Verifica la lectura completa y que al final se devuelve b''."""
+        f = open_file(s3)
+
+        assert f.read() == DATA
+        assert f.read(10) == b""
+
+    def test_seek_whence(self, s3):
+        """Verifica seek relativo al final y a la posición actual."""
+        f = open_file(s3)
+
+        assert f.seek(-10, io.SEEK_END) == len(DATA) - 10
+        f.seek(-5, io.SEEK_CUR)
+        assert f.read(3) == DATA[-15:-12]
+        with pytest.raises(ValueError):
+            f.seek(-1)
+
+    def test_size_and_etag_from_head(self, s3):
+        """Verifica que sin size se usa head_object para el tamaño y el ETag."""
+        f = open_file(s3)
+
+        assert f.size == len(DATA)
+        assert f.etag == s3.head_object(Bucket="bucket", Key="doc.pdf")["ETag"]
+
+
+class TestBlockCache:
+    """Tests del cache LRU de bloques."""
+
+    def test_cached_block_not_fetched_again(self, s3):
+        """Verifica que un bloque en cache no genera otro GET."""
+        f = open_file(s3)
+        read_block(f, 3)
+        read_block(f, 3)
+
+        assert f.stats()["requests"] == 1
+
+    def test_lru_eviction(self, s3):
+        """Verifica que se descarta el bloque usado hace más tiempo."""
+        f = open_file(s3, cache_blocks=2)
+        read_block(f, 0)
+        read_block(f, 5)
+        read_block(f, 0)      # 0 pasa a ser el más reciente
+        read_block(f, 9)      # descarta el 5
+
+        assert f.stats()["cached_blocks"] == 2
+        requests = f.stats()["requests"]
+
+        read_block(f, 0)
+        assert f.stats()["requests"] == requests
+
+        assert read_block(f, 5) == DATA[5 * BLOCK:6 * BLOCK]
+        assert f.stats()["requests"] == requests + 1
+
+
+class TestReadahead:
+    """Tests de la lectura anticipada en accesos secuenciales."""
+
+    def test_sequential_reads_double_readahead(self, s3):
+        """Verifica que los GETs secuenciales crecen hasta MAX_READAHEAD_BLOCKS bloques."""
+        f = open_file(s3)
+        for index in range(32):
+            assert read_block(f, index) == DATA[index * BLOCK:(index + 1) * BLOCK]
+
+        sizes = [(end - start + 1) // BLOCK for start, end in ranges(s3)]
+        assert sizes[0] == 1
+        assert sizes[:-1] == sorted(sizes[:-1])
+        assert max(sizes) == MAX_READAHEAD_BLOCKS
+        assert sum(sizes) == 32
+        # 32 bloques en pocos GETs en lugar de uno por bloque
+        assert len(sizes) <= 6
+
+    def test_random_access_resets_readahead(self, s3):
+        """Verifica que un salto vuelve a pedir de a un bloque."""
+        f = open_file(s3)
+        read_block(f, 0)
+        read_block(f, 1)
+        read_block(f, 2)
+        read_block(f, 20)
+
+        assert ranges(s3)[-1] == (20 * BLOCK, 21 * BLOCK - 1)
+
+    def test_readahead_stops_at_cached_block(self, s3):
+        """Verifica que la lectura anticipada no vuelve a pedir bloques en cache."""
+        f = open_file(s3)
+        read_block(f, 4)
+        read_block(f, 2)
+        read_block(f, 3)      # readahead 2, pero el bloque 4 ya está en cache
+
+        assert ranges(s3)[-1] == (3 * BLOCK, 4 * BLOCK - 1)
+
+    def test_readahead_clamped_to_object_end(self, s3):
+        """Verifica que la lectura anticipada no pide más allá del final del objeto."""
+        f = open_file(s3)
+        for index in range(29, 32):
+            read_block(f, index)
+
+        assert all(end < len(DATA) for _, end in ranges(s3))
+
+
+class TestView:
+    """Tests de vistas sobre el mismo objeto."""
+
+    def test_views_have_own_position(self, s3):
+        """Verifica que cada vista tiene su propia posición."""
+        f = open_file(s3)
+        view = f.view()
+        f.seek(100)
+        view.seek(10)
+
+        assert f.read(4) == DATA[100:104]
+        assert view.read(4) == DATA[10:14]
+        assert f.tell() == 104 and view.tell() == 14
+
+    def test_views_share_cache(self, s3):
+        """Verifica que una vista reutiliza los bloques leídos por otra."""
+        f = open_file(s3)
+        read_block(f, 7)
+        view = f.view()
+
+        assert read_block(view, 7) == DATA[7 * BLOCK:8 * BLOCK]
+        assert view.stats()["requests"] == 1
+        assert view.etag == f.etag and view.size == f.size
+
+
+class TestIfMatch:
+    """Tests de la lectura con IfMatch cuando el objeto cambia."""
+
+    def test_changed_object_raises_precondition_failed(self, s3, tmp_path):
+        """Verifica que un bloque nuevo de un objeto modificado falla con 412."""
+        f = open_file(s3)
+        cached = read_block(f, 0)
+        (tmp_path / "bucket" / "doc.pdf").write_bytes(DATA[::-1])
+
+        # Lo ya leído sigue siendo de la versión original
+        assert read_block(f, 0) == cached
+        with pytest.raises(ClientError) as error:
+            read_block(f, 10)
+        assert error.value.response["Error"]["Code"] == "PreconditionFailed"
+
+    def test_explicit_etag_mismatch(self, s3):
+        """Verifica que un ETag explícito de otra versión falla en la primera lectura."""
+        f = open_file(s3, size=len(DATA), etag='"otra-version"')
+
+        with pytest.raises(ClientError):
+            f.read(1)
+
+    def test_iter_bytes_uses_ifmatch(self, s3, tmp_path):
+        """Verifica que iter_bytes recorre el objeto completo y también valida el ETag."""
+        f = open_file(s3)
+        assert b"".join(f.iter_bytes(chunk_size=100)) == DATA
+        assert f.stats()["cached_blocks"] == 0
+
+        (tmp_path / "bucket" / "doc.pdf").write_bytes(DATA[::-1])
+        with pytest.raises(ClientError):
+            list(f.iter_bytes(chunk_size=100))
+
+    def test_without_etag_reads_new_version(self, s3, tmp_path):
+        """Verifica que sin ETag conocido no se envía IfMatch."""
+        f = open_file(s3, size=len(DATA))
+        (tmp_path / "bucket" / "doc.pdf").write_bytes(DATA[::-1])
+
+        assert f.etag is None
+        assert f.read(4) == DATA[::-1][:4]
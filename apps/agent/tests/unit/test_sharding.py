@@ -0,0 +1,113 @@
+"""
+Tests unitarios para lib/sharding.py (Lambda de embeddings)
+"""
+import random
+
+import pytest
+
+from lib.sharding import ShardPages, merge_shards, shard_ranges
+from lib.text_splitter import StructureAwareSplitter
+
+
+def make_pages(count=24, seed=7):
+    """Páginas con párrafos de largo variable (los chunks cruzan páginas)."""
+    rng = random.Random(seed)
+    pages = []
+    for page in range(count):
+        paragraphs = []
+        for paragraph in range(rng.randint(1, 4)):
+            words = " ".join(f"palabra{page}_{paragraph}_{i}" for i in range(rng.randint(4, 30)))
+            paragraphs.append(f"Párrafo {page}.{paragraph}. {words}.")
+        pages.append("\n\n".join(paragraphs))
+    return pages
+
+
+def window_chunker(chunk_size, chunk_overlap, window_chunks=4):
+    """
+    Chunker en streaming como iter_semantic_chunks: divide ventanas de texto y
+    conserva el último chunk como inicio de la próxima ventana.
+    """
+    splitter = StructureAwareSplitter(chunk_size, chunk_overlap)
+    window = chunk_size * window_chunks
+
+    def chunk_pages(page_texts):
+        buffer = ""
+        for page_text in page_texts:
+            buffer += page_text + "\n\n"
+            if len(buffer) < window:
+                continue
+            spans = splitter.split_spans(buffer)
+            for span in spans[:-1]:
+                yield span.text(buffer)
+            buffer = buffer[spans[-1].start:]
+        for span in splitter.split_spans(buffer):
+            yield span.text(buffer)
+
+    return chunk_pages
+
+
+def shards_for(pages, bounds):
+    """Shards que cortan `pages` en los índices de `bounds`."""
+    edges = [0] + list(bounds) + [len(pages)]
+    return [ShardPages(start, pages[start:end]) for start, end in zip(edges, edges[1:])]
+
+
+class TestShardRanges:
+    """Tests para shard_ranges."""
+
+    def test_ranges_cover_document(self):
+        """Verifica que los rangos cubren todas las páginas sin solaparse."""
+        assert shard_ranges(10, 4) == [(0, 4), (4, 8), (8, 10)]
+
+    def test_single_shard(self):
+        """Verifica un documento más chico que un shard."""
+        assert shard_ranges(3, 100) == [(0, 3)]
+
+
+class TestMergeShards:
+    """Tests para merge_shards."""
+
+    @pytest.mark.parametrize("chunk_size,chunk_overlap", [(300, 100), (300, 0), (500, 120)])
+    @pytest.mark.parametrize("bounds", [[1], [5], [11], [23], [3, 4], [2, 9, 17], list(range(1, 24))])
+    def test_merged_matches_unsharded(self, chunk_size, chunk_overlap, bounds):
+        """Verifica que los chunks del fan-out son los mismos que sin fan-out."""
+        pages = make_pages()
+        chunker = window_chunker(chunk_size, chunk_overlap)
+
+        unsharded = list(chunker(pages))
+        merged = list(merge_shards(shards_for(pages, bounds), chunker))
+
+        assert merged == unsharded
+
+    def test_every_shard_size_matches_unsharded(self):
+        """Verifica la equivalencia para todos los tamaños de shard de shard_ranges."""
+        pages = make_pages(count=15, seed=3)
+        chunker = window_chunker(300, 100)
+        unsharded = list(chunker(pages))
+
+        for shard_pages in range(1, 16):
+            shards = [ShardPages(start, pages[start:end]) for start, end in shard_ranges(len(pages), shard_pages)]
+            assert list(merge_shards(shards, chunker)) == unsharded
+
+    def test_shards_consumed_as_they_arrive(self):
+        """Verifica que el reductor emite chunks antes de recibir todos los shards."""
+        pages = make_pages()
+        received = []
+
+        def shards():
+            for shard in shards_for(pages, range(1, len(pages))):
+                received.append(shard.start)
+                yield shard
+
+        chunks = merge_shards(shards(), window_chunker(300, 100))
+        next(chunks)
+
+        assert len(received) < len(pages)
+
+    def test_out_of_order_shard_raises(self):
+        """Verifica que un shard fuera de orden se detecta."""
+        pages = make_pages()
+        shards = shards_for(pages, [5, 10])
+
+        with pytest.raises(ValueError):
+            list(merge_shards([shards[0], shards[2], shards[1]], window_chunker(300, 100)))
@@ -0,0 +1,185 @@
+"""
+Tests unitarios para lib/textract_reader.py (Lambda de embeddings)
+"""
+import pytest
+
+from lib import textract_reader
+from lib.textract_reader import TextractTimeoutError, iter_textract_pages
+
+
+class FakeClock:
+    """Reloj controlable: sleep() avanza el tiempo en lugar de esperar."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeTextract:
+    """
+    Cliente de Textract simulado: `statuses` son los estados que devuelve el
+    polling y `pages` las páginas de resultados ([bloques] por NextToken).
+    """
+
+    def __init__(self, statuses, pages, job_id="job-1"):
+        self.statuses = list(statuses)
+        self.pages = pages
+        self.job_id = job_id
+        self.started = []
+        self.calls = []
+
+    def start_document_text_detection(self, DocumentLocation):
+        self.started.append(DocumentLocation)
+        return {"JobId": self.job_id}
+
+    def get_document_text_detection(self, JobId, NextToken=None):
+        self.calls.append(NextToken)
+        if NextToken is None:
+            status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+            if status not in textract_reader.SUCCESS_STATUSES:
+                return {"JobStatus": status, "StatusMessage": "bad pdf"}
+            index = 0
+        else:
+            status = "SUCCEEDED"
+            index = int(NextToken)
+
+        result = {"JobStatus": status, "Blocks": self.pages[index]}
+        if index + 1 < len(self.pages):
+            result["NextToken"] = str(index + 1)
+        return result
+
+
+def line(page, text):
+    return {"BlockType": "LINE", "Page": page, "Text": text}
+
+
+def word(page, text):
+    return {"BlockType": "WORD", "Page": page, "Text": text}
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def read_pages(client, clock, **kwargs):
+    kwargs.setdefault("poll_initial", 1.0)
+    kwargs.setdefault("poll_max", 4.0)
+    return list(iter_textract_pages(client, "bucket", "doc.pdf", sleep=clock.sleep, clock=clock, **kwargs))
+
+
+class TestPolling:
+    """Tests para el polling del job (deadline y jitter)."""
+
+    def test_deadline_raises_timeout(self, clock):
+        """Verifica que un job que no termina lanza TextractTimeoutError al vencer el deadline."""
+        client = FakeTextract(["IN_PROGRESS"], [[]])
+
+        with pytest.raises(TextractTimeoutError):
+            read_pages(client, clock, deadline_seconds=10)
+
+        assert clock.now == pytest.approx(10)
+        assert sum(clock.sleeps) <= 10
+
+    def test_last_sleep_capped_by_deadline(self, clock, monkeypatch):
+        """Verifica que la última espera no supera el tiempo restante del deadline."""
+        monkeypatch.setattr(textract_reader.random, "uniform", lambda low, high: high)
+        client = FakeTextract(["IN_PROGRESS"], [[]])
+
+        with pytest.raises(TextractTimeoutError):
+            read_pages(client, clock, deadline_seconds=6, poll_max=8.0)
+
+        # 1 + 2 = 3 segundos; la espera de 4 se recorta a los 3 restantes
+        assert clock.sleeps == [1.0, 2.0, 3.0]
+
+    def test_backoff_doubles_up_to_poll_max(self, clock, monkeypatch):
+        """Verifica el backoff exponencial acotado por poll_max."""
+        monkeypatch.setattr(textract_reader.random, "uniform", lambda low, high: high)
+        client = FakeTextract(["IN_PROGRESS"] * 5 + ["SUCCEEDED"], [[line(1, "a")]])
+
+        read_pages(client, clock, deadline_seconds=600)
+
+        assert clock.sleeps == [1.0, 2.0, 4.0, 4.0, 4.0]
+
+    def test_jitter_between_half_and_full_delay(self, clock):
+        """Verifica que cada espera cae en [delay/2, delay]."""
+        client = FakeTextract(["IN_PROGRESS"] * 6 + ["SUCCEEDED"], [[line(1, "a")]])
+
+        read_pages(client, clock, deadline_seconds=600)
+
+        delays = [1.0, 2.0, 4.0, 4.0, 4.0, 4.0]
+        assert len(clock.sleeps) == len(delays)
+        for slept, delay in zip(clock.sleeps, delays):
+            assert delay / 2 <= slept <= delay
+
+    def test_failed_job_raises(self, clock):
+        """Verifica que un job FAILED lanza una excepción con el mensaje de Textract."""
+        client = FakeTextract(["IN_PROGRESS", "FAILED"], [[]])
+
+        with pytest.raises(Exception, match="bad pdf"):
+            read_pages(client, clock)
+
+    def test_partial_success_returns_pages(self, clock):
+        """Verifica que PARTIAL_SUCCESS se trata como éxito."""
+        client = FakeTextract(["PARTIAL_SUCCESS"], [[line(1, "a")]])
+
+        assert read_pages(client, clock) == ["a"]
+
+
+class TestResults:
+    """Tests para la lectura de resultados."""
+
+    def test_success_response_reused_as_first_page(self, clock):
+        """Verifica que la respuesta que indicó el éxito se usa como primera página."""
+        client = FakeTextract(["IN_PROGRESS", "SUCCEEDED"], [[line(1, "hola"), line(1, "mundo")]])
+
+        assert read_pages(client, clock) == ["hola\nmundo"]
+        # Dos polls y ninguna llamada extra para leer la primera página
+        assert client.calls == [None, None]
+
+    def test_pagination_follows_next_token(self, clock):
+        """Verifica que se recorren todas las páginas de resultados con NextToken."""
+        pages = [
+            [line(1, "p1 a"), word(1, "p1"), line(1, "p1 b")],
+            [line(1, "p1 c"), line(2, "p2 a")],
+            [line(3, "p3 a")],
+        ]
+        client = FakeTextract(["SUCCEEDED"], pages)
+
+        assert read_pages(client, clock) == ["p1 a\np1 b\np1 c", "p2 a", "p3 a"]
+        assert client.calls == [None, "1", "2"]
+
+    def test_pages_streamed_before_next_request(self, clock):
+        """Verifica que una página se emite sin esperar las páginas de resultados siguientes."""
+        client = FakeTextract(["SUCCEEDED"], [[line(1, "a"), line(2, "b")], [line(3, "c")]])
+
+        pages = iter_textract_pages(client, "bucket", "doc.pdf", sleep=clock.sleep, clock=clock)
+
+        assert next(pages) == "a"
+        assert client.calls == [None]
+
+    def test_starts_job_and_reports_id(self, clock):
+        """Verifica que se inicia un job nuevo y se notifica su id."""
+        client = FakeTextract(["SUCCEEDED"], [[line(1, "a")]])
+        started = []
+
+        read_pages(client, clock, on_job_started=started.append)
+
+        assert started == ["job-1"]
+        assert client.started == [{"S3Object": {"Bucket": "bucket", "Name": "doc.pdf"}}]
+
+    def test_existing_job_id_is_reused(self, clock):
+        """Verifica que con job_id no se inicia un job nuevo."""
+        client = FakeTextract(["SUCCEEDED"], [[line(1, "a")]])
+        started = []
+
+        assert read_pages(client, clock, job_id="job-0", on_job_started=started.append) == ["a"]
+        assert client.started == []
+        assert started == []
@@ -0,0 +1,66 @@
+"""
+Benchmark: búsqueda en dos etapas (pre-filtro binario + re-ranking exacto) vs
+búsqueda exacta por distancia coseno.
+
+Sobre el corpus sintético de bench_halfvec.py, cuantiza cada embedding a 1 bit
+por dimensión (BitParam.quantize, lo que guarda la columna embedding_bits),
+toma los N candidatos más cercanos por distancia de Hamming y los re-rankea con
+el vector float32 completo. Reporta recall@k contra la búsqueda exacta, latencia
+por consulta y bytes leídos por fila en la primera etapa, para varios N.
+
+Uso (desde apps/rag_lmbd_embeddings):
+    python benchmarks/bench_binary_prefilter.py --rows 100000 --candidates 100,200,400,800
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_halfvec import recall, search, synthetic_corpus  # noqa: E402
+from lib.pgvector_adapter import BitParam  # noqa: E402
+
+
+def two_stage_search(corpus, corpus_bits, queries, k, candidates):
+    start = time.perf_counter()
+    results = []
+    for query in queries:
+        query_bits = BitParam.quantize(query).packed
+        hamming = np.bitwise_count(corpus_bits ^ query_bits).sum(axis=1, dtype=np.int32)
+        shortlist = np.argpartition(hamming, candidates)[:candidates]
+        scores = corpus[shortlist] @ query
+        top = np.argsort(-scores)[:k]
+        results.append(shortlist[top])
+    return results, (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--candidates", default="100,200,400,800")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    corpus, queries = synthetic_corpus(args.rows, args.queries, args.dim, args.clusters, args.seed)
+    corpus_bits = np.stack([BitParam.quantize(vec).packed for vec in corpus])
+
+    truth, t_exact = search(corpus, queries, args.k)
+
+    print(f"corpus: {args.rows} filas x {args.dim} dims, {args.queries} consultas, k={args.k}")
+    print(f"{'búsqueda':26s} {'recall@k':>9s} {'ms/consulta':>12s} {'bytes/fila (1ª etapa)':>22s}")
+    print(f"{'exacta (float32)':26s} {1.0:9.4f} {t_exact * 1000:12.2f} {corpus.shape[1] * 4:22d}")
+    for candidates in (int(n) for n in args.candidates.split(",")):
+        found, latency = two_stage_search(corpus, corpus_bits, queries, args.k, candidates)
+        name = f"binaria + re-rank ({candidates})"
+        print(f"{name:26s} {recall(truth, found):9.4f} {latency * 1000:12.2f} {corpus_bits.shape[1]:22d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark del pool de embeddings con concurrencia adaptativa (AIMD).
+
+Simula un Bedrock con cuota de tokens por minuto (TPM) que responde
+ThrottlingException al superarla, y mide el throughput alcanzado.
+
+Uso (desde apps/rag_lmbd_embeddings):
+    python benchmarks/bench_embedding_pool.py --tpm 600000 --batches 200
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from botocore.exceptions import ClientError  # noqa: E402
+from lib.embedding_pool import AdaptiveConcurrencyPool  # noqa: E402
+
+
+class ThrottlingBedrockStub:
+    """
+    Token bucket con la cuota TPM; cada llamada consume `tokens` y tarda `latency` segundos.
+    """
+
+    def __init__(self, tpm, latency):
+        self.capacity = tpm / 60.0  # ráfaga de un segundo
+        self.rate = tpm / 60.0
+        self.tokens = self.capacity
+        self.latency = latency
+        self.updated = time.time()
+        self.lock = threading.Lock()
+        self.consumed = 0
+
+    def invoke(self, tokens):
+        with self.lock:
+            now = time.time()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < tokens:
+                raise ClientError(
+                    {"Error": {"Code": "ThrottlingException", "Message": "Too many tokens"}},
+                    "InvokeModel",
+                )
+            self.tokens -= tokens
+            self.consumed += tokens
+        time.sleep(self.latency)
+        return tokens
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tpm", type=int, default=600000, help="Cuota de tokens por minuto")
+    parser.add_argument("--batches", type=int, default=200, help="Requests a enviar")
+    parser.add_argument("--tokens-per-batch", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05, help="Latencia por request (s)")
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    stub = ThrottlingBedrockStub(args.tpm, args.latency)
+    pool = AdaptiveConcurrencyPool(
+        max_concurrency=args.max_concurrency,
+        base_backoff=0.05,
+        max_backoff=1.0,
+        max_retries=50,
+    )
+
+    start = time.time()
+    results = pool.map(stub.invoke, [args.tokens_per_batch] * args.batches)
+    elapsed = time.time() - start
+
+    assert len(results) == args.batches
+    achieved_tpm = stub.consumed / elapsed * 60
+    print(f"Tiempo total:       {elapsed:.2f}s")
+    print(f"TPM alcanzado:      {achieved_tpm:,.0f} / {args.tpm:,} ({achieved_tpm / args.tpm:.0%})")
+    print(f"Stats del pool:     {pool.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark: chunking de un PDF grande con y sin fan-out por rangos de páginas.
+
+Compara generate_semantic_chunks en un único flujo contra el fan-out local
+(un proceso por shard, ver lib/sharding.py) y verifica que el reductor
+produzca los mismos chunks.
+
+Uso (desde apps/rag_lmbd_embeddings):
+    python benchmarks/bench_fanout.py --pdf /tmp/manual.pdf --shard-pages 100
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import index  # noqa: E402
+from lib.document import PdfDocument, available_cpus  # noqa: E402
+
+
+def run(pdf_path, fanout):
+    index.FANOUT_MIN_PAGES = 1 if fanout else 0
+    start = time.perf_counter()
+    with PdfDocument(pdf_path) as doc:
+        chunks = index.generate_semantic_chunks(doc)
+    return time.perf_counter() - start, chunks
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", required=True)
+    parser.add_argument("--shard-pages", type=int, default=100)
+    parser.add_argument("--unit", choices=["tokens", "chars"], default="tokens")
+    args = parser.parse_args()
+
+    index.CHUNK_LENGTH_UNIT = args.unit
+    index.PDF_EXTRACTION_MODE = "hybrid"
+    index.SHARD_EXECUTOR = "local"
+    index.SHARD_PAGES = args.shard_pages
+
+    seq_s, seq = run(args.pdf, fanout=False)
+    fan_s, fan = run(args.pdf, fanout=True)
+    if fan != seq:
+        raise SystemExit("El fan-out produjo chunks distintos a un flujo")
+
+    print(f"CPUs: {available_cpus()}, shard: {args.shard_pages} páginas, unidad: {args.unit}")
+    print(f"un flujo: {seq_s:8.2f} s  {len(seq):6d} chunks")
+    print(f"fan-out:  {fan_s:8.2f} s  {len(fan):6d} chunks (idénticos a un flujo)")
+    print(f"speedup: {seq_s / fan_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
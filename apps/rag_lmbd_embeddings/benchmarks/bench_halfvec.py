@@ -0,0 +1,97 @@
+"""
+Benchmark: embeddings en halfvec (float16) vs vector (float32).
+
+Genera un corpus sintético de embeddings normalizados agrupados en clusters
+(como los de documentos de un mismo tenant) y consultas cercanas a ellos, y
+compara la búsqueda exacta por distancia coseno con los vectores guardados
+en float32 y en float16: recall@k contra float32, latencia por consulta y
+bytes por fila en el formato binario de pgvector (lib/pgvector_adapter.py).
+En Postgres la mejora de latencia viene de leer la mitad de páginas de tabla
+e índice; aquí la latencia solo confirma que el re-cálculo en float32 no cuesta más.
+
+Uso (desde apps/rag_lmbd_embeddings):
+    python benchmarks/bench_halfvec.py --rows 100000 --queries 200 --k 10
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.pgvector_adapter import encode_halfvec, encode_vector  # noqa: E402
+
+
+def normalize(matrix):
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def synthetic_corpus(rows, queries, dim, clusters, seed):
+    rng = np.random.default_rng(seed)
+    centers = normalize(rng.standard_normal((clusters, dim)).astype(np.float32))
+    labels = rng.integers(0, clusters, rows)
+    # Ruido de norma ~0.8 alrededor del centro del cluster y ~0.5 alrededor del chunk consultado
+    noise = rng.standard_normal((rows, dim)).astype(np.float32) / np.sqrt(dim)
+    corpus = normalize(centers[labels] + 0.8 * noise)
+    picked = rng.integers(0, rows, queries)
+    noise = rng.standard_normal((queries, dim)).astype(np.float32) / np.sqrt(dim)
+    query_vecs = normalize(corpus[picked] + 0.5 * noise)
+    return corpus.astype(np.float32), query_vecs.astype(np.float32)
+
+
+def search(corpus, queries, k):
+    """
+    Top-k por distancia coseno (vectores normalizados: mayor producto interno).
+    Los valores se calculan en float32, como hace pgvector con halfvec.
+    """
+    start = time.perf_counter()
+    results = []
+    for query in queries:
+        scores = corpus @ query
+        top = np.argpartition(-scores, k)[:k]
+        results.append(top[np.argsort(-scores[top])])
+    return results, (time.perf_counter() - start) / len(queries)
+
+
+def recall(truth, found):
+    return np.mean([len(set(t) & set(f)) / len(t) for t, f in zip(truth, found)])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    corpus, queries = synthetic_corpus(args.rows, args.queries, args.dim, args.clusters, args.seed)
+    # Lo que devuelve halfvec al leer: float32 redondeado a float16
+    corpus_half = corpus.astype(np.float16)
+
+    truth, t_float = search(corpus, queries, args.k)
+    found, t_half = search(corpus_half.astype(np.float32), queries, args.k)
+
+    max_error = float(np.max(np.abs(corpus_half.astype(np.float32) - corpus)))
+    row_vector = len(encode_vector(corpus[0]))
+    row_halfvec = len(encode_halfvec(corpus[0]))
+
+    print(f"corpus: {args.rows} filas x {args.dim} dims, {args.queries} consultas, k={args.k}")
+    print(f"error máximo por componente (float16): {max_error:.2e}")
+    print(f"{'almacenamiento':24s} {'recall@k':>9s} {'ms/consulta':>12s} {'bytes/fila':>11s} {'MB totales':>11s}")
+    for name, result, latency, row_bytes in (
+        ("vector (float32)", truth, t_float, row_vector),
+        ("halfvec", found, t_half, row_halfvec),
+    ):
+        print(
+            f"{name:24s} {recall(truth, result):9.4f} {latency * 1000:12.2f} "
+            f"{row_bytes:11d} {row_bytes * args.rows / 1e6:11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
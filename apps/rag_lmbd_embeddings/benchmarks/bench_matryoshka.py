@@ -0,0 +1,85 @@
+"""
+Benchmark: primera pasada con el prefijo Matryoshka (embedding_low) y
+re-puntuación con las 1536 dimensiones vs búsqueda exacta completa.
+
+Para cada dimensión reducida trunca y re-normaliza los embeddings
+(truncate_embedding, lo que guarda la columna embedding_low), toma los N
+candidatos más cercanos en baja dimensión y los re-rankea con el vector
+completo. Reporta recall@k contra la búsqueda exacta, latencia por consulta y
+bytes por fila del índice de la primera pasada.
+
+El corpus sintético de bench_halfvec.py reparte la información por igual entre
+todas las dimensiones, así que es una cota pesimista para modelos entrenados con
+Matryoshka (Cohere v4 concentra la información en el prefijo). Para medir con
+embeddings reales se puede exportar una muestra del tenant a .npy:
+
+    python benchmarks/bench_matryoshka.py --embeddings /tmp/tenant_sample.npy
+
+Uso (desde apps/rag_lmbd_embeddings):
+    python benchmarks/bench_matryoshka.py --rows 100000 --dims 128,256,512 --candidates 200,400
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_halfvec import normalize, recall, search, synthetic_corpus  # noqa: E402
+from lib.pgvector_adapter import truncate_embedding  # noqa: E402
+
+
+def sample_queries(corpus, queries, seed):
+    rng = np.random.default_rng(seed)
+    picked = rng.integers(0, corpus.shape[0], queries)
+    noise = rng.standard_normal((queries, corpus.shape[1])).astype(np.float32) / np.sqrt(corpus.shape[1])
+    return normalize(corpus[picked] + 0.5 * noise).astype(np.float32)
+
+
+def two_stage_search(corpus, corpus_low, queries, dims, k, candidates):
+    start = time.perf_counter()
+    results = []
+    for query in queries:
+        scores_low = corpus_low @ truncate_embedding(query, dims)
+        shortlist = np.argpartition(-scores_low, candidates)[:candidates]
+        scores = corpus[shortlist] @ query
+        results.append(shortlist[np.argsort(-scores)[:k]])
+    return results, (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--embeddings", help="matriz .npy (filas x dims) de embeddings reales")
+    parser.add_argument("--dims", default="128,256,512")
+    parser.add_argument("--candidates", default="200,400")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.embeddings:
+        corpus = normalize(np.load(args.embeddings).astype(np.float32))
+        queries = sample_queries(corpus, args.queries, args.seed)
+    else:
+        corpus, queries = synthetic_corpus(args.rows, args.queries, args.dim, args.clusters, args.seed)
+
+    truth, t_exact = search(corpus, queries, args.k)
+
+    print(f"corpus: {corpus.shape[0]} filas x {corpus.shape[1]} dims, {len(queries)} consultas, k={args.k}")
+    print(f"{'búsqueda':30s} {'recall@k':>9s} {'ms/consulta':>12s} {'bytes/fila (1ª pasada)':>23s}")
+    print(f"{'exacta (' + str(corpus.shape[1]) + ' dims)':30s} {1.0:9.4f} {t_exact * 1000:12.2f} {corpus.shape[1] * 4:23d}")
+    for dims in (int(n) for n in args.dims.split(",")):
+        corpus_low = np.stack([truncate_embedding(vec, dims) for vec in corpus])
+        for candidates in (int(n) for n in args.candidates.split(",")):
+            found, latency = two_stage_search(corpus, corpus_low, queries, dims, args.k, candidates)
+            name = f"{dims} dims + re-rank ({candidates})"
+            print(f"{name:30s} {recall(truth, found):9.4f} {latency * 1000:12.2f} {dims * 4:23d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Microbenchmark: costo por vector de codificar embeddings para pgvector.
+
+Compara la conversión a texto anterior (",".join(str(x) ...)) contra
+lib/pgvector_adapter: formato binario (COPY en la ingesta) y el literal
+float32 exacto usado en la búsqueda.
+
+Uso (desde apps/rag_lmbd_embeddings):
+    python benchmarks/bench_pgvector_encoding.py --dim 1536 --rows 500
+"""
+import argparse
+import os
+import sys
+import timeit
+import uuid
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.pgvector_adapter import (  # noqa: E402
+    VectorParam,
+    decode_vector,
+    encode_copy_rows,
+    encode_vector,
+)
+
+
+def to_pgvector_text(vec):
+    # Implementación anterior (to_pgvector / q_emb_str)
+    return "[" + ",".join(str(x) for x in vec) + "]"
+
+
+def bench(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--rows", type=int, default=500, help="Filas por lote de COPY")
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vec = rng.standard_normal(args.dim).astype(np.float32)
+    vec /= np.linalg.norm(vec)
+    vec_list = vec.tolist()
+
+    assert np.array_equal(decode_vector(encode_vector(vec)), vec)
+
+    results = [
+        ("texto (antes, lista Python)", bench(lambda: to_pgvector_text(vec_list), args.number),
+         len(to_pgvector_text(vec_list))),
+        ("texto (antes, np.ndarray)", bench(lambda: to_pgvector_text(vec), args.number),
+         len(to_pgvector_text(vec))),
+        ("literal float32 (búsqueda)", bench(lambda: VectorParam(vec).getquoted(), args.number),
+         len(VectorParam(vec).getquoted())),
+        ("binario pgvector (ingesta)", bench(lambda: encode_vector(vec), args.number),
+         len(encode_vector(vec))),
+    ]
+
+    print(f"dim={args.dim}")
+    print(f"{'codificación':32s} {'µs/vector':>10s} {'bytes':>8s}")
+    for name, us, size in results:
+        print(f"{name:32s} {us:10.1f} {size:8d}")
+
+    # Lote completo de COPY binario (uuid, uuid, text, text, vector)
+    agent_id, document_id = uuid.uuid4(), uuid.uuid4()
+    rows = [(agent_id, document_id, "doc.pdf", "x" * 1000, vec)] * args.rows
+    types = ("uuid", "uuid", "text", "text", "vector")
+    us = bench(lambda: encode_copy_rows(rows, types), 5) / args.rows
+    print(f"{'fila COPY binaria completa':32s} {us:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
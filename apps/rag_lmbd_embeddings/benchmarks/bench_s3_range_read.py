@@ -0,0 +1,104 @@
+"""
+Benchmark: descarga completa vs lectura por rangos (lib/s3_range_file.py).
+
+Usa LocalDirectoryS3 como S3 (un directorio temporal) con latencia por
+request y ancho de banda simulados, y mide para cada modo el tiempo hasta
+conocer la cantidad de páginas, hasta el texto de la primera página y hasta
+extraer un rango de páginas (el trabajo de un shard del fan-out), junto con
+los bytes transferidos. Verifica además que el texto extraído sea el mismo.
+
+Uso (desde apps/rag_lmbd_embeddings):
+    python benchmarks/bench_s3_range_read.py --pdf /tmp/manual.pdf --pages 40-60
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.document import PdfDocument  # noqa: E402
+from lib.s3_range_file import LocalDirectoryS3  # noqa: E402
+
+
+class SlowLocalS3(LocalDirectoryS3):
+    """
+    LocalDirectoryS3 con latencia fija por request y ancho de banda acotado.
+    """
+
+    def __init__(self, root, latency_ms, mbps):
+        super().__init__(root)
+        self.latency = latency_ms / 1000
+        self.bytes_per_second = mbps * 1024 * 1024 / 8
+        self.bytes_sent = 0
+
+    def _transfer(self, size):
+        self.bytes_sent += size
+        time.sleep(self.latency + size / self.bytes_per_second)
+
+    def get_object(self, Bucket, Key, Range=None, IfMatch=None):
+        response = super().get_object(Bucket, Key, Range=Range, IfMatch=IfMatch)
+        self._transfer(response["ContentLength"])
+        return response
+
+    def download_file(self, Bucket, Key, Filename):
+        super().download_file(Bucket, Key, Filename)
+        self._transfer(os.path.getsize(Filename))
+
+
+def measure(s3, open_doc, first, last):
+    start = time.perf_counter()
+    with open_doc() as doc:
+        page_count = doc.page_count
+        t_count = time.perf_counter() - start
+        first_text = next(doc.iter_pages(workers=1))[0]
+        t_first = time.perf_counter() - start
+        texts = [text for text, _ in doc.iter_pages(workers=1, page_range=(first, last))]
+        t_range = time.perf_counter() - start
+    return page_count, first_text, texts, (t_count, t_first, t_range, s3.bytes_sent)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", required=True)
+    parser.add_argument("--pages", default="0-20", help="rango de páginas a extraer (inicio-fin)")
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--mbps", type=float, default=400)
+    parser.add_argument("--block-size", type=int, default=256 * 1024)
+    args = parser.parse_args()
+    first, last = (int(n) for n in args.pages.split("-"))
+
+    root = tempfile.mkdtemp()
+    try:
+        os.makedirs(os.path.join(root, "bucket"))
+        shutil.copyfile(args.pdf, os.path.join(root, "bucket", "doc.pdf"))
+
+        s3_download = SlowLocalS3(root, args.latency_ms, args.mbps)
+        pages, first_a, texts_a, download = measure(
+            s3_download,
+            lambda: PdfDocument.from_s3(s3_download, "bucket", "doc.pdf", local_dir=root),
+            first, last
+        )
+
+        s3_range = SlowLocalS3(root, args.latency_ms, args.mbps)
+        _, first_b, texts_b, ranged = measure(
+            s3_range,
+            lambda: PdfDocument.from_s3_range(s3_range, "bucket", "doc.pdf", block_size=args.block_size),
+            first, last
+        )
+    finally:
+        shutil.rmtree(root)
+
+    assert first_a == first_b and texts_a == texts_b, "El texto extraído difiere entre modos"
+
+    size = os.path.getsize(args.pdf)
+    print(f"PDF: {size / 1e6:.1f} MB, {pages} páginas; latencia {args.latency_ms:.0f} ms, {args.mbps:.0f} Mbps")
+    print(f"{'modo':10s} {'páginas (s)':>12s} {'1ª página (s)':>14s} {f'págs {first}-{last} (s)':>16s} {'MB leídos':>10s}")
+    for name, (t_count, t_first, t_range, sent) in (("descarga", download), ("rangos", ranged)):
+        print(f"{name:10s} {t_count:12.3f} {t_first:14.3f} {t_range:16.3f} {sent / 1e6:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark: chunking de un documento largo con muchos títulos.
+
+Compara el esquema anterior (RecursiveCharacterTextSplitter con un separador
+por título detectado delante de los separadores base) contra
+lib/text_splitter.StructureAwareSplitter (títulos como un único nivel, offsets).
+Sin títulos ambos producen los mismos chunks; se verifica también eso.
+
+Uso (desde apps/rag_lmbd_embeddings):
+    pip install -r benchmarks/requirements.txt
+    python benchmarks/bench_text_splitter.py --pages 500 --chunk-size 2500 --chunk-overlap 80
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter  # noqa: E402
+from bench_title_detection import make_document  # noqa: E402
+from lib.text_splitter import BASE_SEPARATORS, StructureAwareSplitter  # noqa: E402
+from lib.title_detector import detect_title_separators, find_title_lines  # noqa: E402
+
+
+def old_split(text, chunk_size, chunk_overlap, use_titles=True):
+    # Implementación anterior (index.py::_split_text + _build_separators)
+    titles = sorted(detect_title_separators(text), key=len, reverse=True) if use_titles else []
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=titles + BASE_SEPARATORS,
+        length_function=len,
+        is_separator_regex=False
+    )
+    return [c.strip() for c in splitter.split_text(text)]
+
+
+def new_split(text, chunk_size, chunk_overlap, use_titles=True):
+    titles = find_title_lines(text) if use_titles else ()
+    return StructureAwareSplitter(chunk_size, chunk_overlap).split_text(text, titles)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def describe(chunks):
+    sizes = [len(c) for c in chunks]
+    return f"{len(chunks):6d} chunks, media {sum(sizes) / len(sizes):7.1f}, máx {max(sizes):6d}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--titles-per-page", type=int, default=8)
+    parser.add_argument("--chunk-size", type=int, default=2500)
+    parser.add_argument("--chunk-overlap", type=int, default=80)
+    args = parser.parse_args()
+
+    text = make_document(args.pages, args.titles_per_page, 40)
+    size, overlap = args.chunk_size, args.chunk_overlap
+
+    # Sin títulos: misma salida
+    assert old_split(text, size, overlap, False) == new_split(text, size, overlap, False), \
+        "Sin títulos los chunks deberían ser idénticos"
+
+    old_s, old = timed(old_split, text, size, overlap)
+    new_s, new = timed(new_split, text, size, overlap)
+
+    print(f"documento: {args.pages} páginas, {len(text) / 1e6:.1f} MB, "
+          f"{len(detect_title_separators(text))} títulos únicos")
+    print(f"anterior (recursivo, 1 separador por título): {old_s * 1e3:9.1f} ms  {describe(old)}")
+    print(f"estructural lineal (offsets):                 {new_s * 1e3:9.1f} ms  {describe(new)}")
+    print(f"speedup: {old_s / new_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
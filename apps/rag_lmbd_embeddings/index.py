@@ -1,16 +1,60 @@
 import os
 import json
-import re
 import boto3
-import pdfplumber
-import psycopg2
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from botocore.config import Config
 from botocore.exceptions import ClientError
-import uuid
-import io
 import time
 import numpy as np
 from urllib.parse import unquote_plus
+from lib.embedding_pool import AdaptiveConcurrencyPool
+from lib.lazy import LazyObject, preload
+from lib.db_pool import ConnectionPool
+from lib.bulk_writer import ChunkBulkWriter
+from lib.pgvector_adapter import (
+    VECTOR_OPCLASSES,
+    VectorParam,
+    add_column_if_missing,
+    embedding_column_type,
+    invalidate_table_columns,
+)
+from lib.document import PDF_MODULES, PdfDocument, available_cpus
+from lib.pipeline import threaded, batched
+from lib.textract_reader import iter_textract_pages
+from lib.sharding import ShardPages, iter_process_results, merge_shards, shard_ranges
+from lib.title_detector import count_title_classes, detect_title_separators, find_title_lines
+from lib.text_splitter import StructureAwareSplitter
+from lib.tokenizer import get_tokenizer
+from lib.embedding_cache import EmbeddingCache, ensure_embedding_cache_table, text_hash
+from lib.checkpoint import CheckpointMismatchError, IngestionCheckpoint
+from lib.tenant_cache import VerifiedTenantCache, lock_tenant_schema
+from lib.ddb_client import DocumentStatus
+from lib.document_registry import (
+    CLAIM_ACQUIRED,
+    STATUS_COMPLETED,
+    STATUS_FAILED,
+    STATUS_PROCESSING,
+    claim_document,
+    DocumentInProgressError,
+    complete_document_update,
+    discard_legacy_duplicates,
+    discard_partial_document,
+    document_id_for,
+    ensure_registry_table,
+    find_completed_by_etag,
+    find_current_document,
+    mark_document,
+    touch_document,
+)
+from lib.incremental_index import (
+    PageRecorder,
+    diff_chunks,
+    ensure_incremental_tables,
+    load_chunk_hashes,
+    load_document_pages,
+    replace_document_pages,
+)
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import Counter, deque
 # AWS Session Setup (for local testing)
 AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
 AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID_DEV', "")
@@ -26,10 +70,38 @@ if AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY:
     })
 
 endpoint_url = f"https://s3.{AWS_REGION}.amazonaws.com"
-s3 = boto3.client('s3', endpoint_url=endpoint_url, **session_args)
 
-bedrock = boto3.client("bedrock-runtime", **session_args)
-textract = boto3.client('textract',  **session_args)
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "8"))
+
+# Los clientes AWS se crean en el primer uso (una invocación de shard no usa Textract,
+# un evento duplicado no usa Bedrock...). LAZY_INIT=false los crea en la fase de init
+# (SnapStart: quedan en el snapshot)
+LAZY_INIT = os.getenv("LAZY_INIT", "true").lower() == "true"
+
+s3 = LazyObject(lambda: boto3.client('s3', endpoint_url=endpoint_url, **session_args), "s3")
+
+# Los reintentos por throttling los maneja AdaptiveConcurrencyPool (AIMD),
+# por eso se desactivan los reintentos internos de botocore.
+bedrock = LazyObject(lambda: boto3.client(
+    "bedrock-runtime",
+    config=Config(
+        retries={"mode": "standard", "max_attempts": 1},
+        max_pool_connections=max(10, EMBED_MAX_CONCURRENCY),
+    ),
+    **session_args
+), "bedrock-runtime")
+textract = LazyObject(lambda: boto3.client('textract', **session_args), "textract")
+dynamodb = LazyObject(lambda: boto3.resource('dynamodb', **session_args), "dynamodb (resource)")
+dynamodb_client = LazyObject(lambda: boto3.client('dynamodb', **session_args), "dynamodb")
+# Las invocaciones sincrónicas de shards (fan-out) pueden durar minutos
+lambda_client = LazyObject(lambda: boto3.client(
+    'lambda',
+    config=Config(read_timeout=900, max_pool_connections=50),
+    **session_args
+), "lambda")
+
+if not LAZY_INIT:
+    preload(s3, bedrock, textract, dynamodb, dynamodb_client, lambda_client, *PDF_MODULES)
 
 # 🔐 Se deben pasar estas variables al Lambda (ENV VARS)
 DB_NAME = os.getenv("DB_NAME","postgres")
@@ -37,34 +109,171 @@ DB_USER = os.getenv("DB_USER","postgres")
 DB_PASSWORD = os.getenv("DB_PASSWORD","postgres")
 DB_HOST = os.getenv("DB_HOST","localhost")
 DB_PORT = os.getenv("DB_PORT", "5432")
+# Pool de conexiones reutilizado entre invocaciones calientes: conexiones inactivas
+# conservadas, y segundos de inactividad a partir de los cuales se validan antes de usarlas
+DB_POOL_MAX_IDLE = int(os.getenv("DB_POOL_MAX_IDLE", "8"))
+DB_POOL_HEALTH_CHECK_SECONDS = float(os.getenv("DB_POOL_HEALTH_CHECK_SECONDS", "30"))
 #EMBEDDINGS_MODEL = os.getenv("EMBEDDINGS_MODEL", "amazon.titan-embed-text-v2:0")
 EMBEDDINGS_MODEL = os.getenv("EMBEDDINGS_MODEL", "cohere.embed-v4:0")
 
 MAX_EMBED_TEXT_LENGTH = 20000
+# Cohere embed acepta hasta 96 textos por request
+EMBED_BATCH_MAX_TEXTS = int(os.getenv("EMBED_BATCH_MAX_TEXTS", "96"))
+EMBED_BATCH_MAX_CHARS = int(os.getenv("EMBED_BATCH_MAX_CHARS", "200000"))
+
+# Procesos para extraer páginas con pdfplumber (0 = CPUs disponibles, 1 = secuencial)
+PDF_EXTRACTION_WORKERS = int(os.getenv("PDF_EXTRACTION_WORKERS", "0")) or None
+
+# Extracción: "hybrid" (pdfplumber + OCR por página escaneada) o "textract" (documento completo)
+PDF_EXTRACTION_MODE = os.getenv("PDF_EXTRACTION_MODE", "hybrid")
+OCR_MAX_CONCURRENCY = int(os.getenv("OCR_MAX_CONCURRENCY", "4"))
+OCR_RENDER_DPI = int(os.getenv("OCR_RENDER_DPI", "200"))
+
+# Polling de Textract: backoff con jitter entre POLL_INITIAL y POLL_MAX, bajo un deadline total
+TEXTRACT_DEADLINE_SECONDS = float(os.getenv("TEXTRACT_DEADLINE_SECONDS", "600"))
+TEXTRACT_POLL_INITIAL_SECONDS = float(os.getenv("TEXTRACT_POLL_INITIAL_SECONDS", "1"))
+TEXTRACT_POLL_MAX_SECONDS = float(os.getenv("TEXTRACT_POLL_MAX_SECONDS", "10"))
+
+# Lectura del PDF: "download" (descarga completa a /tmp; extracción en varios
+# procesos) o "range" (GETs por rango bajo demanda con cache LRU de bloques: solo
+# se transfieren los bytes que se leen). Los shards del fan-out usan SHARD_READ_MODE.
+PDF_READ_MODE = os.getenv("PDF_READ_MODE", "download")
+SHARD_READ_MODE = os.getenv("SHARD_READ_MODE", "range")
+S3_RANGE_BLOCK_SIZE = int(os.getenv("S3_RANGE_BLOCK_SIZE", str(256 * 1024)))
+S3_RANGE_CACHE_BLOCKS = int(os.getenv("S3_RANGE_CACHE_BLOCKS", "256"))
+
+# Fan-out por rangos de páginas (extracción híbrida): los PDFs de al menos
+# FANOUT_MIN_PAGES páginas (0 = desactivado) se dividen en shards de SHARD_PAGES
+# páginas que se extraen y chunkean en paralelo: "lambda" (invocaciones
+# sincrónicas de este mismo Lambda) o "local" (procesos)
+FANOUT_MIN_PAGES = int(os.getenv("FANOUT_MIN_PAGES", "300"))
+SHARD_PAGES = int(os.getenv("SHARD_PAGES", "100"))
+SHARD_FUNCTION_NAME = os.getenv("SHARD_FUNCTION_NAME", os.getenv("AWS_LAMBDA_FUNCTION_NAME", ""))
+SHARD_EXECUTOR = os.getenv("SHARD_EXECUTOR", "lambda" if SHARD_FUNCTION_NAME else "local")
+SHARD_MAX_CONCURRENCY = int(os.getenv("SHARD_MAX_CONCURRENCY", "10"))
+
+# Registros (PDFs) de un mismo evento S3/SQS procesados en paralelo dentro de la invocación
+RECORD_MAX_CONCURRENCY = int(os.getenv("RECORD_MAX_CONCURRENCY", "4"))
+
+# Checkpoints de ingesta por documento (tablas de estado de DynamoDB, ver lib/ddb_client.py).
+# Desactivados por defecto: requieren ambas tablas y permisos dynamodb:GetItem /
+# PutItem / UpdateItem sobre ellas en el rol del Lambda
+CHECKPOINTS_ENABLED = os.getenv("CHECKPOINTS_ENABLED", "false").lower() == "true"
+DOCUMENT_STATUS_TABLE = os.getenv("DOCUMENT_STATUS_TABLE", "DocumentProcessingStatus")
+DOCUMENT_STATUS_HISTORY_TABLE = os.getenv("DOCUMENT_STATUS_HISTORY_TABLE", "DocumentStatusHistory")
+
+# Antes de que se agote el tiempo del Lambda (quedando este margen) la ingesta
+# se interrumpe después del lote confirmado y el resto se delega a una
+# invocación de continuación, hasta MAX_CONTINUATIONS veces por documento.
+# Desactivado por defecto: requiere lambda:InvokeFunction del rol sobre este mismo Lambda
+# (sin checkpoints la continuación retoma desde lo confirmado en Aurora)
+CONTINUATION_ENABLED = os.getenv("CONTINUATION_ENABLED", "false").lower() == "true"
+CONTINUATION_RESERVE_SECONDS = float(os.getenv("CONTINUATION_RESERVE_SECONDS", "90"))
+MAX_CONTINUATIONS = int(os.getenv("MAX_CONTINUATIONS", "10"))
+
+# Un registro PROCESSING sin actualizar por más de este tiempo se puede reclamar (timeout del Lambda)
+REGISTRY_STALE_SECONDS = int(os.getenv("REGISTRY_STALE_SECONDS", "900"))
+
+# Los chunks más cortos (en caracteres) se descartan
+MIN_CHUNK_CHARS = 50
+
+# Ventana del chunker en streaming (en múltiplos de chunk_size) y tamaño de colas del pipeline
+STREAM_WINDOW_CHUNKS = int(os.getenv("STREAM_WINDOW_CHUNKS", "16"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+
+# Chunking por tokens ("tokens") o por caracteres ("chars"). TOKENIZER:
+# "approx" (aproximación rápida, sin dependencias) | "tiktoken:<encoding>" | "hf:<modelo>"
+CHUNK_LENGTH_UNIT = os.getenv("CHUNK_LENGTH_UNIT", "tokens")
+tokenizer = get_tokenizer(os.getenv("TOKENIZER", "approx"))
+# Caracteres por token estimados, para dimensionar la ventana del chunker en streaming
+APPROX_CHARS_PER_TOKEN = 4
+
+# Inserción masiva: "copy" (COPY FROM STDIN) o "values" (execute_values)
+BULK_INSERT_METHOD = os.getenv("BULK_INSERT_METHOD", "copy")
+BULK_INSERT_BATCH_SIZE = int(os.getenv("BULK_INSERT_BATCH_SIZE", "500"))
+
+# Tipo de la columna embedding de los esquemas nuevos: "vector" (float32) o
+# "halfvec" (float16, mitad de almacenamiento; requiere pgvector >= 0.7).
+# Los esquemas existentes conservan su tipo: inserción y búsqueda lo leen del catálogo
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "vector")
+if EMBEDDING_STORAGE not in VECTOR_OPCLASSES:
+    raise ValueError(f"EMBEDDING_STORAGE inválido: {EMBEDDING_STORAGE} (vector | halfvec)")
+
+# Los esquemas nuevos guardan además embedding_bits BIT(1536) (cuantización binaria
+# con índice HNSW por Hamming): la consulta pre-filtra candidatos y re-rankea exacto
+BINARY_PREFILTER_ENABLED = os.getenv("BINARY_PREFILTER_ENABLED", "false").lower() == "true"
+
+# Dimensiones del prefijo Matryoshka (p. ej. 256) que los esquemas nuevos guardan en
+# embedding_low con su propio índice HNSW: primera pasada de la consulta (0 = desactivado)
+LOW_DIM_EMBEDDING_DIMS = int(os.getenv("LOW_DIM_EMBEDDING_DIMS", "0"))
+
+# Pares (tenant, agente) con esquema/agente ya verificados: se omite la verificación
+# en invocaciones calientes durante este tiempo (0 = verificar siempre)
+TENANT_CACHE_TTL_SECONDS = float(os.getenv("TENANT_CACHE_TTL_SECONDS", "300"))
+tenant_cache = VerifiedTenantCache(TENANT_CACHE_TTL_SECONDS)
+
+# Una nueva versión de un documento ya ingestado (mismo nombre) se re-indexa
+# incrementalmente sobre su document_id en lugar de ingestarse como documento nuevo
+INCREMENTAL_UPDATES_ENABLED = os.getenv("INCREMENTAL_UPDATES_ENABLED", "true").lower() == "true"
+# Veces que se re-intenta aplicar una actualización si otra actualización del mismo
+# documento confirmó mientras se embebía (y faltan embeddings para el nuevo diff)
+UPDATE_APPLY_ATTEMPTS = int(os.getenv("UPDATE_APPLY_ATTEMPTS", "3"))
+
+# Cache de embeddings por (modelo, sha256(texto)): LRU local + tabla por tenant
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+embedding_cache = EmbeddingCache(
+    EMBEDDINGS_MODEL,
+    max_local_entries=int(os.getenv("EMBEDDING_CACHE_LOCAL_ENTRIES", "20000"))
+)
+
+embedding_pool = AdaptiveConcurrencyPool(
+    max_concurrency=EMBED_MAX_CONCURRENCY,
+    initial_concurrency=int(os.getenv("EMBED_INITIAL_CONCURRENCY", "2")),
+)
+
+db_pool = ConnectionPool(
+    {
+        "dbname": DB_NAME,
+        "user": DB_USER,
+        "password": DB_PASSWORD,
+        "host": DB_HOST,
+        "port": DB_PORT,
+    },
+    max_idle=DB_POOL_MAX_IDLE,
+    health_check_after=DB_POOL_HEALTH_CHECK_SECONDS,
+)
+
 
 def get_connection():
-    return psycopg2.connect(
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        host=DB_HOST,
-        port=DB_PORT,
-    )
+    """
+    Conexión del pool del módulo: close() la devuelve al pool en lugar de cerrarla.
+    """
+    return db_pool.getconn()
 
 
 def ensure_tenant_schema_exists(tenant_id: str, agent_id: str):
     """
     Verifica si el esquema del tenant existe, y si no, lo crea junto con
     las tablas necesarias (agents, documents), los índices y un agente por defecto.
+
+    Los pares (tenant, agente) ya verificados por este proceso se omiten
+    (sin conexión ni consultas) hasta que vence TENANT_CACHE_TTL_SECONDS.
     
     Args:
         tenant_id: Identificador del tenant (se usará como nombre del esquema)
         agent_id: Identificador del agente para crear el registro por defecto
     """
+    tenant_cache.ensure(tenant_id, agent_id, lambda: _verify_tenant_schema(tenant_id, agent_id))
+
+
+def _verify_tenant_schema(tenant_id: str, agent_id: str):
     conn = get_connection()
     cur = conn.cursor()
     
     try:
+        # Serializar con otras invocaciones que crean / migran el mismo esquema
+        lock_tenant_schema(cur, tenant_id)
+
         # Verificar si el esquema existe
         cur.execute("""
             SELECT EXISTS(
@@ -78,7 +287,7 @@ def ensure_tenant_schema_exists(tenant_id: str, agent_id: str):
         if not schema_exists:
             print(f"[INFO] Creando esquema para tenant: {tenant_id}")
             
-            # Habilitar extensión pgvector (necesaria para tipo VECTOR)
+            # Habilitar extensión pgvector (necesaria para tipos VECTOR / HALFVEC)
             print("[INFO] Habilitando extensión pgvector...")
             cur.execute("CREATE EXTENSION IF NOT EXISTS vector")
             
@@ -104,18 +313,38 @@ def ensure_tenant_schema_exists(tenant_id: str, agent_id: str):
                     document_id     UUID NOT NULL,
                     document_name   TEXT NOT NULL,
                     chunk_text      TEXT NOT NULL,
-                    embedding       VECTOR(1536),
+                    chunk_hash      BYTEA,
+                    token_count     INT,
+                    embedding       {EMBEDDING_STORAGE.upper()}(1536),
+                    {"embedding_bits  BIT(1536)," if BINARY_PREFILTER_ENABLED else ""}
+                    {f"embedding_low   {EMBEDDING_STORAGE.upper()}({LOW_DIM_EMBEDDING_DIMS})," if LOW_DIM_EMBEDDING_DIMS else ""}
                     created_at      TIMESTAMP DEFAULT NOW()
                 )
             """)
             
-            # Crear índice para búsqueda vectorial (IVFFlat)
+            # Crear índice para búsqueda vectorial (IVFFlat, opclass según el tipo de la columna)
             cur.execute(f"""
                 CREATE INDEX IF NOT EXISTS idx_{tenant_id}_documents_embedding 
                 ON {tenant_id}.documents 
-                USING ivfflat (embedding vector_cosine_ops) 
+                USING ivfflat (embedding {VECTOR_OPCLASSES[EMBEDDING_STORAGE]}) 
                 WITH (lists = 100)
             """)
+
+            # Índice por distancia de Hamming para el pre-filtro binario
+            if BINARY_PREFILTER_ENABLED:
+                cur.execute(f"""
+                    CREATE INDEX IF NOT EXISTS idx_{tenant_id}_documents_embedding_bits
+                    ON {tenant_id}.documents
+                    USING hnsw (embedding_bits bit_hamming_ops)
+                """)
+
+            # Índice de la primera pasada de baja dimensión
+            if LOW_DIM_EMBEDDING_DIMS:
+                cur.execute(f"""
+                    CREATE INDEX IF NOT EXISTS idx_{tenant_id}_documents_embedding_low
+                    ON {tenant_id}.documents
+                    USING hnsw (embedding_low {VECTOR_OPCLASSES[EMBEDDING_STORAGE]})
+                """)
             
             # Crear índice para agents
             cur.execute(f"""
@@ -135,6 +364,15 @@ def ensure_tenant_schema_exists(tenant_id: str, agent_id: str):
                 ON {tenant_id}.documents(document_id)
             """)
             
+            # Crear registro de documentos (idempotencia por huella de contenido)
+            ensure_registry_table(cur, tenant_id)
+
+            # Crear cache de embeddings por (modelo, hash del texto)
+            ensure_embedding_cache_table(cur, tenant_id)
+
+            # Crear huellas por página para el re-indexado incremental
+            ensure_incremental_tables(cur, tenant_id)
+
             # Insertar agente por defecto
             default_prompt_template = f"""Eres un asistente especializado para el tenant {tenant_id}. 
 Responde basándote únicamente en el contexto proporcionado. Si no encuentras información relevante, indica que no tienes datos suficientes.
@@ -167,6 +405,16 @@ Responde con precisión y sin inventar información que no esté en el contexto.
             print(f"[INFO] Esquema {tenant_id} creado exitosamente con agente por defecto")
         else:
             print(f"[INFO] Esquema {tenant_id} ya existe")
+
+            # Esquemas creados antes del registro de documentos / cache de embeddings / re-indexado incremental
+            ensure_registry_table(cur, tenant_id)
+            ensure_embedding_cache_table(cur, tenant_id)
+            ensure_incremental_tables(cur, tenant_id)
+            # Solo si falta: el ALTER toma un lock exclusivo sobre documents (ver ddl.sql)
+            add_column_if_missing(cur, f"{tenant_id}.documents", "token_count", "INT")
+            conn.commit()
+            # Las columnas de documents pueden haber cambiado (ALTER o migración externa)
+            invalidate_table_columns(f"{tenant_id}.documents")
             
             # Verificar si el agente existe, si no, crearlo
             cur.execute(f"""
@@ -220,340 +468,1110 @@ Responde con precisión y sin inventar información que no esté en el contexto.
         conn.close()
 
 
-def normalize(v):
-    v = np.array(v, dtype=np.float32).squeeze()
-    n = np.linalg.norm(v)
-    return v if n == 0 else v / n
+def normalize_batch(matrix):
+    """
+    Normaliza (L2) todas las filas de una matriz de embeddings en una sola operación.
+    Las filas con norma 0 se devuelven sin modificar.
+    """
+    m = np.asarray(matrix, dtype=np.float32)
+    if m.ndim == 1:
+        m = m.reshape(1, -1)
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
 
 
-def embed(text: str):
-    if len(text) > MAX_EMBED_TEXT_LENGTH:
-        text = text[:MAX_EMBED_TEXT_LENGTH]
+def _pack_embed_batches(texts: list) -> list:
+    """
+    Agrupa los textos en lotes respetando el máximo de textos por request
+    y el máximo de caracteres totales por request.
+    Devuelve una lista de lotes, cada uno con tuplas (indice_original, texto).
+    """
+    batches = []
+    current = []
+    current_chars = 0
 
-    payload = {
-        "texts": [text],
-        "input_type": "search_document"
-    }
+    for i, text in enumerate(texts):
+        if len(text) > MAX_EMBED_TEXT_LENGTH:
+            text = text[:MAX_EMBED_TEXT_LENGTH]
 
-    response = bedrock.invoke_model(
-        modelId=EMBEDDINGS_MODEL,
-        body=json.dumps(payload),
-        contentType="application/json",
-        accept="application/json"
-    )
+        if current and (
+            len(current) >= EMBED_BATCH_MAX_TEXTS
+            or current_chars + len(text) > EMBED_BATCH_MAX_CHARS
+        ):
+            batches.append(current)
+            current = []
+            current_chars = 0
 
-    result = json.loads(response["body"].read())
+        current.append((i, text))
+        current_chars += len(text)
+
+    if current:
+        batches.append(current)
+
+    return batches
 
+
+def _parse_embeddings_matrix(result) -> list:
+    """
+    Extrae la matriz de embeddings (una fila por texto) de la respuesta del modelo.
+    """
     # ----- ADAPTACIÓN A TU CASO REAL -----
-    # El modelo está devolviendo algo así como:
-    # { "float": [[ ... ]] }
-    #
-    # Por lo tanto: tomar la primera clave y su primer vector.
+    # El modelo puede devolver:
+    # { "float": [[ ... ], [ ... ]] }
+    # { "embeddings": { "float": [[ ... ], [ ... ]] } }
+    # { "embeddings": [[ ... ], [ ... ]] }
     # --------------------------------------
-    if isinstance(result, dict) and len(result) == 1:
+    if isinstance(result, dict) and len(result) == 1 and "embeddings" not in result:
         key = list(result.keys())[0]
         raw = result[key]
 
         # caso típico: [[floats]]
         if isinstance(raw, list) and len(raw) > 0 and isinstance(raw[0], list):
-            vec = raw[0]
-        else:
-            raise RuntimeError(f"Formato inesperado para embedding en key '{key}': {raw}")
-
-    elif "embeddings" in result:
-        float_list = result["embeddings"]
-        vec = float_list["float"][0]
+            return raw
+        raise RuntimeError(f"Formato inesperado para embedding en key '{key}': {raw}")
 
+    if isinstance(result, dict) and "embeddings" in result:
+        embeddings = result["embeddings"]
+        if isinstance(embeddings, dict) and "float" in embeddings:
+            return embeddings["float"]
+        if isinstance(embeddings, list):
+            return embeddings
 
-    else:
-        raise RuntimeError(f"No se encontró un vector de embeddings en: {result}")
+    raise RuntimeError(f"No se encontró un vector de embeddings en: {result}")
 
-    # normalizar
-    return normalize(vec).tolist()
 
+def _invoke_embed_model(texts: list):
+    """
+    Envía un lote de textos al modelo de embeddings en un único request
+    y devuelve la matriz normalizada (float32, una fila por texto).
+    """
+    payload = {
+        "texts": texts,
+        "input_type": "search_document",
+        "embedding_types": ["float"]
+    }
 
-def semantic_search(tenant_id,query, k=3):
-    # Generar embedding desde el LLM
-    q_emb = embed(query)
+    response = bedrock.invoke_model(
+        modelId=EMBEDDINGS_MODEL,
+        body=json.dumps(payload),
+        contentType="application/json",
+        accept="application/json"
+    )
 
-    # Convertir la lista de floats al formato textual esperado por pgvector: [x,y,z,...]
-    q_emb_str = "[" + ",".join(str(x) for x in q_emb) + "]"
+    result = json.loads(response["body"].read())
+    matrix = np.asarray(_parse_embeddings_matrix(result), dtype=np.float32)
 
-    conn = get_connection()
-    cur = conn.cursor()
+    if matrix.ndim != 2 or matrix.shape[0] != len(texts):
+        raise RuntimeError(
+            f"El modelo devolvió {matrix.shape[0] if matrix.ndim == 2 else 0} embeddings "
+            f"para {len(texts)} textos"
+        )
 
-    # Hacer la búsqueda semántica casteando explícitamente a vector
-    cur.execute(f"""
-        SELECT 
-            chunk_text, 
-            embedding <=> %s::vector AS distance
-        FROM {tenant_id}.documents
-        ORDER BY embedding <=> %s::vector
-        LIMIT %s;
-    """, (q_emb_str, q_emb_str, k))
+    return normalize_batch(matrix)
 
-    return cur.fetchall()
 
-def pdf_has_more_than_50_pages(bucket, key):
-    """
-    Detecta si un PDF tiene más de 50 páginas usando pdfplumber.
-    Retorna True si tiene más de 50, False en caso contrario.
+def embed_batch(texts: list):
     """
-    # 1️⃣ Leer PDF desde S3
-    pdf_obj = s3.get_object(Bucket=bucket, Key=key)
-    pdf_bytes = pdf_obj["Body"].read()
-
-    # 2️⃣ Usar pdfplumber para contar páginas
-    try:
-        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-            num_pages = len(pdf.pages)
-            print(f"[INFO] Páginas detectadas: {num_pages}")
-            return num_pages > 50
+    Genera embeddings para muchos textos agrupándolos en requests multi-texto.
 
-    except Exception as e:
-        print(f"[ERROR] No se pudieron detectar páginas con pdfplumber: {e}")
-        return False
+    Los lotes se arman por cantidad de textos (EMBED_BATCH_MAX_TEXTS) y por
+    caracteres totales (EMBED_BATCH_MAX_CHARS).
 
-def extract_pdf_pages(bucket, key):
-    """
-    Llama a Textract detect_document_text para un PDF en S3
-    y devuelve un array donde cada elemento es el texto de una página.
+    Returns:
+        np.ndarray float32 de forma (len(texts), dim), normalizado fila a fila
+        y en el mismo orden que `texts`.
     """
-    
-    pages = {}  # page_number -> texto
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+
+    batches = _pack_embed_batches(texts)
+    print(f"[INFO] Embeddings: {len(texts)} textos en {len(batches)} requests")
 
-    # 1) Iniciar el análisis asincrónico
-    response = textract.start_document_text_detection(
-        DocumentLocation={
-            'S3Object': {'Bucket': bucket, 'Name': key}
-        }
+    # Los lotes se envían en paralelo; el pool devuelve las matrices en orden
+    matrices = embedding_pool.map(
+        lambda batch: _invoke_embed_model([t for _, t in batch]),
+        batches
     )
 
-    job_id = response['JobId']
+    result = np.empty((len(texts), matrices[0].shape[1]), dtype=np.float32)
+    for batch, matrix in zip(batches, matrices):
+        result[[i for i, _ in batch]] = matrix
 
-    # 2) Polling hasta que termine
-    while True:
-        result = textract.get_document_text_detection(JobId=job_id)
-        status = result['JobStatus']
+    return result
 
-        if status in ['SUCCEEDED', 'FAILED']:
-            break
-        
-        time.sleep(1)
 
-    if status == 'FAILED':
-        raise Exception("Textract job failed")
+def embed(text: str):
+    return embed_batch([text])[0].tolist()
 
-    # 3) Construir un array por página
-    pages = {}
-    next_token = None
 
-    while True:
-        if next_token:
-            result = textract.get_document_text_detection(JobId=job_id, NextToken=next_token)
-        else:
-            result = textract.get_document_text_detection(JobId=job_id)
-
-        for block in result['Blocks']:
-            if block['BlockType'] == 'LINE':
-                page = block['Page']
-                if page not in pages:
-                    pages[page] = []
-                pages[page].append(block['Text'])
-
-        next_token = result.get('NextToken')
-        if not next_token:
-            break
-
-    # Convertir cada página en un string completo
-    ordered_pages = [ "\n".join(pages[p]) for p in sorted(pages.keys()) ]
-    return ordered_pages
-
-# Patrones para detectar títulos y subtítulos
-TITLE_PATTERNS = [
-    r'^#{1,6}\s+.+$',                           # Markdown headers
-    r'^\d+\.[\d\.]*\s+[A-ZÁÉÍÓÚÑ].*$',          # Numeración: 1. Título, 1.1 Subtítulo
-    r'^[IVXLCDM]+\.\s+.+$',                     # Numeración romana: I. Título
-    r'^[A-Z][A-Z\s]{3,}$',                      # TÍTULOS EN MAYÚSCULAS (mín 4 chars)
-    r'^(?:Capítulo|Sección|Artículo|Anexo)\s+\d*.*$',  # Palabras clave de sección
-    r'^(?:Chapter|Section|Article|Annex)\s+\d*.*$',    # Palabras clave en inglés
-]
-
-def _detect_title_separators(text: str) -> list:
-    """
-    Detecta patrones de títulos en el texto y genera separadores personalizados.
-    """
-    separators = []
-    lines = text.split('\n')
-    
-    for line in lines:
-        line_stripped = line.strip()
-        if not line_stripped:
-            continue
-        for pattern in TITLE_PATTERNS:
-            if re.match(pattern, line_stripped, re.MULTILINE):
-                # Crear separador único para este título
-                sep = f"\n{line_stripped}\n"
-                if sep not in separators and len(line_stripped) > 3:
-                    separators.append(sep)
-                break
-    
-    return separators
+def semantic_search(tenant_id,query, k=3):
+    # Generar embedding desde el LLM (float32, se envía sin pasar por listas de Python)
+    q_vec = embed_batch([query])[0]
+
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        # El query se castea al tipo de la columna (vector / halfvec) para usar su índice
+        q_emb = VectorParam(q_vec, embedding_column_type(cur, f"{tenant_id}.documents"))
+
+        cur.execute(f"""
+            SELECT 
+                chunk_text, 
+                embedding <=> %s AS distance
+            FROM {tenant_id}.documents
+            ORDER BY embedding <=> %s
+            LIMIT %s;
+        """, (q_emb, q_emb, k))
+
+        return cur.fetchall()
+    finally:
+        conn.close()
+
+def open_pdf_document(s3_client, bucket, key, read_mode="download", workers=None, size=None, etag=None) -> PdfDocument:
+    """
+    Abre el PDF de S3: descarga completa ("download") o lectura bajo demanda por rangos ("range").
+    """
+    if read_mode == "range":
+        return PdfDocument.from_s3_range(
+            s3_client, bucket, key,
+            size=size,
+            etag=etag,
+            block_size=S3_RANGE_BLOCK_SIZE,
+            cache_blocks=S3_RANGE_CACHE_BLOCKS
+        )
+    return PdfDocument.from_s3(s3_client, bucket, key, workers=workers, etag=etag)
+
+
+def iter_pdf_pages(bucket, key, job_id=None, on_job_started=None):
+    """
+    Llama a Textract detect_document_text para un PDF en S3 y genera el texto
+    de cada página a medida que llegan los resultados.
+    Con `job_id` reutiliza los resultados de un job ya ejecutado.
+    """
+    return iter_textract_pages(
+        textract,
+        bucket,
+        key,
+        deadline_seconds=TEXTRACT_DEADLINE_SECONDS,
+        poll_initial=TEXTRACT_POLL_INITIAL_SECONDS,
+        poll_max=TEXTRACT_POLL_MAX_SECONDS,
+        job_id=job_id,
+        on_job_started=on_job_started
+    )
+
 
 def _get_chunk_config(num_pages: int) -> dict:
     """
     Retorna configuración óptima de chunking basada en el número de páginas.
     Prioridad 1: Tamaño del archivo
+
+    Con CHUNK_LENGTH_UNIT="tokens" los tamaños se miden con el tokenizer
+    configurado (TOKENIZER); con "chars", en caracteres como antes.
+
+    El extractor ya no depende del tamaño: el OCR se decide página a página
+    (ver iter_hybrid_page_texts).
     """
+    tokens = CHUNK_LENGTH_UNIT == "tokens"
+
     if num_pages <= 10:
         # Archivos muy pequeños: chunks finos para máxima precisión semántica
-        return {
-            "chunk_size": 800,
-            "chunk_overlap": 150,
-            "use_textract": False
-        }
+        size, overlap = (256, 48) if tokens else (800, 150)
     elif num_pages <= 50:
         # Archivos medianos: balance entre precisión y eficiencia
-        return {
-            "chunk_size": 1200,
-            "chunk_overlap": 150,
-            "use_textract": False
-        }
+        size, overlap = (384, 48) if tokens else (1200, 150)
     elif num_pages <= 150:
         # Archivos grandes: chunks más amplios
-        return {
-            "chunk_size": 1800,
-            "chunk_overlap": 100,
-            "use_textract": True
-        }
+        size, overlap = (512, 32) if tokens else (1800, 100)
     else:
         # Archivos muy grandes: maximizar eficiencia
-        return {
-            "chunk_size": 2500,
-            "chunk_overlap": 80,
-            "use_textract": True
-        }
-
-def _build_separators(custom_title_seps: list) -> list:
-    """
-    Construye lista de separadores priorizando títulos y subtítulos.
-    Prioridad 2: Títulos y subtítulos como puntos de corte preferidos
-    """
-    # Separadores base ordenados por prioridad semántica
-    base_separators = [
-        "\n\n\n",           # Triple salto = cambio de sección mayor
-        "\n\n",             # Doble salto = nuevo párrafo/sección
-        "\n",               # Salto de línea simple
-        ". ",               # Fin de oración
-        "? ",               # Pregunta
-        "! ",               # Exclamación
-        "; ",               # Punto y coma
-        ", ",               # Coma
-        " ",                # Espacio
-    ]
-    
-    # Insertar separadores de títulos detectados al inicio (máxima prioridad)
-    # Ordenar por longitud descendente para que títulos más específicos se procesen primero
-    sorted_titles = sorted(custom_title_seps, key=len, reverse=True)
-    
-    return sorted_titles + base_separators
+        size, overlap = (768, 24) if tokens else (2500, 80)
+
+    return {
+        "chunk_size": size,
+        "chunk_overlap": overlap,
+        "length_unit": CHUNK_LENGTH_UNIT
+    }
 
-def _get_page_count(bucket: str, key: str) -> int:
+
+def _chunk_length_function(config: dict):
     """
-    Obtiene el número de páginas del PDF.
+    Función de largo (texto, inicio, fin) para el splitter según la unidad de la configuración.
     """
-    pdf_obj = s3.get_object(Bucket=bucket, Key=key)
-    pdf_bytes = pdf_obj["Body"].read()
-    
+    return tokenizer.count if config.get("length_unit") == "tokens" else None
+
+def ocr_page_image(png_bytes: bytes) -> str:
+    """
+    OCR sincrónico de una página renderizada con Textract detect_document_text.
+    """
+    response = textract.detect_document_text(Document={"Bytes": png_bytes})
+    lines = [b["Text"] for b in response["Blocks"] if b["BlockType"] == "LINE"]
+    return "\n".join(lines)
+
+
+def iter_hybrid_page_texts(doc: PdfDocument, page_indices=None, page_range=None):
+    """
+    Extracción híbrida por página: pdfplumber para las páginas con capa de texto
+    y OCR (Textract) solo para las páginas escaneadas. Los OCR corren en paralelo
+    (hasta OCR_MAX_CONCURRENCY) y los textos se generan en orden de página.
+    Con `page_indices` solo se extraen esas páginas; con `page_range`
+    (inicio, fin), las de ese rango.
+    """
+    in_flight = deque()
+    ocr_pages = 0
+    if page_indices is not None:
+        indices = page_indices
+    else:
+        indices = range(*page_range) if page_range is not None else range(doc.page_count)
+    pages = doc.iter_pages(workers=PDF_EXTRACTION_WORKERS, page_indices=page_indices, page_range=page_range)
+
+    with ThreadPoolExecutor(max_workers=OCR_MAX_CONCURRENCY) as executor:
+        for page_index, (text, needs_ocr) in zip(indices, pages):
+            if needs_ocr:
+                ocr_pages += 1
+                png = doc.render_page_png(page_index, resolution=OCR_RENDER_DPI)
+                in_flight.append(executor.submit(ocr_page_image, png))
+            else:
+                in_flight.append(text)
+
+            # Entregar en orden lo que ya está listo, acotando los OCR en vuelo
+            while in_flight and (
+                not isinstance(in_flight[0], Future)
+                or in_flight[0].done()
+                or len(in_flight) > OCR_MAX_CONCURRENCY * 2
+            ):
+                head = in_flight.popleft()
+                yield head.result() if isinstance(head, Future) else head
+
+        while in_flight:
+            head = in_flight.popleft()
+            yield head.result() if isinstance(head, Future) else head
+
+    print(f"[INFO] Páginas enviadas a OCR: {ocr_pages}")
+
+
+def _page_fragments(page_texts):
+    """
+    Fragmentos del modo híbrido: el texto de cada página seguido del separador entre páginas.
+    """
+    for page_text in page_texts:
+        if page_text.strip():
+            yield page_text
+        yield "\n\n"  # Separador entre páginas
+
+
+def _recorded_pages(doc: PdfDocument, page_texts, page_recorder: PageRecorder, skip=()):
+    for page_index, page_text in enumerate(page_texts):
+        if page_index not in skip:
+            page_recorder.add(page_index, doc.page_hash(page_index), page_text)
+        yield page_text
+
+
+def _reusable_pages(doc: PdfDocument, stored_pages: list) -> dict:
+    """
+    Páginas guardadas por una invocación anterior que siguen siendo válidas
+    (misma posición y misma huella): {indice: texto}.
+    """
+    return {
+        page_number: page_text
+        for page_number, page_hash, page_text in stored_pages
+        if page_number < doc.page_count and doc.page_hash(page_number) == page_hash
+    }
+
+
+def _resumed_page_texts(doc: PdfDocument, reusable: dict):
+    """
+    Texto de cada página al retomar una ingesta: las páginas reutilizables se
+    leen de lo guardado y solo el resto se extrae (en streaming y en orden).
+    """
+    missing = [i for i in range(doc.page_count) if i not in reusable]
+    extracted = iter_hybrid_page_texts(doc, missing) if missing else iter(())
+    print(f"[INFO] Páginas reutilizadas del checkpoint: {len(reusable)}, a extraer: {len(missing)}")
+
+    for page_index in range(doc.page_count):
+        yield reusable[page_index] if page_index in reusable else next(extracted)
+
+
+def iter_text_fragments(
+    doc: PdfDocument,
+    config: dict,
+    page_recorder: PageRecorder = None,
+    stored_pages=None,
+    textract_job_id=None,
+    on_textract_job=None,
+):
+    """
+    Genera el texto del documento en fragmentos (página a página).
+    La concatenación de los fragmentos es el texto completo del documento.
+
+    En modo híbrido, si se indica `page_recorder`, guarda la huella y el texto
+    de cada página para el re-indexado incremental de futuras versiones.
+    Al retomar una ingesta, `stored_pages` (páginas ya guardadas) evita volver a
+    extraerlas y `textract_job_id` reutiliza el job de Textract ya ejecutado.
+    """
+    if PDF_EXTRACTION_MODE == "textract":
+        # Modo forzado: Textract asincrónico sobre el documento completo
+        first = True
+        for page_text in iter_pdf_pages(doc.bucket, doc.key, textract_job_id, on_textract_job):
+            if not page_text or not page_text.strip():
+                continue
+            yield page_text if first else "\n\n" + page_text
+            first = False
+    else:
+        # Modo híbrido: pdfplumber + OCR solo de páginas escaneadas
+        reusable = _reusable_pages(doc, stored_pages) if stored_pages else {}
+        page_texts = _resumed_page_texts(doc, reusable) if reusable else iter_hybrid_page_texts(doc)
+        if page_recorder is not None:
+            page_texts = _recorded_pages(doc, page_texts, page_recorder, skip=reusable)
+        yield from _page_fragments(page_texts)
+
+
+def _split_text(text: str, config: dict) -> tuple:
+    """
+    Divide un texto priorizando como puntos de corte los títulos detectados en él
+    (Prioridad 2), luego párrafos, líneas y oraciones.
+    Devuelve (spans, titulos_por_clase): los chunks son offsets (ChunkSpan) sobre `text`.
+    """
+    # Detectar títulos (una pasada, con su clase)
+    title_lines = find_title_lines(text)
+
+    splitter = StructureAwareSplitter(
+        config["chunk_size"],
+        config["chunk_overlap"],
+        length_function=_chunk_length_function(config)
+    )
+    spans = splitter.split_spans(text, title_lines)
+
+    return spans, count_title_classes(detect_title_separators(text, title_lines))
+
+
+def iter_semantic_chunks(fragments, config: dict):
+    """
+    Chunker en streaming: acumula fragmentos hasta una ventana de
+    STREAM_WINDOW_CHUNKS * chunk_size caracteres, la divide y emite todos los
+    chunks menos el último, que se conserva (con el texto que le sigue) como
+    inicio de la próxima ventana. Así el overlap entre ventanas se mantiene y la
+    memoria no depende del tamaño del documento.
+    """
+    window = config["chunk_size"] * STREAM_WINDOW_CHUNKS
+    if config.get("length_unit") == "tokens":
+        window *= APPROX_CHARS_PER_TOKEN
+    buffer = []
+    buffer_len = 0
+    total_chunks = 0
+    total_titles = Counter()
+
+    def _clean(text, spans):
+        # Los spans ya vienen sin espacios de borde: solo se copian los que se emiten
+        for span in spans:
+            if span.end - span.start >= MIN_CHUNK_CHARS:
+                yield span.text(text)
+
+    for fragment in fragments:
+        buffer.append(fragment)
+        buffer_len += len(fragment)
+        if buffer_len < window:
+            continue
+
+        text = "".join(buffer)
+        spans, titles = _split_text(text, config)
+        total_titles += titles
+
+        # El último chunk puede continuar en los próximos fragmentos
+        tail_start = spans[-1].start if spans else len(text)
+        for chunk in _clean(text, spans[:-1]):
+            total_chunks += 1
+            yield chunk
+
+        buffer = [text[tail_start:]]
+        buffer_len = len(buffer[0])
+
+    text = "".join(buffer)
+    if text.strip():
+        spans, titles = _split_text(text, config)
+        total_titles += titles
+        for chunk in _clean(text, spans):
+            total_chunks += 1
+            yield chunk
+
+    print(f"[INFO] Detectados {sum(total_titles.values())} patrones de títulos/subtítulos: {dict(total_titles)}")
+    print(f"[INFO] Generados {total_chunks} chunks semánticos")
+
+
+def _document_chunk_config(doc: PdfDocument) -> dict:
+    # Prioridad 1: Tamaño del archivo → determina configuración de chunks
+    num_pages = doc.page_count
+    config = _get_chunk_config(num_pages)
+
+    print(
+        f"[INFO] PDF con {num_pages} páginas → chunk_size={config['chunk_size']} {config['length_unit']} "
+        f"({tokenizer.name if config['length_unit'] == 'tokens' else 'len'}), extracción={PDF_EXTRACTION_MODE}"
+    )
+
+    return config
+
+
+def _use_fanout(doc: PdfDocument) -> bool:
+    # Textract procesa el documento completo en un único job: no se divide
+    return PDF_EXTRACTION_MODE != "textract" and 0 < FANOUT_MIN_PAGES <= doc.page_count
+
+
+def extract_page_range(doc: PdfDocument, start, end, tenant_id=None, document_id=None) -> ShardPages:
+    """
+    Trabajo de un shard del fan-out: extrae las páginas [start, end) y las
+    guarda para el re-indexado incremental (si se indica el documento).
+    El chunking lo hace el reductor (ver lib/sharding.merge_shards).
+    """
+    page_texts = list(iter_hybrid_page_texts(doc, page_range=(start, end)))
+
+    if document_id is not None:
+        page_recorder = PageRecorder(get_connection, tenant_id, document_id)
+        try:
+            for offset, page_text in enumerate(page_texts):
+                page_recorder.add(start + offset, doc.page_hash(start + offset), page_text)
+            page_recorder.close()
+        except Exception:
+            page_recorder.discard()
+            raise
+
+    return ShardPages(start, page_texts)
+
+
+def _extract_page_range_local(local_path, bucket, key, etag, start, end, tenant_id, document_id):
+    # Proceso hijo (fan-out local): handle propio sobre el mismo archivo, o
+    # lectura por rangos con un cliente S3 propio (no se comparte el del padre)
+    # de la misma versión que leyó el padre
+    if local_path is not None:
+        doc = PdfDocument(local_path, workers=1)
+    else:
+        s3_client = boto3.client('s3', endpoint_url=endpoint_url, **session_args)
+        doc = open_pdf_document(s3_client, bucket, key, "range", etag=etag)
+    with doc:
+        return extract_page_range(doc, start, end, tenant_id, document_id)
+
+
+def _invoke_shard(doc: PdfDocument, start, end, tenant_id, document_id) -> ShardPages:
+    """
+    Procesa un shard en otra invocación (sincrónica) de este mismo Lambda,
+    que lee la misma versión del objeto que el padre (IfMatch con su ETag).
+    """
+    response = lambda_client.invoke(
+        FunctionName=SHARD_FUNCTION_NAME,
+        InvocationType="RequestResponse",
+        Payload=json.dumps({
+            "shard": {
+                "bucket": doc.bucket,
+                "key": doc.key,
+                "etag": doc.etag,
+                "page_start": start,
+                "page_end": end,
+                "tenant_id": tenant_id,
+                "document_id": document_id
+            }
+        }).encode("utf-8")
+    )
+    payload = json.loads(response["Payload"].read())
+    if response.get("FunctionError"):
+        raise RuntimeError(f"Falló el shard de páginas {start + 1}-{end}: {payload}")
+    return ShardPages(payload["start"], payload["texts"])
+
+
+def _iter_shard_results(doc: PdfDocument, tenant_id, document_id, reusable: dict):
+    """
+    Páginas de los shards en orden. Los shards con todas sus páginas ya
+    guardadas (al retomar una ingesta) no se vuelven a extraer; el resto se
+    reparte entre invocaciones del Lambda o procesos locales.
+    """
+    ranges = shard_ranges(doc.page_count, SHARD_PAGES)
+    remote = [
+        (start, end) for start, end in ranges
+        if not all(i in reusable for i in range(start, end))
+    ]
+    print(f"[INFO] Fan-out: {doc.page_count} páginas en {len(ranges)} shards de {SHARD_PAGES} "
+          f"({len(remote)} a extraer, executor={SHARD_EXECUTOR})")
+
+    if SHARD_EXECUTOR == "lambda":
+        executor = ThreadPoolExecutor(max_workers=max(1, min(SHARD_MAX_CONCURRENCY, len(remote))))
+        futures = [
+            executor.submit(_invoke_shard, doc, start, end, tenant_id, document_id)
+            for start, end in remote
+        ]
+        remote_results = (future.result() for future in futures)
+    else:
+        executor = None
+        remote_results = iter_process_results(
+            _extract_page_range_local,
+            [
+                (doc.local_path, doc.bucket, doc.key, doc.etag, start, end, tenant_id, document_id)
+                for start, end in remote
+            ],
+            max_workers=min(SHARD_MAX_CONCURRENCY, available_cpus())
+        )
+
     try:
-        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-            return len(pdf.pages)
-    except Exception as e:
-        print(f"[ERROR] No se pudieron detectar páginas: {e}")
-        return 0
+        remote_set = set(remote)
+        for start, end in ranges:
+            if (start, end) in remote_set:
+                yield next(remote_results)
+            else:
+                yield ShardPages(start, [reusable[i] for i in range(start, end)])
+    finally:
+        remote_results.close()
+        if executor is not None:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
 
-def _extract_text_with_structure(local_path: str) -> str:
+
+def iter_sharded_chunks(doc: PdfDocument, config: dict, tenant_id=None, document_id=None, stored_pages=None):
     """
-    Extrae texto preservando estructura visual para mejor detección de títulos.
+    Chunks del documento (en orden) con fan-out por rangos de páginas: los
+    shards extraen sus páginas en paralelo y el reductor (lib/sharding.merge_shards)
+    las chunkea en orden con iter_semantic_chunks, igual que sin fan-out.
     """
-    full_text_parts = []
-    
-    with pdfplumber.open(local_path) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text() or ""
-            if page_text.strip():
-                full_text_parts.append(page_text)
-            full_text_parts.append("\n\n")  # Separador entre páginas
-    
-    return "".join(full_text_parts)
+    reusable = _reusable_pages(doc, stored_pages) if stored_pages else {}
+    shards = _iter_shard_results(doc, tenant_id, document_id, reusable)
+    return merge_shards(shards, lambda page_texts: iter_semantic_chunks(_page_fragments(page_texts), config))
 
-def generate_semantic_chunks(bucket, key, local_path=None):
+
+def generate_semantic_chunks(doc: PdfDocument):
     """
-    Devuelve chunks semánticos optimizados.
+    Devuelve chunks semánticos optimizados a partir del handle del documento.
     
     Prioridad 1: Tamaño del archivo → determina configuración de chunks
     Prioridad 2: Títulos y subtítulos → puntos de corte semánticos preferidos
     """
-    # 1️⃣ Obtener número de páginas y configuración óptima
-    num_pages = _get_page_count(bucket, key)
-    config = _get_chunk_config(num_pages)
-    
-    print(f"[INFO] PDF con {num_pages} páginas → chunk_size={config['chunk_size']}, use_textract={config['use_textract']}")
-    
-    chunks = []
-    
-    # 2️⃣ Extraer texto según configuración
-    if config["use_textract"]:
-        # PDFs grandes: usar Textract por página
-        page_texts = extract_pdf_pages(bucket, key)
-        full_text = "\n\n".join([t for t in page_texts if t and t.strip()])
+    config = _document_chunk_config(doc)
+    if _use_fanout(doc):
+        return list(iter_sharded_chunks(doc, config))
+    return list(iter_semantic_chunks(iter_text_fragments(doc, config), config))
+
+
+def embed_with_cache(texts: list, conn=None, tenant_id=None, cache_stats=None):
+    """
+    Igual que embed_batch, pero consulta primero el cache de embeddings
+    (local + {tenant}.embedding_cache) en bloque y solo llama a Bedrock por
+    los textos que faltan. Los nuevos embeddings se guardan en el cache.
+
+    Args:
+        cache_stats: dict opcional donde se acumulan "hits" y "misses"
+    """
+    hashes = [text_hash(t[:MAX_EMBED_TEXT_LENGTH]) for t in texts]
+    found = embedding_cache.lookup(conn, tenant_id, hashes)
+
+    # Textos a embeber (sin repetir hashes dentro del grupo)
+    miss_index = {}
+    for i, h in enumerate(hashes):
+        if h not in found and h not in miss_index:
+            miss_index[h] = i
+
+    if miss_index:
+        embedded = embed_batch([texts[i] for i in miss_index.values()])
+        new_items = list(zip(miss_index.keys(), embedded))
+        embedding_cache.store(conn, tenant_id, new_items)
+        found.update(new_items)
+
+    if cache_stats is not None:
+        cache_stats["hits"] = cache_stats.get("hits", 0) + len(texts) - len(miss_index)
+        cache_stats["misses"] = cache_stats.get("misses", 0) + len(miss_index)
+
+    return np.stack([found[h] for h in hashes]) if texts else embed_batch(texts)
+
+
+def iter_embedded_chunks(chunks, tenant_id=None, cache_stats=None):
+    """
+    Agrupa chunks y los embebe por grupos (cada grupo usa el pool concurrente).
+    Si se indica tenant_id, usa el cache de embeddings del tenant.
+    Genera tuplas (chunk, embedding) en orden.
+    """
+    group_size = EMBED_BATCH_MAX_TEXTS * EMBED_MAX_CONCURRENCY
+    conn = None
+    try:
+        for group in batched(chunks, group_size):
+            if tenant_id and EMBEDDING_CACHE_ENABLED:
+                if conn is None:
+                    conn = get_connection()
+                embeddings = embed_with_cache(group, conn, tenant_id, cache_stats)
+            else:
+                embeddings = embed_batch(group)
+            for chunk, embedding in zip(group, embeddings):
+                yield chunk, embedding
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+def _skip_committed(chunks, committed_hashes: list):
+    """
+    Saltea los primeros chunks, ya confirmados por una invocación anterior,
+    verificando por hash que el re-chunkeo produzca exactamente los mismos.
+    """
+    index = 0
+    for chunk in chunks:
+        if index < len(committed_hashes):
+            if text_hash(chunk) != committed_hashes[index]:
+                raise CheckpointMismatchError(f"El chunk {index} no coincide con el ya confirmado")
+            index += 1
+            continue
+        yield chunk
+
+    if index < len(committed_hashes):
+        raise CheckpointMismatchError(
+            f"Se generaron {index} chunks pero había {len(committed_hashes)} confirmados"
+        )
+
+
+def _load_resume_state(tenant_id, document_id) -> tuple:
+    """
+    Estado confirmado en Aurora de una ingesta a retomar:
+    (hashes de los chunks en orden de inserción, páginas guardadas).
+    """
+    conn = get_connection()
+    try:
+        committed_hashes = [h for _, h in sorted(load_chunk_hashes(conn, tenant_id, document_id))]
+        stored_pages = [] if PDF_EXTRACTION_MODE == "textract" else load_document_pages(conn, tenant_id, document_id)
+    finally:
+        conn.close()
+    return committed_hashes, stored_pages
+
+
+def ingest_document(
+    doc: PdfDocument,
+    tenant_id,
+    agent_id,
+    document_id,
+    file_name,
+    checkpoint: IngestionCheckpoint = None,
+    resume: dict = None,
+    deadline: float = None,
+) -> dict:
+    """
+    Pipeline en streaming: páginas → chunks → embeddings → inserción.
+
+    Cada etapa corre en su propio thread conectado por colas acotadas, de modo
+    que la memoria se mantiene acotada y los chunks quedan consultables
+    (commit por grupo) mientras se siguen procesando páginas posteriores.
+
+    Args:
+        checkpoint: se actualiza después de cada grupo confirmado
+        resume: checkpoint a retomar (IngestionCheckpoint.load): las páginas
+            guardadas no se vuelven a extraer y los chunks ya confirmados se
+            verifican por hash y no se vuelven a embeber
+        deadline: instante (time.monotonic) a partir del cual la ingesta se
+            interrumpe después del grupo confirmado (stats["interrupted"])
+    """
+    config = _document_chunk_config(doc)
+    cache_stats = {"hits": 0, "misses": 0}
+    page_recorder = PageRecorder(get_connection, tenant_id, document_id)
+
+    committed_hashes, stored_pages = [], []
+    artifact = (resume or {}).get("extraction_artifact") or ""
+    textract_job_id = artifact[len("textract:"):] if artifact.startswith("textract:") else None
+    if resume is not None:
+        committed_hashes, stored_pages = _load_resume_state(tenant_id, document_id)
+        print(f"[INFO] Retomando {document_id}: {len(committed_hashes)} chunks confirmados "
+              f"(checkpoint: {resume.get('chunks_committed')}), {len(stored_pages)} páginas guardadas")
+
+    if PDF_EXTRACTION_MODE != "textract":
+        artifact = f"postgres:{tenant_id}.document_pages"
+
+    def _save_checkpoint(status, committed):
+        if checkpoint is not None:
+            checkpoint.save(
+                status,
+                extraction_artifact=artifact,
+                chunks_committed=committed,
+                pages_stored=len(stored_pages) + page_recorder.pages_written
+            )
+
+    def _on_textract_job(job_id):
+        nonlocal artifact
+        artifact = f"textract:{job_id}"
+        _save_checkpoint(DocumentStatus.TEXT_EXTRACTION_IN_PROGRESS.value, len(committed_hashes))
+
+    if _use_fanout(doc):
+        # Documento muy grande: shards por rango de páginas en paralelo (guardan sus propias páginas)
+        document_chunks = iter_sharded_chunks(doc, config, tenant_id, document_id, stored_pages)
+        fragments = None
     else:
-        # PDFs pequeños/medianos: usar pdfplumber local
-        if local_path is None:
-            raise Exception("local_path es obligatorio para PDFs pequeños/medianos.")
-        full_text = _extract_text_with_structure(local_path)
-    
-    if not full_text.strip():
-        return []
-    
-    # 3️⃣ Detectar títulos y construir separadores personalizados
-    title_separators = _detect_title_separators(full_text)
-    separators = _build_separators(title_separators)
-    
-    print(f"[INFO] Detectados {len(title_separators)} patrones de títulos/subtítulos")
-    
-    # 4️⃣ Crear splitter con configuración optimizada
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=config["chunk_size"],
-        chunk_overlap=config["chunk_overlap"],
-        separators=separators,
-        length_function=len,
-        is_separator_regex=False
+        fragments = threaded(
+            iter_text_fragments(doc, config, page_recorder, stored_pages, textract_job_id, _on_textract_job),
+            maxsize=PIPELINE_QUEUE_SIZE,
+            name="extract"
+        )
+        document_chunks = iter_semantic_chunks(fragments, config)
+
+    chunks = threaded(
+        _skip_committed(document_chunks, committed_hashes),
+        maxsize=EMBED_BATCH_MAX_TEXTS * PIPELINE_QUEUE_SIZE,
+        name="chunk",
+        upstream=fragments
+    )
+    embedded = threaded(
+        iter_embedded_chunks(chunks, tenant_id, cache_stats),
+        maxsize=EMBED_BATCH_MAX_TEXTS * PIPELINE_QUEUE_SIZE,
+        name="embed",
+        upstream=chunks
     )
-    
-    # 5️⃣ Generar chunks
-    raw_chunks = splitter.split_text(full_text)
-    
-    # 6️⃣ Limpiar y filtrar chunks vacíos o muy pequeños
-    min_chunk_size = 50  # Mínimo de caracteres útiles
-    for chunk in raw_chunks:
-        cleaned = chunk.strip()
-        if cleaned and len(cleaned) >= min_chunk_size:
-            chunks.append(cleaned)
-    
-    print(f"[INFO] Generados {len(chunks)} chunks semánticos")
-    
-    return chunks
 
-def to_pgvector(vec):
-    return "[" + ",".join(str(x) for x in vec) + "]"
+    conn = None
+    writer = None
+    committed = len(committed_hashes)
+    interrupted = False
+    try:
+        try:
+            for group in batched(embedded, BULK_INSERT_BATCH_SIZE):
+                if writer is None:
+                    conn = get_connection()
+                    writer = ChunkBulkWriter(
+                        conn,
+                        tenant_id,
+                        batch_size=BULK_INSERT_BATCH_SIZE,
+                        method=BULK_INSERT_METHOD
+                    )
 
-def handler(event, context):
-    print(f"Event received: {event}")
+                # Las páginas se guardan antes que los chunks: al retomar, todo chunk
+                # confirmado se puede re-generar sin volver a extraer sus páginas
+                page_recorder.flush()
+                writer.write_many(
+                    (agent_id, document_id, file_name, chunk, text_hash(chunk), tokenizer.count(chunk), embedding)
+                    for chunk, embedding in group
+                )
+                # Cada lote se confirma: queda consultable mientras siguen procesándose páginas
+                writer.flush()
+                # Heartbeat del registro: la ingesta sigue viva (ver claim_document)
+                touch_document(conn, tenant_id, agent_id, document_id)
+                committed += len(group)
+                _save_checkpoint(DocumentStatus.BEDROCK_IN_PROGRESS.value, committed)
+
+                if deadline is not None and time.monotonic() >= deadline:
+                    interrupted = True
+                    print(f"[INFO] Tiempo de la invocación agotándose: ingesta interrumpida con {committed} chunks confirmados")
+                    break
+        finally:
+            # Detiene y espera todas las etapas: ningún thread sigue extrayendo
+            # (ni guardando páginas) cuando se cierran el writer y el recorder
+            embedded.close()
+
+        if writer is not None:
+            writer.close()
+        page_recorder.close()
+    except Exception as e:
+        page_recorder.discard()
+        if conn is not None:
+            conn.rollback()
+        written = writer.rows_written if writer is not None else 0
+        print(f"[ERROR] Error en el pipeline de ingesta ({written} chunks ya confirmados): {str(e)}")
+        raise
+    finally:
+        if conn is not None:
+            conn.close()
+
+    total = cache_stats["hits"] + cache_stats["misses"]
+    cache_stats["hit_ratio"] = round(cache_stats["hits"] / total, 3) if total else 0.0
+    print(f"[INFO] Cache de embeddings: {cache_stats}")
+    print(f"[INFO] Pool de embeddings: {embedding_pool.stats()}")
+
+    stats = writer.stats() if writer is not None else {"rows": 0}
+    stats["embedding_cache"] = cache_stats
+    stats["resumed_from"] = len(committed_hashes)
+    stats["chunks_committed"] = committed
+    stats["interrupted"] = interrupted
+    return stats
+
+def _updated_page_texts(doc: PdfDocument, stored_pages: list) -> tuple:
+    """
+    Texto de cada página de la nueva versión: las páginas cuya huella ya está
+    guardada (en cualquier posición) reutilizan su texto; solo las nuevas o
+    modificadas se extraen (pdfplumber / OCR).
+    Devuelve (textos, huellas, cantidad_de_paginas_extraidas).
+    """
+    page_hashes = doc.page_hashes()
+    stored_by_hash = {h: text for _, h, text in stored_pages}
+    changed = [i for i, h in enumerate(page_hashes) if h not in stored_by_hash]
+
+    extracted = dict(zip(changed, iter_hybrid_page_texts(doc, changed)))
+    page_texts = [
+        extracted[i] if i in extracted else stored_by_hash[h]
+        for i, h in enumerate(page_hashes)
+    ]
+
+    print(f"[INFO] Páginas modificadas: {len(changed)} de {len(page_hashes)}")
+    return page_texts, page_hashes, len(changed)
+
+
+def _embed_missing(chunks, chunk_hashes, positions, embeddings, tenant_id, cache_stats):
+    """
+    Embebe los chunks de `positions` cuyo hash todavía no está en `embeddings`
+    ({hash: embedding}, se actualiza). Sin transacciones abiertas: solo la
+    conexión del cache de embeddings.
+    """
+    missing = {}
+    for i in positions:
+        if chunk_hashes[i] not in embeddings:
+            missing.setdefault(chunk_hashes[i], chunks[i])
+    if not missing:
+        return
+
+    texts = list(missing.values())
+    if EMBEDDING_CACHE_ENABLED:
+        cache_conn = get_connection()
+        try:
+            vectors = embed_with_cache(texts, cache_conn, tenant_id, cache_stats)
+        finally:
+            cache_conn.close()
+    else:
+        vectors = embed_batch(texts)
+    embeddings.update(zip(missing.keys(), vectors))
+
+
+def _apply_document_update(
+    tenant_id, agent_id, document_id, file_name, fingerprint, chunks, chunk_hashes, embeddings, pages
+):
+    """
+    Transacción corta de una actualización incremental: toma el lock del
+    documento, vuelve a leer sus chunks y páginas (otra actualización pudo
+    confirmar mientras se embebía) y aplica el diff.
+
+    Args:
+        pages: (huellas, textos) de las páginas de la nueva versión, o None (Textract)
+
+    Returns:
+        (ids_borrados, posiciones_insertadas, paginas_escritas), o None si el diff
+        vigente requiere chunks sin embedding (no se aplica nada)
+    """
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            # Serializa actualizaciones concurrentes del mismo documento
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (document_id,))
+
+        existing = load_chunk_hashes(conn, tenant_id, document_id)
+        to_delete, to_insert = diff_chunks(existing, chunk_hashes)
+        if any(chunk_hashes[i] not in embeddings for i in to_insert):
+            conn.rollback()
+            return None
+        print(f"[INFO] Chunks: {len(existing)} guardados, {len(chunks)} nuevos → "
+              f"{len(to_delete)} a borrar, {len(to_insert)} a insertar")
+
+        with conn.cursor() as cur:
+            if to_delete:
+                cur.execute(f"DELETE FROM {tenant_id}.documents WHERE id = ANY(%s)", (to_delete,))
+            pages_written = 0
+            if pages is not None:
+                page_hashes, page_texts = pages
+                stored_pages = load_document_pages(conn, tenant_id, document_id)
+                pages_written = replace_document_pages(
+                    cur, tenant_id, document_id, stored_pages, page_hashes, page_texts
+                )
+            complete_document_update(cur, tenant_id, agent_id, document_id, fingerprint)
+            legacy_deleted = discard_legacy_duplicates(cur, tenant_id, agent_id, file_name, document_id)
+            if legacy_deleted:
+                print(f"[INFO] {legacy_deleted} chunks de ingestas anteriores de {file_name} eliminados")
+
+        writer = ChunkBulkWriter(
+            conn,
+            tenant_id,
+            batch_size=BULK_INSERT_BATCH_SIZE,
+            method=BULK_INSERT_METHOD,
+            commit=False
+        )
+        writer.write_many(
+            (agent_id, document_id, file_name, chunks[i], chunk_hashes[i],
+             tokenizer.count(chunks[i]), embeddings[chunk_hashes[i]])
+            for i in to_insert
+        )
+        writer.close()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    return to_delete, to_insert, pages_written
+
+
+def update_document(doc: PdfDocument, tenant_id, agent_id, document_id, file_name, fingerprint) -> dict:
+    """
+    Re-indexado incremental de una nueva versión de un documento ya ingestado
+    (mismo nombre, distinto contenido), conservando su document_id.
+
+    - Páginas: se comparan huellas de contenido (sin extraer texto); solo las
+      páginas nuevas o modificadas se extraen, el resto reutiliza el texto guardado.
+    - Chunks: se re-chunkea el texto y se comparan hashes contra los chunks
+      guardados; solo se embeben e insertan los nuevos y se borran los que ya no están.
+    - Extracción y embeddings corren fuera de toda transacción; borrados,
+      inserciones, páginas y registro se aplican después en una única
+      transacción corta (ver _apply_document_update): la versión anterior
+      sigue consultable hasta el commit.
+    """
+    config = _document_chunk_config(doc)
+    cache_stats = {"hits": 0, "misses": 0}
+
+    try:
+        conn = get_connection()
+        try:
+            stored_pages = [] if PDF_EXTRACTION_MODE == "textract" else load_document_pages(conn, tenant_id, document_id)
+            existing = load_chunk_hashes(conn, tenant_id, document_id)
+        finally:
+            conn.close()
+
+        if PDF_EXTRACTION_MODE == "textract":
+            # Textract procesa el documento completo: solo se ahorra en chunks/embeddings
+            pages, pages_extracted = None, doc.page_count
+            fragments = iter_text_fragments(doc, config)
+        else:
+            page_texts, page_hashes, pages_extracted = _updated_page_texts(doc, stored_pages)
+            pages = (page_hashes, page_texts)
+            fragments = _page_fragments(page_texts)
+
+        chunks = list(iter_semantic_chunks(fragments, config))
+        chunk_hashes = [text_hash(chunk) for chunk in chunks]
+
+        embeddings = {}
+        _, to_insert = diff_chunks(existing, chunk_hashes)
+        _embed_missing(chunks, chunk_hashes, to_insert, embeddings, tenant_id, cache_stats)
+
+        for attempt in range(1, UPDATE_APPLY_ATTEMPTS + 1):
+            applied = _apply_document_update(
+                tenant_id, agent_id, document_id, file_name, fingerprint,
+                chunks, chunk_hashes, embeddings, pages
+            )
+            if applied is not None:
+                break
+            if attempt == UPDATE_APPLY_ATTEMPTS:
+                raise RuntimeError(
+                    f"{document_id} cambió durante {UPDATE_APPLY_ATTEMPTS} intentos de actualización"
+                )
+            # Otra actualización confirmó mientras se embebía: embeber lo que ahora falta
+            print(f"[INFO] {document_id} cambió durante la actualización: se recalcula el diff")
+            _embed_missing(chunks, chunk_hashes, range(len(chunks)), embeddings, tenant_id, cache_stats)
+    except Exception as e:
+        print(f"[ERROR] Error en el re-indexado incremental de {document_id}: {str(e)}")
+        raise
+
+    to_delete, to_insert, pages_written = applied
+    return {
+        "mode": "update",
+        "pages": doc.page_count,
+        "pages_extracted": pages_extracted,
+        "pages_written": pages_written,
+        "chunks": len(chunks),
+        "chunks_deleted": len(to_delete),
+        "chunks_inserted": len(to_insert),
+        "embedding_cache": cache_stats,
+    }
+
+
+def _prepare_tenant(tenant_id, agent_id, etag):
+    """
+    Asegura esquema/agente y devuelve el document_id de una ingesta completa
+    previa con el mismo ETag (o None).
+    """
+    ensure_tenant_schema_exists(tenant_id, agent_id)
+
+    conn = get_connection()
+    try:
+        return find_completed_by_etag(conn, tenant_id, agent_id, etag)
+    finally:
+        conn.close()
+
+
+def _mark_registry(tenant_id, agent_id, fingerprint, status):
+    conn = get_connection()
+    try:
+        mark_document(conn, tenant_id, agent_id, fingerprint, status)
+    except Exception as e:
+        print(f"[ERROR] No se pudo actualizar el registro del documento a {status}: {str(e)}")
+    finally:
+        conn.close()
+
+
+def _discard_partial(tenant_id, document_id):
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            deleted = discard_partial_document(cur, tenant_id, document_id)
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"[INFO] {deleted} chunks parciales eliminados de {document_id}")
+
+
+def _checkpoint_for(document_id, fingerprint):
+    if not CHECKPOINTS_ENABLED:
+        return None
+    return IngestionCheckpoint(
+        document_id,
+        fingerprint,
+        dynamodb.Table(DOCUMENT_STATUS_TABLE),
+        dynamodb.Table(DOCUMENT_STATUS_HISTORY_TABLE),
+        dynamodb_client,
+        actor="rag_lmbd_embeddings"
+    )
+
+
+def _invocation_deadline(context):
+    """
+    Instante (time.monotonic) en el que hay que dejar de procesar para poder
+    delegar el resto a una continuación antes del timeout, o None.
+    """
+    if not CONTINUATION_ENABLED or context is None or not hasattr(context, "get_remaining_time_in_millis"):
+        return None
+    return time.monotonic() + context.get_remaining_time_in_millis() / 1000 - CONTINUATION_RESERVE_SECONDS
+
+
+def _hand_off(context, record, document_id, fingerprint, continuations, checkpoint):
+    """
+    Delega el resto de la ingesta a una nueva invocación (asincrónica) de este
+    mismo Lambda, que la retoma desde el checkpoint.
+    """
+    if continuations > MAX_CONTINUATIONS:
+        raise RuntimeError(f"Se alcanzó el máximo de {MAX_CONTINUATIONS} continuaciones para {document_id}")
+
+    if checkpoint is not None:
+        checkpoint.save(DocumentStatus.BEDROCK_IN_PROGRESS.value, continuations=continuations)
+
+    lambda_client.invoke(
+        FunctionName=context.invoked_function_arn,
+        InvocationType="Event",
+        Payload=json.dumps({
+            "continuation": {
+                "record": record,
+                "document_id": document_id,
+                "fingerprint": fingerprint,
+                "continuations": continuations
+            }
+        }).encode("utf-8")
+    )
+    print(f"[INFO] Continuación {continuations} de {document_id} delegada")
+
+
+def _duplicate_result(key, document_id):
+    return {
+        "key": key,
+        "status": "duplicate",
+        "message": "PDF ya procesado anteriormente",
+        "document_id": document_id
+    }
+
+
+def process_s3_record(record, extraction_workers=None, context=None, deadline=None, continuation=None) -> dict:
+    """
+    Procesa un registro S3 (un PDF) de punta a punta y devuelve su resultado.
+    Lanza excepción si el procesamiento falla.
+
+    Args:
+        extraction_workers: procesos de extracción para este documento
+            (None = CPUs disponibles)
+        context / deadline: contexto del Lambda e instante límite (time.monotonic);
+            al alcanzarlo la ingesta se delega a una invocación de continuación
+        continuation: datos de la continuación que se está ejecutando (o None)
+    """
     start_time = time.time()
-    
-    # 1️⃣ Obtener bucket y key del evento S3
-    record = event["Records"][0]
+
+    # 1️⃣ Obtener bucket y key del registro S3
     bucket = record["s3"]["bucket"]["name"]
     # Decodificar caracteres URL-encoded (espacios, ñ, acentos, etc.)
     key_raw = record["s3"]["object"]["key"]
@@ -567,50 +1585,269 @@ def handler(event, context):
     tenant_id = parts[0]       # "tenant_name"
     agent_id = parts[1]        # "agent_uuid"
     file_name = parts[-1]      # "documento.pdf"
-    document_id = str(uuid.uuid4())  
+    etag = record["s3"]["object"].get("eTag")
+
+    with ThreadPoolExecutor(max_workers=1) as setup_executor:
+        # 2️⃣ Asegurar esquema/agente y buscar una ingesta previa por ETag (en paralelo con la descarga)
+        setup_future = setup_executor.submit(_prepare_tenant, tenant_id, agent_id, etag)
+
+        # 3️⃣ Descargar PDF a /tmp una sola vez (handle compartido por todas las etapas)
+        try:
+            doc = open_pdf_document(
+                s3, bucket, key, PDF_READ_MODE,
+                workers=extraction_workers,
+                size=record["s3"]["object"].get("size"),
+                etag=etag
+            )
+            print("HEAD OK")
+        except ClientError as e:
+            print("HEAD ERROR:", e.response)
+            raise
+
+        try:
+            existing_document_id = setup_future.result()
+        except Exception:
+            doc.close()
+            raise
+
+    with doc:
+        if existing_document_id:
+            print(f"[INFO] Documento ya ingestado (ETag {etag}): {existing_document_id}")
+            return _duplicate_result(key, existing_document_id)
+
+        # 4️⃣ Huella del contenido → document_id determinístico y registro idempotente
+        fingerprint = doc.sha256()
+        document_id = document_id_for(tenant_id, agent_id, fingerprint)
+        update_mode = False
+        continuations = 0
+
+        if continuation is not None:
+            # El documento ya fue reclamado por la invocación que delegó la continuación
+            if continuation["fingerprint"] != fingerprint:
+                print(f"[INFO] {key} cambió desde que se inició la ingesta: se descarta la continuación")
+                return {"key": key, "status": "superseded", "document_id": continuation["document_id"]}
+            document_id = continuation["document_id"]
+            continuations = continuation.get("continuations", 0)
+            checkpoint = _checkpoint_for(document_id, fingerprint)
+            resume = (checkpoint.load() if checkpoint is not None else None) or {}
+            _mark_registry(tenant_id, agent_id, fingerprint, STATUS_PROCESSING)
+        else:
+            conn = get_connection()
+            try:
+                # Nueva versión de un documento ya ingestado con el mismo nombre → actualización incremental
+                current = find_current_document(conn, tenant_id, agent_id, file_name) if INCREMENTAL_UPDATES_ENABLED else None
+                if current is not None:
+                    document_id = current[0]
+                    update_mode = current[1] != fingerprint
+
+                # Ingesta previa interrumpida (timeout o error) de esta misma versión → se retoma
+                checkpoint = _checkpoint_for(document_id, fingerprint)
+                resume = checkpoint.load() if checkpoint is not None and not update_mode else None
+
+                claim = claim_document(
+                    conn, tenant_id, agent_id, fingerprint, etag, document_id, file_name,
+                    stale_seconds=REGISTRY_STALE_SECONDS,
+                    discard_partial=not update_mode and resume is None
+                )
+            finally:
+                conn.close()
+
+            if claim == STATUS_PROCESSING:
+                # Otra invocación lo está ingestando: falla reintentable (batchItemFailures),
+                # el reintento lo reclama si esa ingesta se abandona
+                raise DocumentInProgressError(
+                    f"{key} (sha256 {fingerprint}) se está ingestando en otra invocación: {document_id}"
+                )
+            if claim != CLAIM_ACQUIRED:
+                print(f"[INFO] Documento duplicado (sha256 {fingerprint}): {document_id}")
+                return _duplicate_result(key, document_id)
+
+            if resume is not None:
+                continuations = resume.get("continuations") or 0
+            elif checkpoint is not None:
+                checkpoint.save(
+                    DocumentStatus.RECEIVED.value,
+                    extraction_artifact="",
+                    chunks_committed=0,
+                    pages_stored=0,
+                    continuations=0
+                )
 
-    # 2️⃣ Descargar PDF a /tmp
-    local_path = f"/tmp/{key.split('/')[-1]}"
-    try:
-        s3.download_file(bucket, key, local_path)
-        print("HEAD OK")
-    except ClientError as e:
-        print("HEAD ERROR:", e.response)
+        # 5️⃣ Extraer → chunkear → embeber → insertar en Aurora PostgreSQL
+        try:
+            if update_mode:
+                # Solo páginas y chunks modificados, en una transacción
+                print(f"[INFO] Nueva versión de {file_name}: re-indexado incremental de {document_id}")
+                stats = update_document(doc, tenant_id, agent_id, document_id, file_name, fingerprint)
+            else:
+                # Ingesta completa en streaming (retomando desde el checkpoint si lo hay)
+                try:
+                    stats = ingest_document(
+                        doc, tenant_id, agent_id, document_id, file_name,
+                        checkpoint=checkpoint, resume=resume, deadline=deadline
+                    )
+                except CheckpointMismatchError as e:
+                    print(f"[INFO] No se puede retomar {document_id} ({str(e)}): se reinicia la ingesta")
+                    _discard_partial(tenant_id, document_id)
+                    stats = ingest_document(
+                        doc, tenant_id, agent_id, document_id, file_name,
+                        checkpoint=checkpoint, deadline=deadline
+                    )
 
-    chunks = generate_semantic_chunks(bucket, key, local_path)
-    
-    # 3️⃣ Asegurar que el esquema del tenant y el agente existen
-    ensure_tenant_schema_exists(tenant_id, agent_id)
-    
-    # 4️⃣ Insertar embeddings en Aurora PostgreSQL
-    conn = get_connection()
-    cur = conn.cursor()
-    
-    for chunk in chunks:
-        embedding = embed(chunk)
-                
-        cur.execute(
-            f"""
-            INSERT INTO {tenant_id}.documents (
-                agent_id,
-                document_id,
-                document_name,
-                chunk_text,
-                embedding
-            )
-            VALUES (%s, %s, %s, %s, %s)
-            """,
-            (agent_id, document_id, file_name, chunk, to_pgvector(embedding))
+            if stats.get("interrupted"):
+                # 6️⃣ Sin tiempo para terminar: delegar el resto a una continuación
+                _hand_off(context, record, document_id, fingerprint, continuations + 1, checkpoint)
+        except Exception as e:
+            # El error puede deberse a un esquema borrado / modificado: se vuelve a verificar
+            tenant_cache.invalidate(tenant_id)
+            invalidate_table_columns(f"{tenant_id}.documents")
+            _mark_registry(tenant_id, agent_id, fingerprint, STATUS_FAILED)
+            if checkpoint is not None:
+                checkpoint.save(DocumentStatus.PROCESS_FAILED.value, error=f"{type(e).__name__}: {e}")
+            raise
+
+        if stats.get("interrupted"):
+            _mark_registry(tenant_id, agent_id, fingerprint, STATUS_PROCESSING)
+            return {
+                "key": key,
+                "status": "continued",
+                "message": "Ingesta delegada a una invocación de continuación",
+                "document_id": document_id,
+                "chunks_committed": stats["chunks_committed"]
+            }
+
+        if not update_mode:
+            _mark_registry(tenant_id, agent_id, fingerprint, STATUS_COMPLETED)
+        if checkpoint is not None:
+            checkpoint.save(DocumentStatus.PROCESS_COMPLETED.value, chunks_committed=stats.get("chunks_committed", 0))
+
+    print(f"[INFO] Chunks insertados ({key}): {stats}")
+
+    elapsed_time = time.time() - start_time
+    print(f"[INFO] {key} procesado en {elapsed_time:.2f} segundos")
+
+    return {
+        "key": key,
+        "status": "processed",
+        "message": "PDF procesado correctamente",
+        "document_id": document_id,
+        "seconds": round(elapsed_time, 2)
+    }
+
+
+def process_shard(shard: dict) -> dict:
+    """
+    Extrae un rango de páginas de un PDF (fan-out) y devuelve su texto para
+    el reductor de la invocación principal.
+    """
+    start_time = time.time()
+    with open_pdf_document(s3, shard["bucket"], shard["key"], SHARD_READ_MODE, etag=shard.get("etag")) as doc:
+        result = extract_page_range(
+            doc,
+            shard["page_start"],
+            shard["page_end"],
+            shard.get("tenant_id"),
+            shard.get("document_id")
         )
 
-    conn.commit()
-    cur.close()
-    conn.close()
+    print(f"[INFO] Shard {shard['key']} páginas {shard['page_start'] + 1}-{shard['page_end']}: "
+          f"extraídas en {time.time() - start_time:.2f} segundos")
+    return result._asdict()
+
+
+def _iter_event_records(event):
+    """
+    Genera (message_id, registro_s3) para cada registro del evento:
+    - notificación S3 directa: message_id None
+    - SQS (notificaciones S3 encoladas): un mensaje puede traer varios
+      registros S3; los s3:TestEvent no traen registros y se ignoran.
+      Un body inválido se genera como (message_id, None) para reportarlo fallido.
+    """
+    for record in event.get("Records", []):
+        if record.get("eventSource") != "aws:sqs":
+            yield None, record
+            continue
+
+        try:
+            body = json.loads(record["body"])
+        except (KeyError, ValueError) as e:
+            print(f"[ERROR] Mensaje SQS {record.get('messageId')} con body inválido: {str(e)}")
+            yield record.get("messageId"), None
+            continue
+
+        s3_records = body.get("Records", [])
+        if not s3_records:
+            print(f"[INFO] Mensaje SQS {record.get('messageId')} sin registros S3 (evento {body.get('Event')}), se ignora")
+        for s3_record in s3_records:
+            yield record["messageId"], s3_record
+
 
+def _process_record_safe(message_id, record, extraction_workers, context, deadline):
+    if record is None:
+        return {"message_id": message_id, "status": "failed", "error": "body inválido"}
+    try:
+        result = process_s3_record(record, extraction_workers, context, deadline)
+    except Exception as e:
+        key = record.get("s3", {}).get("object", {}).get("key")
+        print(f"[ERROR] Falló el procesamiento de {key}: {type(e).__name__}: {str(e)}")
+        result = {"key": key, "status": "failed", "error": f"{type(e).__name__}: {e}"}
+    result["message_id"] = message_id
+    return result
+
+
+def handler(event, context):
+    print(f"Event received: {event}")
+    start_time = time.time()
+    deadline = _invocation_deadline(context)
+
+    if "shard" in event:
+        # Shard del fan-out de un PDF grande (invocado por otra instancia de este Lambda)
+        return process_shard(event["shard"])
+
+    if "continuation" in event:
+        # Continuación de una ingesta que no terminó en la invocación anterior
+        continuation = event["continuation"]
+        result = process_s3_record(
+            continuation["record"], PDF_EXTRACTION_WORKERS, context, deadline, continuation
+        )
+        return {"statusCode": 200, "body": json.dumps({"message": result.get("message", ""), "results": [result]})}
+
+    records = list(_iter_event_records(event))
+    is_sqs = any(message_id is not None for message_id, _ in records)
+
+    # Registros en paralelo dentro de la invocación, acotados por RECORD_MAX_CONCURRENCY;
+    # los procesos de extracción se reparten entre los documentos concurrentes
+    concurrency = max(1, min(RECORD_MAX_CONCURRENCY, len(records)))
+    extraction_workers = PDF_EXTRACTION_WORKERS
+    if concurrency > 1 and extraction_workers is None:
+        extraction_workers = max(1, available_cpus() // concurrency)
+
+    print(f"[INFO] Registros: {len(records)} (concurrencia {concurrency})")
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(
+            lambda item: _process_record_safe(item[0], item[1], extraction_workers, context, deadline),
+            records
+        ))
+
+    failed = [r for r in results if r["status"] == "failed"]
     elapsed_time = time.time() - start_time
-    print(f"[INFO] Handler completado en {elapsed_time:.2f} segundos")
+    print(f"[INFO] Handler completado en {elapsed_time:.2f} segundos: "
+          f"{len(results) - len(failed)} ok, {len(failed)} fallidos")
+
+    if is_sqs:
+        # Respuesta parcial de lote: SQS solo reintenta los mensajes fallidos
+        failed_ids = list(dict.fromkeys(r["message_id"] for r in failed))
+        return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in failed_ids]}
+
+    if failed:
+        # Invocación asíncrona desde S3: el reintento reprocesa el evento, y los
+        # documentos ya ingestados se detectan como duplicados
+        raise RuntimeError(f"Fallaron {len(failed)} de {len(results)} registros: {failed}")
 
     return {
         "statusCode": 200,
-        "body": json.dumps({"message": "PDF procesado correctamente"})
+        "body": json.dumps({
+            "message": "PDF procesado correctamente" if len(results) == 1 else "PDFs procesados correctamente",
+            "results": results
+        })
     }
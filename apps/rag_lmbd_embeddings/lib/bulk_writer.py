@@ -0,0 +1,186 @@
+# lib/bulk_writer.py
+import io
+import time
+
+import psycopg2
+from psycopg2.extras import execute_values
+from lib.logger import setup_logger
+from lib.pgvector_adapter import (
+    VECTOR_OPCLASSES,
+    BitParam,
+    VectorParam,
+    column_dimension,
+    embedding_column_type,
+    encode_copy_rows,
+    table_column_types,
+    truncate_embedding,
+)
+
+logger = setup_logger(__name__)
+
+DOCUMENT_COLUMNS = (
+    "agent_id", "document_id", "document_name", "chunk_text", "chunk_hash", "token_count", "embedding"
+)
+DOCUMENT_COLUMN_TYPES = ("uuid", "uuid", "text", "text", "bytea", "int4")
+# Copia cuantizada a 1 bit por dimensión (pre-filtro por Hamming en la búsqueda)
+BINARY_EMBEDDING_COLUMN = "embedding_bits"
+# Prefijo Matryoshka re-normalizado (primera pasada de baja dimensión en la búsqueda)
+LOW_DIM_EMBEDDING_COLUMN = "embedding_low"
+
+
+class ChunkBulkWriter:
+    """
+    Inserta chunks en {tenant}.documents en lotes.
+
+    - method="copy": cada lote se envía con COPY ... FROM STDIN en formato binario
+      (los embeddings viajan en el formato binario de pgvector: float32 para
+      columnas vector, float16 para columnas halfvec)
+    - method="values": cada lote se envía con execute_values paginado
+
+    Cada lote se confirma con su propio commit, así un timeout del Lambda
+    no descarta el trabajo ya persistido. Si COPY falla, el writer hace
+    rollback del lote y continúa con execute_values.
+
+    Con commit=False los lotes se escriben dentro de la transacción del
+    llamador (que decide cuándo confirmar); el rollback de un COPY fallido
+    se limita al lote mediante un SAVEPOINT.
+
+    `vector_type` es el tipo de la columna embedding ("vector" o "halfvec");
+    con None se lee del catálogo (ver embedding_column_type). Si la tabla tiene
+    las columnas derivadas embedding_bits / embedding_low, cada fila guarda
+    también su cuantización binaria / su prefijo de baja dimensión.
+    """
+
+    def __init__(
+        self, conn, tenant_id, batch_size=500, method="copy", page_size=100, commit=True, vector_type=None
+    ):
+        self.conn = conn
+        self.tenant_id = tenant_id
+        self.batch_size = max(1, batch_size)
+        self.method = method
+        self.page_size = page_size
+        self.commit = commit
+        self.table = f"{tenant_id}.documents"
+        with conn.cursor() as cur:
+            if vector_type is None:
+                vector_type = embedding_column_type(cur, self.table)
+            self.derived_columns = self._derived_columns(cur)
+        self.vector_type = vector_type
+        self.columns = DOCUMENT_COLUMNS + tuple(name for name, _, _ in self.derived_columns)
+        self.field_types = (
+            DOCUMENT_COLUMN_TYPES + (vector_type,) + tuple(field_type for _, field_type, _ in self.derived_columns)
+        )
+
+        self._buffer = []
+        self.rows_written = 0
+        self.batches_committed = 0
+        self._elapsed = 0.0
+
+    def write(self, row):
+        """
+        Agrega una fila (agent_id, document_id, document_name, chunk_text, chunk_hash, token_count, embedding).
+        """
+        self._buffer.append(row)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def write_many(self, rows):
+        for row in rows:
+            self.write(row)
+        return self
+
+    def flush(self):
+        if not self._buffer:
+            return
+
+        rows = self._buffer
+        self._buffer = []
+        start = time.time()
+
+        if self.method == "copy":
+            if not self.commit:
+                with self.conn.cursor() as cur:
+                    cur.execute("SAVEPOINT chunk_bulk_copy")
+            try:
+                self._copy(rows)
+            except psycopg2.Error as e:
+                self._rollback_batch()
+                logger.warning(f"COPY falló ({e}), usando execute_values como fallback")
+                self.method = "values"
+
+        if self.method == "values":
+            self._values(rows)
+
+        if self.commit:
+            self.conn.commit()
+        self._elapsed += time.time() - start
+        self.rows_written += len(rows)
+        self.batches_committed += 1
+
+    def _rollback_batch(self):
+        if self.commit:
+            self.conn.rollback()
+        else:
+            with self.conn.cursor() as cur:
+                cur.execute("ROLLBACK TO SAVEPOINT chunk_bulk_copy")
+
+    def close(self):
+        self.flush()
+        logger.info(f"Bulk insert en {self.table}: {self.stats()}")
+
+    def _derived_columns(self, cur) -> list:
+        """
+        Columnas calculadas a partir del embedding presentes en la tabla:
+        [(columna, tipo COPY, embedding → valor)].
+        """
+        column_types = table_column_types(cur, self.table)
+        derived = []
+        if BINARY_EMBEDDING_COLUMN in column_types:
+            derived.append((BINARY_EMBEDDING_COLUMN, "bit", BitParam.quantize))
+        if LOW_DIM_EMBEDDING_COLUMN in column_types:
+            dims = column_dimension(cur, self.table, LOW_DIM_EMBEDDING_COLUMN)
+            derived.append((
+                LOW_DIM_EMBEDDING_COLUMN,
+                column_types[LOW_DIM_EMBEDDING_COLUMN],
+                lambda vec: truncate_embedding(vec, dims)
+            ))
+        return derived
+
+    def _with_derived(self, rows):
+        if not self.derived_columns:
+            return rows
+        return [row + tuple(derive(row[6]) for _, _, derive in self.derived_columns) for row in rows]
+
+    def _copy(self, rows):
+        data = encode_copy_rows(self._with_derived(rows), self.field_types)
+
+        with self.conn.cursor() as cur:
+            cur.copy_expert(
+                f"COPY {self.table} ({', '.join(self.columns)}) FROM STDIN WITH (FORMAT binary)",
+                io.BytesIO(data)
+            )
+
+    def _values(self, rows):
+        with self.conn.cursor() as cur:
+            execute_values(
+                cur,
+                f"INSERT INTO {self.table} ({', '.join(self.columns)}) VALUES %s",
+                [
+                    tuple(
+                        VectorParam(value, field_type) if field_type in VECTOR_OPCLASSES else value
+                        for value, field_type in zip(row, self.field_types)
+                    )
+                    for row in self._with_derived(rows)
+                ],
+                page_size=self.page_size,
+            )
+
+    def stats(self) -> dict:
+        rps = self.rows_written / self._elapsed if self._elapsed > 0 else 0.0
+        return {
+            "rows": self.rows_written,
+            "batches": self.batches_committed,
+            "method": self.method,
+            "vector_type": self.vector_type,
+            "rows_per_second": round(rps, 1),
+        }
@@ -0,0 +1,102 @@
+# lib/checkpoint.py
+#
+# Checkpoints de ingesta por documento en la tabla de estado de DynamoDB
+# (DynamoDBClient.record_status_change): estado, dónde quedó la extracción
+# y cuántos chunks ya están confirmados en Aurora. Permiten que un reintento
+# o una invocación de continuación retome la ingesta en lugar de empezar de cero.
+from botocore.exceptions import ClientError
+
+from lib.ddb_client import DocumentStatus, DynamoDBClient
+from lib.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Estados desde los que una ingesta se puede retomar
+RESUMABLE_STATUSES = {
+    DocumentStatus.RECEIVED.value,
+    DocumentStatus.TEXT_EXTRACTION_IN_PROGRESS.value,
+    DocumentStatus.BEDROCK_IN_PROGRESS.value,
+    DocumentStatus.PROCESS_FAILED.value,
+}
+
+# Campos numéricos del checkpoint (DynamoDB los guarda como texto)
+_INT_FIELDS = {"chunks_committed", "pages_stored", "continuations"}
+
+
+class CheckpointMismatchError(Exception):
+    """
+    Los chunks re-generados no coinciden con los ya confirmados (el texto
+    re-extraído cambió): la ingesta no se puede retomar y debe empezar de cero.
+    """
+
+
+class IngestionCheckpoint:
+    """
+    Checkpoint de la ingesta de un documento (una versión: `fingerprint`).
+
+    Campos guardados (además de status / updated_at):
+        fingerprint          huella sha256 del PDF
+        extraction_artifact  dónde quedó el texto extraído:
+                             "postgres:<tenant>.document_pages" o "textract:<job_id>"
+        chunks_committed     chunks confirmados en {tenant}.documents
+        pages_stored         páginas guardadas en document_pages
+        continuations        invocaciones de continuación encadenadas
+    """
+
+    def __init__(self, document_id, fingerprint, status_table, history_table, ddb_client, actor=None):
+        self.document_id = document_id
+        self.fingerprint = fingerprint
+        self.status_table = status_table
+        self.history_table = history_table
+        self.ddb_client = ddb_client
+        self.actor = actor
+
+    def load(self):
+        """
+        Checkpoint vigente de esta versión del documento, o None si no hay uno
+        retomable (sin registro, otra versión o ya completado).
+        """
+        try:
+            item = self.ddb_client.get_item(
+                TableName=self.status_table.name,
+                Key={"document_id": {"S": self.document_id}}
+            ).get("Item")
+        except ClientError as e:
+            logger.warning(f"No se pudo leer el checkpoint de {self.document_id}: {e}")
+            return None
+
+        if not item:
+            return None
+
+        state = {}
+        for field, value in item.items():
+            raw = value.get("S", value.get("N"))
+            state[field] = int(raw) if field in _INT_FIELDS and raw not in (None, "") else raw
+
+        if state.get("fingerprint") != self.fingerprint or state.get("status") not in RESUMABLE_STATUSES:
+            return None
+        return state
+
+    def save(self, status, **fields) -> bool:
+        """
+        Registra el estado y los campos del checkpoint (estado actual + historial).
+        Un error de DynamoDB no interrumpe la ingesta: se registra y devuelve False.
+        """
+        extra_fields = {"fingerprint": self.fingerprint, **fields}
+        if self.actor:
+            extra_fields["actor"] = self.actor
+        try:
+            DynamoDBClient.record_status_change(
+                self.document_id,
+                status,
+                self.status_table,
+                self.history_table,
+                None,
+                self.ddb_client,
+                None,
+                extra_fields=extra_fields
+            )
+            return True
+        except ClientError as e:
+            logger.warning(f"No se pudo guardar el checkpoint de {self.document_id} ({status}): {e}")
+            return False
@@ -0,0 +1,400 @@
+# lib/document.py
+import hashlib
+import io
+import mmap
+import multiprocessing
+import os
+import shutil
+import threading
+import uuid
+from multiprocessing.connection import wait
+
+from lib.lazy import lazy_module
+from lib.logger import setup_logger
+from lib.s3_range_file import DEFAULT_BLOCK_SIZE, DEFAULT_CACHE_BLOCKS, S3RangeFile
+
+logger = setup_logger(__name__)
+
+# Se importan en el primer uso: un evento duplicado (mismo ETag) no llega a abrir el PDF
+pdfplumber = lazy_module("pdfplumber")
+pypdfium2 = lazy_module("pypdfium2")
+pdftypes = lazy_module("pdfminer.pdftypes")
+PDF_MODULES = (pdfplumber, pypdfium2, pdftypes)
+
+# Por debajo de este número de páginas no compensa lanzar procesos
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "8"))
+# Páginas por mensaje enviado desde cada proceso (permite ir consumiendo en streaming)
+WORKER_SEND_PAGES = 4
+# Tamaño de los bloques copiados al descargar con IfMatch
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# Una página con menos caracteres en su capa de texto (y con imágenes) se considera escaneada
+OCR_MIN_TEXT_CHARS = int(os.getenv("OCR_MIN_TEXT_CHARS", "25"))
+
+# PDFium no es thread-safe, ni siquiera entre documentos distintos: toda llamada a
+# pypdfium2 del proceso (records concurrentes, cada uno con su pool de OCR) se serializa
+_PDFIUM_LOCK = threading.Lock()
+
+
+def _reset_pdfium_lock_after_fork():
+    # Un proceso hijo (shards locales) no hereda el lock tomado por otro thread del padre
+    global _PDFIUM_LOCK
+    _PDFIUM_LOCK = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_pdfium_lock_after_fork)
+
+
+def available_cpus() -> int:
+    """
+    CPUs disponibles para este proceso (Lambda asigna vCPUs según la memoria).
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _split_page_ranges(num_pages: int, parts: int, offset: int = 0) -> list:
+    """
+    Divide [offset, offset + num_pages) en `parts` rangos contiguos de tamaño similar.
+    """
+    parts = max(1, min(parts, num_pages))
+    size, extra = divmod(num_pages, parts)
+    ranges = []
+    start = offset
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def page_needs_ocr(page, text: str) -> bool:
+    """
+    Clasifica una página por la densidad de su capa de texto: necesita OCR si
+    casi no tiene caracteres extraíbles pero sí contiene imágenes (página escaneada).
+    Las páginas vacías (sin texto ni imágenes) no se envían a OCR.
+    """
+    if len(page.chars) >= OCR_MIN_TEXT_CHARS and len(text.strip()) >= OCR_MIN_TEXT_CHARS:
+        return False
+    return len(page.images) > 0
+
+
+def page_content_hash(page) -> bytes:
+    """
+    Huella (sha256) de una página calculada sobre sus content streams y los
+    XObjects (imágenes/formularios) que referencia, sin extraer texto.
+    No depende de la posición de la página en el documento.
+
+    Se usan los datos decodificados: pdfminer descarta los datos crudos de un
+    stream una vez decodificado, y así la huella es la misma antes o después
+    de extraer la página.
+    """
+    h = hashlib.sha256(repr(page.bbox).encode())
+    page_obj = page.page_obj
+    for stream in page_obj.contents:
+        h.update(pdftypes.resolve1(stream).get_data() or b"")
+
+    xobjects = pdftypes.resolve1((page_obj.resources or {}).get("XObject")) or {}
+    for name in sorted(xobjects):
+        h.update(str(name).encode())
+        h.update(pdftypes.resolve1(xobjects[name]).get_data() or b"")
+
+    return h.digest()
+
+
+def _extract_page(page) -> tuple:
+    """
+    Extrae (texto, necesita_ocr) de una página y libera sus objetos parseados:
+    pdfplumber los conserva en cada Page, y sin close() la memoria crece con
+    cada página extraída. La huella (page_content_hash) no los necesita.
+    """
+    try:
+        text = page.extract_text() or ""
+        return text, page_needs_ocr(page, text)
+    finally:
+        page.close()
+
+
+def _extract_pages_worker(local_path, start, end, conn):
+    """
+    Proceso hijo: abre el archivo mapeado en memoria y extrae el texto de [start, end),
+    enviando las páginas en grupos de WORKER_SEND_PAGES a medida que las procesa.
+    """
+    try:
+        with open(local_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with pdfplumber.open(mm) as pdf:
+                for batch_start in range(start, end, WORKER_SEND_PAGES):
+                    batch_end = min(end, batch_start + WORKER_SEND_PAGES)
+                    pages = [_extract_page(page) for page in pdf.pages[batch_start:batch_end]]
+                    conn.send(("ok", batch_start, pages))
+        conn.send(("done", start, None))
+    except Exception as e:
+        conn.send(("error", start, f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+class PdfDocument:
+    """
+    Handle de un PDF descargado de S3 una única vez.
+
+    El archivo local se mapea en memoria (mmap) y pdfplumber se abre una sola vez
+    sobre ese mapeo; conteo de páginas, selección de configuración de chunking y
+    extracción de texto reutilizan el mismo handle.
+
+        with PdfDocument.from_s3(s3, bucket, key) as doc:
+            doc.page_count
+            for text, needs_ocr in doc.iter_pages(): ...
+
+    Con `from_s3_range` el PDF no se descarga: se lee bajo demanda con GETs
+    por rango (lib/s3_range_file.S3RangeFile) y solo se transfieren los bytes
+    que pdfplumber necesita (xref, páginas extraídas). Sin archivo local la
+    extracción corre en un solo proceso.
+    """
+
+    def __init__(self, local_path=None, bucket=None, key=None, workers=None, owns_file=False, source=None, etag=None):
+        self.local_path = local_path
+        self.bucket = bucket
+        self.key = key
+        # ETag de la versión leída (None si no se conoce): los shards leen la misma con IfMatch
+        self.etag = source.etag if source is not None else etag
+        # Procesos de extracción por defecto (None = CPUs disponibles)
+        self.workers = workers
+        # Archivo temporal propio: se borra al cerrar
+        self.owns_file = owns_file
+        # Archivo remoto (S3RangeFile) en lugar de un archivo local
+        self.source = source
+
+        if source is not None:
+            self._file = None
+            self.size = source.size
+            self._mmap = None
+        else:
+            self._file = open(local_path, "rb")
+            self.size = os.fstat(self._file.fileno()).st_size
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        self._pdf = None
+        self._pdfium = None
+
+    @classmethod
+    def from_s3(cls, s3_client, bucket, key, local_dir="/tmp", workers=None, etag=None):
+        """
+        Descarga el objeto a `local_dir` (una sola vez) y devuelve el handle.
+        El nombre local es único (varios documentos pueden procesarse a la vez
+        en la misma invocación) y el archivo se borra al cerrar el handle.
+
+        Con `etag` se descarga exactamente esa versión (GET con IfMatch: download_file
+        no lo admite); si el objeto ya cambió, S3 responde 412.
+        """
+        local_path = os.path.join(local_dir, f"{uuid.uuid4().hex}-{key.split('/')[-1]}")
+        try:
+            if etag:
+                body = s3_client.get_object(Bucket=bucket, Key=key, IfMatch=etag)["Body"]
+                with open(local_path, "wb") as f:
+                    shutil.copyfileobj(body, f, DOWNLOAD_CHUNK_SIZE)
+            else:
+                s3_client.download_file(bucket, key, local_path)
+        except Exception:
+            if os.path.exists(local_path):
+                os.remove(local_path)
+            raise
+        logger.info(f"PDF descargado: s3://{bucket}/{key} -> {local_path}")
+        return cls(local_path, bucket=bucket, key=key, workers=workers, owns_file=True, etag=etag)
+
+    @classmethod
+    def from_s3_range(
+        cls,
+        s3_client,
+        bucket,
+        key,
+        size=None,
+        etag=None,
+        block_size=DEFAULT_BLOCK_SIZE,
+        cache_blocks=DEFAULT_CACHE_BLOCKS,
+    ):
+        """
+        Handle sobre el objeto sin descargarlo (GETs por rango con cache LRU de
+        bloques). `size` y `etag` (p. ej. del evento S3) evitan el HEAD inicial.
+        """
+        source = S3RangeFile(
+            s3_client, bucket, key,
+            size=size, etag=etag, block_size=block_size, cache_blocks=cache_blocks
+        )
+        logger.info(f"PDF abierto por rangos: s3://{bucket}/{key} ({source.size} bytes)")
+        return cls(bucket=bucket, key=key, workers=1, source=source)
+
+    def sha256(self) -> str:
+        """
+        Huella sha256 (hex) del contenido, calculada sobre el mmap sin copiar
+        (o, sin archivo local, leyendo el objeto por partes).
+        """
+        if self.source is not None:
+            h = hashlib.sha256()
+            for data in self.source.iter_bytes():
+                h.update(data)
+            return h.hexdigest()
+        return hashlib.sha256(self._mmap if self._mmap is not None else b"").hexdigest()
+
+    @property
+    def pdf(self):
+        """
+        Instancia de pdfplumber abierta una sola vez sobre el mmap (o el archivo remoto).
+        """
+        if self._pdf is None:
+            if not self.size:
+                raise ValueError(f"El documento {self.local_path or self.key} está vacío")
+            if self.source is not None:
+                self._pdf = pdfplumber.open(self.source)
+            else:
+                self._mmap.seek(0)
+                self._pdf = pdfplumber.open(self._mmap)
+        return self._pdf
+
+    @property
+    def page_count(self) -> int:
+        try:
+            return len(self.pdf.pages)
+        except Exception as e:
+            logger.error(f"No se pudieron detectar páginas: {e}")
+            return 0
+
+    def page_hash(self, page_index: int) -> bytes:
+        """
+        Huella de contenido de una página (ver page_content_hash).
+        """
+        return page_content_hash(self.pdf.pages[page_index])
+
+    def page_hashes(self) -> list:
+        """
+        Huella de contenido de cada página, en orden.
+        """
+        return [page_content_hash(page) for page in self.pdf.pages]
+
+    def iter_pages(self, workers=None, page_indices=None, page_range=None):
+        """
+        Genera (texto, necesita_ocr) de cada página, en orden, a medida que se extrae.
+        Con `page_indices` solo se extraen esas páginas (en el orden indicado);
+        con `page_range` (inicio, fin) solo las de ese rango.
+
+        Con más de un worker, el rango de páginas se reparte entre procesos
+        (pdfplumber es CPU-bound en Python puro); cada proceso abre el mismo
+        archivo mapeado en memoria. Se usa multiprocessing.Process + Pipe porque
+        Lambda no tiene /dev/shm (Pool y Queue no funcionan).
+        """
+        if page_indices is not None:
+            for page_index in page_indices:
+                yield _extract_page(self.pdf.pages[page_index])
+            return
+
+        first_page, end_page = page_range if page_range is not None else (0, self.page_count)
+        num_pages = end_page - first_page
+        if workers is None:
+            workers = self.workers or available_cpus()
+        if self.local_path is None:
+            # Los procesos de extracción abren el archivo local
+            workers = 1
+
+        if workers <= 1 or num_pages < PARALLEL_MIN_PAGES:
+            for page in self.pdf.pages[first_page:end_page]:
+                yield _extract_page(page)
+            return
+
+        ranges = _split_page_ranges(num_pages, workers, first_page)
+        logger.info(f"Extracción paralela: {num_pages} páginas en {len(ranges)} procesos")
+
+        ctx = multiprocessing.get_context("fork")
+        processes = []
+        readers = {}
+        for start, end in ranges:
+            reader, writer = ctx.Pipe(duplex=False)
+            process = ctx.Process(
+                target=_extract_pages_worker,
+                args=(self.local_path, start, end, writer),
+                daemon=True
+            )
+            process.start()
+            writer.close()
+            processes.append(process)
+            readers[reader] = start
+
+        pending = {}
+        next_page = first_page
+        try:
+            while next_page < end_page:
+                # Entregar las páginas contiguas ya disponibles
+                while next_page in pending:
+                    yield pending.pop(next_page)
+                    next_page += 1
+                if next_page >= end_page:
+                    break
+                if not readers:
+                    raise RuntimeError(f"Falló la extracción paralela: falta la página {next_page + 1}")
+
+                for reader in wait(list(readers)):
+                    try:
+                        status, start, payload = reader.recv()
+                    except EOFError:
+                        status, start, payload = "error", readers[reader], "el proceso terminó sin respuesta"
+
+                    if status == "ok":
+                        for offset, page in enumerate(payload):
+                            pending[start + offset] = page
+                        continue
+
+                    reader.close()
+                    readers.pop(reader)
+                    if status == "error":
+                        raise RuntimeError(f"Falló la extracción paralela (páginas desde {start + 1}): {payload}")
+        finally:
+            for reader in readers:
+                reader.close()
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+
+    def render_page_png(self, page_index: int, resolution=200) -> bytes:
+        """
+        Renderiza una página a PNG (para OCR de páginas escaneadas).
+        Solo la codificación PNG corre fuera de _PDFIUM_LOCK.
+        """
+        with _PDFIUM_LOCK:
+            if self._pdfium is None:
+                # pypdfium2 (dependencia de pdfplumber) no acepta mmap: se abre por ruta (o
+                # sobre una vista propia del archivo remoto), una sola vez
+                self._pdfium = pypdfium2.PdfDocument(self.local_path or self.source.view())
+            page = self._pdfium[page_index]
+            bitmap = page.render(scale=resolution / 72)
+            # Copia independiente del buffer de PDFium, que se libera aquí mismo
+            image = bitmap.to_pil().copy()
+            bitmap.close()
+            page.close()
+
+        buf = io.BytesIO()
+        image.save(buf, format="PNG")
+        return buf.getvalue()
+
+    def close(self):
+        if self._pdfium is not None:
+            with _PDFIUM_LOCK:
+                self._pdfium.close()
+            self._pdfium = None
+        if self._pdf is not None:
+            self._pdf.close()
+            self._pdf = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+        if self.source is not None:
+            self.source.close()
+        if self.owns_file and os.path.exists(self.local_path):
+            os.remove(self.local_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,243 @@
+# lib/document_registry.py
+#
+# Registro de documentos por tenant, indexado por huella de contenido (sha256),
+# para que re-subidas del mismo PDF o reintentos del mismo evento S3 no
+# vuelvan a extraer/embeber ni dupliquen chunks.
+import uuid
+
+from lib.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+STATUS_PROCESSING = "PROCESSING"
+STATUS_COMPLETED = "COMPLETED"
+STATUS_FAILED = "FAILED"
+
+# Resultado de claim_document cuando este proceso reclamó la ingesta
+CLAIM_ACQUIRED = "ACQUIRED"
+
+# Namespace fijo para derivar document_id a partir de la huella
+DOCUMENT_ID_NAMESPACE = uuid.UUID("6f1c8a1e-3b0e-4a43-9d0e-1f0b5d3c2a10")
+
+
+class DocumentInProgressError(Exception):
+    """
+    Otra invocación está ingestando el mismo documento (registro PROCESSING
+    actualizado hace menos de `stale_seconds`). Es un error reintentable: el
+    reintento lo reclama si esa ingesta se abandona, o lo ve COMPLETED.
+    """
+
+
+def document_id_for(tenant_id, agent_id, fingerprint) -> str:
+    """
+    document_id determinístico: el mismo contenido para el mismo agente produce el mismo id.
+    """
+    return str(uuid.uuid5(DOCUMENT_ID_NAMESPACE, f"{tenant_id}/{agent_id}/{fingerprint}"))
+
+
+def ensure_registry_table(cur, tenant_id):
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {tenant_id}.document_registry (
+            agent_id        UUID NOT NULL,
+            fingerprint     TEXT NOT NULL,
+            etag            TEXT,
+            document_id     UUID NOT NULL,
+            document_name   TEXT NOT NULL,
+            status          TEXT NOT NULL,
+            created_at      TIMESTAMP DEFAULT NOW(),
+            updated_at      TIMESTAMP DEFAULT NOW(),
+            PRIMARY KEY (agent_id, fingerprint)
+        )
+    """)
+    cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_{tenant_id}_document_registry_etag
+        ON {tenant_id}.document_registry(agent_id, etag)
+    """)
+
+
+def find_completed_by_etag(conn, tenant_id, agent_id, etag):
+    """
+    Chequeo barato previo a la extracción: devuelve el document_id si ya existe
+    una ingesta completa con el mismo ETag para el agente.
+    """
+    if not etag:
+        return None
+
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT document_id FROM {tenant_id}.document_registry
+            WHERE agent_id = %s AND etag = %s AND status = %s
+            LIMIT 1
+        """, (agent_id, etag, STATUS_COMPLETED))
+        row = cur.fetchone()
+
+    return str(row[0]) if row else None
+
+
+def find_current_document(conn, tenant_id, agent_id, document_name):
+    """
+    Versión vigente de un documento por nombre: (document_id, fingerprint) o None.
+    Para documentos ingestados antes del registro se busca en {tenant}.documents
+    (fingerprint None); si el mismo archivo se ingestó varias veces se toma la
+    ingesta más reciente y las demás se eliminan al actualizarlo
+    (ver discard_legacy_duplicates).
+    """
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT document_id, fingerprint FROM {tenant_id}.document_registry
+            WHERE agent_id = %s AND document_name = %s AND status = %s
+            ORDER BY updated_at DESC
+            LIMIT 1
+        """, (agent_id, document_name, STATUS_COMPLETED))
+        row = cur.fetchone()
+        if row is None:
+            cur.execute(f"""
+                SELECT document_id, NULL FROM {tenant_id}.documents
+                WHERE agent_id = %s AND document_name = %s
+                ORDER BY created_at DESC, id DESC
+                LIMIT 1
+            """, (agent_id, document_name))
+            row = cur.fetchone()
+
+    return (str(row[0]), row[1]) if row else None
+
+
+def claim_document(
+    conn,
+    tenant_id,
+    agent_id,
+    fingerprint,
+    etag,
+    document_id,
+    document_name,
+    stale_seconds=900,
+    discard_partial=True,
+):
+    """
+    Reclama la ingesta de un documento. Devuelve CLAIM_ACQUIRED si este proceso
+    debe ingestarlo; si no, el estado del registro existente: STATUS_COMPLETED
+    (duplicado) o STATUS_PROCESSING (en curso en otra invocación).
+
+    Un intento previo FAILED, o PROCESSING sin actualizar por más de
+    `stale_seconds` (la ingesta lo refresca en cada lote, ver touch_document),
+    se puede reclamar de nuevo; en ese caso se eliminan los
+    chunks parciales que hubiera confirmado (salvo `discard_partial=False`:
+    una actualización incremental es transaccional y no deja chunks parciales,
+    y su document_id es el de la versión vigente, ni una ingesta que se
+    retoma desde su checkpoint).
+    """
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            INSERT INTO {tenant_id}.document_registry AS r (
+                agent_id, fingerprint, etag, document_id, document_name, status
+            )
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (agent_id, fingerprint) DO UPDATE
+                SET status = EXCLUDED.status,
+                    etag = EXCLUDED.etag,
+                    document_id = EXCLUDED.document_id,
+                    document_name = EXCLUDED.document_name,
+                    updated_at = NOW()
+                WHERE r.status = %s
+                   OR (r.status = %s AND r.updated_at < NOW() - make_interval(secs => %s))
+            RETURNING (xmax <> 0) AS reclaimed
+        """, (
+            agent_id, fingerprint, etag, document_id, document_name, STATUS_PROCESSING,
+            STATUS_FAILED, STATUS_PROCESSING, stale_seconds
+        ))
+        row = cur.fetchone()
+
+        if row is None:
+            cur.execute(f"""
+                SELECT status FROM {tenant_id}.document_registry
+                WHERE agent_id = %s AND fingerprint = %s
+            """, (agent_id, fingerprint))
+            existing = cur.fetchone()
+            conn.commit()
+            # Sin fila: se eliminó entre ambas consultas (versión reemplazada), se reintenta
+            return existing[0] if existing else STATUS_PROCESSING
+
+        if row[0] and discard_partial:
+            # Reintento de una ingesta fallida/abandonada: descartar chunks y páginas parciales
+            deleted = discard_partial_document(cur, tenant_id, document_id)
+            logger.info(f"Reintentando documento {document_id}: {deleted} chunks parciales eliminados")
+
+    conn.commit()
+    return CLAIM_ACQUIRED
+
+
+def discard_partial_document(cur, tenant_id, document_id) -> int:
+    """
+    Elimina los chunks y páginas que una ingesta incompleta haya confirmado.
+    Devuelve la cantidad de chunks eliminados. No hace commit.
+    """
+    cur.execute(
+        f"DELETE FROM {tenant_id}.document_pages WHERE document_id = %s",
+        (document_id,)
+    )
+    cur.execute(
+        f"DELETE FROM {tenant_id}.documents WHERE document_id = %s",
+        (document_id,)
+    )
+    return cur.rowcount
+
+
+def mark_document(conn, tenant_id, agent_id, fingerprint, status):
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            UPDATE {tenant_id}.document_registry
+            SET status = %s, updated_at = NOW()
+            WHERE agent_id = %s AND fingerprint = %s
+        """, (status, agent_id, fingerprint))
+    conn.commit()
+
+
+def touch_document(conn, tenant_id, agent_id, document_id):
+    """
+    Heartbeat de una ingesta en curso: refresca updated_at para que el registro
+    PROCESSING no se considere abandonado mientras se siguen confirmando lotes.
+    """
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            UPDATE {tenant_id}.document_registry
+            SET updated_at = NOW()
+            WHERE agent_id = %s AND document_id = %s AND status = %s
+        """, (agent_id, document_id, STATUS_PROCESSING))
+    conn.commit()
+
+
+def complete_document_update(cur, tenant_id, agent_id, document_id, fingerprint):
+    """
+    Dentro de la transacción de una actualización incremental: marca la nueva
+    versión como COMPLETED y elimina del registro las huellas anteriores del
+    mismo document_id (volver a subir una versión vieja es otra actualización).
+    No hace commit.
+    """
+    cur.execute(f"""
+        DELETE FROM {tenant_id}.document_registry
+        WHERE agent_id = %s AND document_id = %s AND fingerprint <> %s
+    """, (agent_id, document_id, fingerprint))
+    cur.execute(f"""
+        UPDATE {tenant_id}.document_registry
+        SET status = %s, updated_at = NOW()
+        WHERE agent_id = %s AND fingerprint = %s
+    """, (STATUS_COMPLETED, agent_id, fingerprint))
+
+
+def discard_legacy_duplicates(cur, tenant_id, agent_id, document_name, document_id) -> int:
+    """
+    Dentro de la transacción de una actualización: elimina los chunks de otros
+    document_id del mismo archivo que no figuran en el registro (ingestas
+    anteriores al registro, que generaban un id nuevo por cada subida). Sin
+    esto seguirían consultables junto a la versión re-indexada.
+    Devuelve la cantidad de chunks eliminados. No hace commit.
+    """
+    cur.execute(f"""
+        DELETE FROM {tenant_id}.documents d
+        WHERE d.agent_id = %s AND d.document_name = %s AND d.document_id <> %s
+          AND NOT EXISTS (
+              SELECT 1 FROM {tenant_id}.document_registry r
+              WHERE r.agent_id = d.agent_id AND r.document_id = d.document_id
+          )
+    """, (agent_id, document_name, document_id))
+    return cur.rowcount
@@ -0,0 +1,113 @@
+# lib/embedding_cache.py
+#
+# Cache de embeddings por (modelo, sha256(texto)): capa local en proceso (LRU)
+# delante de una tabla por tenant en Postgres.
+import hashlib
+import threading
+from collections import OrderedDict
+
+from psycopg2.extras import execute_values
+from lib.logger import setup_logger
+from lib.pgvector_adapter import VectorParam, decode_vector
+
+logger = setup_logger(__name__)
+
+
+def text_hash(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def ensure_embedding_cache_table(cur, tenant_id):
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {tenant_id}.embedding_cache (
+            model           TEXT NOT NULL,
+            text_hash       BYTEA NOT NULL,
+            embedding       VECTOR(1536) NOT NULL,
+            created_at      TIMESTAMP DEFAULT NOW(),
+            PRIMARY KEY (model, text_hash)
+        )
+    """)
+
+
+class EmbeddingCache:
+    """
+    Cache de embeddings en dos niveles:
+    - local: LRU en memoria del proceso (sobrevive entre invocaciones en caliente)
+    - persistente: {tenant}.embedding_cache, consultada en bloque por hashes
+
+    Los vectores se leen con vector_send() (formato binario de pgvector) y se
+    decodifican directamente a float32.
+    """
+
+    def __init__(self, model, max_local_entries=20000):
+        self.model = model
+        self.max_local_entries = max_local_entries
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_local(self, key):
+        with self._lock:
+            vec = self._local.get(key)
+            if vec is not None:
+                self._local.move_to_end(key)
+            return vec
+
+    def _put_local(self, key, vec):
+        with self._lock:
+            self._local[key] = vec
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_local_entries:
+                self._local.popitem(last=False)
+
+    def lookup(self, conn, tenant_id, hashes) -> dict:
+        """
+        Devuelve {hash: embedding} para los hashes presentes en cache.
+        """
+        found = {}
+        missing = []
+        for h in set(hashes):
+            vec = self._get_local(h)
+            if vec is not None:
+                found[h] = vec
+            else:
+                missing.append(h)
+
+        if missing and conn is not None:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    SELECT text_hash, vector_send(embedding)
+                    FROM {tenant_id}.embedding_cache
+                    WHERE model = %s AND text_hash = ANY(%s)
+                """, (self.model, missing))
+                for h, data in cur.fetchall():
+                    h = bytes(h)
+                    vec = decode_vector(bytes(data))
+                    found[h] = vec
+                    self._put_local(h, vec)
+            conn.commit()
+
+        return found
+
+    def store(self, conn, tenant_id, items):
+        """
+        Guarda pares (hash, embedding) en ambos niveles.
+        """
+        items = list(items)
+        for h, vec in items:
+            self._put_local(h, vec)
+
+        if not items or conn is None:
+            return
+
+        with conn.cursor() as cur:
+            execute_values(
+                cur,
+                f"""
+                INSERT INTO {tenant_id}.embedding_cache (model, text_hash, embedding)
+                VALUES %s
+                ON CONFLICT (model, text_hash) DO NOTHING
+                """,
+                [(self.model, h, VectorParam(vec)) for h, vec in items],
+                page_size=100,
+            )
+        conn.commit()
@@ -0,0 +1,191 @@
+# lib/embedding_pool.py
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from botocore.exceptions import ClientError
+from lib.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+THROTTLING_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceQuotaExceededException",
+    "ModelNotReadyException",
+}
+
+
+def is_throttling_error(error) -> bool:
+    """
+    Indica si la excepción corresponde a un throttling de Bedrock.
+    """
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES
+    return type(error).__name__ in THROTTLING_ERROR_CODES
+
+
+class AdaptiveConcurrencyPool:
+    """
+    Pool de threads acotado con concurrencia adaptativa estilo AIMD:
+    - cada request exitoso aumenta el límite de forma aditiva (+1 por "ventana")
+    - cada throttling divide el límite a la mitad y reintenta la tarea con backoff
+
+    El límite baja a lo sumo una vez por ventana: los throttles de requests que
+    empezaron antes de la última reducción ya corresponden a esa reducción y no
+    vuelven a dividir el límite (varios throttles simultáneos cuentan como uno).
+
+    Los resultados de `map` se devuelven en el mismo orden que los items.
+    El límite es global al pool: varias llamadas concurrentes a `map` (p. ej.
+    varios documentos procesados en paralelo) comparten la misma concurrencia.
+    """
+
+    def __init__(
+        self,
+        max_concurrency=8,
+        initial_concurrency=2,
+        min_concurrency=1,
+        decrease_factor=0.5,
+        max_retries=8,
+        base_backoff=0.5,
+        max_backoff=20.0,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.decrease_factor = decrease_factor
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.limit = float(min(max(initial_concurrency, self.min_concurrency), self.max_concurrency))
+
+        self._lock = threading.Lock()
+        self._slot_freed = threading.Condition(self._lock)
+        self._active = 0
+        # Se incrementa en cada reducción del límite (ver _on_throttle)
+        self._decreases = 0
+        self._requests = 0
+        self._throttles = 0
+        self._elapsed = 0.0
+
+    # --- AIMD ---
+    def _on_success(self):
+        with self._lock:
+            self._requests += 1
+            self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+
+    def _on_throttle(self, started_at_decrease):
+        """
+        Registra un throttling de un request que empezó cuando el contador de
+        reducciones valía `started_at_decrease`. Devuelve True si redujo el límite.
+        """
+        with self._lock:
+            self._requests += 1
+            self._throttles += 1
+            if started_at_decrease < self._decreases:
+                return False
+            self.limit = max(self.min_concurrency, self.limit * self.decrease_factor)
+            self._decreases += 1
+            return True
+
+    def _try_acquire(self) -> bool:
+        with self._lock:
+            if self._active < int(self.limit):
+                self._active += 1
+                return True
+            return False
+
+    def _release(self, count=1):
+        with self._lock:
+            self._active -= count
+            self._slot_freed.notify_all()
+
+    def _wait_for_slot(self, timeout):
+        with self._lock:
+            if self._active >= int(self.limit):
+                self._slot_freed.wait(timeout)
+
+    def _backoff(self, attempt):
+        # Full jitter acotado
+        delay = min(self.max_backoff, self.base_backoff * (2 ** (attempt - 1)))
+        return random.uniform(0, delay)
+
+    def _call(self, fn, item, attempt, started):
+        if attempt > 0:
+            time.sleep(self._backoff(attempt))
+        # Ventana en la que arranca el request (después del backoff)
+        with self._lock:
+            started[0] = self._decreases
+        return fn(item)
+
+    def map(self, fn, items):
+        """
+        Ejecuta fn(item) para cada item con concurrencia adaptativa.
+        Reintenta los items que sufren throttling; cualquier otro error se propaga.
+        """
+        items = list(items)
+        results = [None] * len(items)
+        attempts = [0] * len(items)
+        pending = deque(range(len(items)))
+        in_flight = {}
+        start = time.time()
+
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        try:
+            while pending or in_flight:
+                while pending and self._try_acquire():
+                    idx = pending.popleft()
+                    started = [self._decreases]
+                    future = executor.submit(self._call, fn, items[idx], attempts[idx], started)
+                    in_flight[future] = (idx, started)
+
+                if not in_flight:
+                    # Otras llamadas ocupan toda la concurrencia: esperar un lugar
+                    self._wait_for_slot(timeout=0.05)
+                    continue
+
+                # Con timeout para aprovechar lugares liberados por otras llamadas
+                done, _ = wait(in_flight, timeout=0.05 if pending else None, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    idx, started = in_flight.pop(future)
+                    self._release()
+                    try:
+                        results[idx] = future.result()
+                        self._on_success()
+                    except Exception as e:
+                        if not is_throttling_error(e) or attempts[idx] >= self.max_retries:
+                            raise
+                        self._on_throttle(started[0])
+                        attempts[idx] += 1
+                        logger.warning(
+                            f"Throttling en item {idx} (intento {attempts[idx]}), "
+                            f"concurrencia reducida a {int(self.limit)}"
+                        )
+                        pending.appendleft(idx)
+        except Exception:
+            for future in in_flight:
+                future.cancel()
+            raise
+        finally:
+            executor.shutdown(wait=True)
+            if in_flight:
+                self._release(len(in_flight))
+            with self._lock:
+                self._elapsed += time.time() - start
+
+        return results
+
+    def stats(self) -> dict:
+        """
+        Métricas observadas: requests totales, throttles, requests/seg y límite actual.
+        """
+        with self._lock:
+            rps = self._requests / self._elapsed if self._elapsed > 0 else 0.0
+            return {
+                "requests": self._requests,
+                "throttles": self._throttles,
+                "requests_per_second": round(rps, 2),
+                "concurrency_limit": int(self.limit),
+            }
@@ -0,0 +1,181 @@
+# lib/incremental_index.py
+#
+# Re-indexado incremental: huellas por página ({tenant}.document_pages) y por
+# chunk ({tenant}.documents.chunk_hash) para que una nueva versión de un
+# documento solo extraiga las páginas modificadas y solo borre/inserte los
+# chunks que cambiaron.
+import threading
+from collections import defaultdict
+
+from psycopg2.extras import execute_values
+from lib.logger import setup_logger
+from lib.pgvector_adapter import add_column_if_missing
+
+logger = setup_logger(__name__)
+
+
+def ensure_incremental_tables(cur, tenant_id):
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {tenant_id}.document_pages (
+            document_id     UUID NOT NULL,
+            page_number     INT NOT NULL,
+            page_hash       BYTEA NOT NULL,
+            page_text       TEXT NOT NULL,
+            PRIMARY KEY (document_id, page_number)
+        )
+    """)
+    # Esquemas creados antes del re-indexado incremental (solo si falta la columna)
+    add_column_if_missing(cur, f"{tenant_id}.documents", "chunk_hash", "BYTEA")
+
+
+def load_document_pages(conn, tenant_id, document_id) -> list:
+    """
+    Devuelve [(page_number, page_hash, page_text)] guardados para el documento.
+    """
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT page_number, page_hash, page_text
+            FROM {tenant_id}.document_pages
+            WHERE document_id = %s
+        """, (document_id,))
+        return [(number, bytes(h), text) for number, h, text in cur.fetchall()]
+
+
+def load_chunk_hashes(conn, tenant_id, document_id) -> list:
+    """
+    Devuelve [(id, chunk_hash)] de los chunks guardados del documento.
+    Los chunks anteriores a la columna chunk_hash se hashean en la base.
+    """
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT id, COALESCE(chunk_hash, sha256(convert_to(chunk_text, 'UTF8')))
+            FROM {tenant_id}.documents
+            WHERE document_id = %s
+        """, (document_id,))
+        return [(row_id, bytes(h)) for row_id, h in cur.fetchall()]
+
+
+def diff_chunks(existing, new_hashes) -> tuple:
+    """
+    Diferencia de multiconjuntos entre los chunks guardados y los de la nueva versión.
+
+    Args:
+        existing: [(id, chunk_hash)] guardados
+        new_hashes: hashes de los chunks nuevos, en orden
+
+    Returns:
+        (ids_a_borrar, posiciones_a_insertar): cada chunk guardado cuyo hash sigue
+        presente se conserva tal cual (con su embedding), tantas veces como aparezca.
+    """
+    available = defaultdict(list)
+    for row_id, h in existing:
+        available[h].append(row_id)
+
+    to_insert = []
+    for position, h in enumerate(new_hashes):
+        if available.get(h):
+            available[h].pop()
+        else:
+            to_insert.append(position)
+
+    to_delete = [row_id for ids in available.values() for row_id in ids]
+    return to_delete, to_insert
+
+
+def upsert_document_pages(cur, tenant_id, document_id, pages):
+    """
+    Inserta o reemplaza páginas (page_number, page_hash, page_text). No hace commit.
+    """
+    if not pages:
+        return
+    execute_values(
+        cur,
+        f"""
+        INSERT INTO {tenant_id}.document_pages (document_id, page_number, page_hash, page_text)
+        VALUES %s
+        ON CONFLICT (document_id, page_number) DO UPDATE
+            SET page_hash = EXCLUDED.page_hash,
+                page_text = EXCLUDED.page_text
+        """,
+        [(document_id, number, h, text) for number, h, text in pages],
+        page_size=100,
+    )
+
+
+def replace_document_pages(cur, tenant_id, document_id, stored_pages, page_hashes, page_texts) -> int:
+    """
+    Lleva {tenant}.document_pages a la nueva versión escribiendo solo las páginas
+    cuya huella cambió en su posición y borrando las que sobran. No hace commit.
+    Devuelve la cantidad de páginas escritas.
+    """
+    stored_by_number = {number: h for number, h, _ in stored_pages}
+    changed = [
+        (number, h, page_texts[number])
+        for number, h in enumerate(page_hashes)
+        if stored_by_number.get(number) != h
+    ]
+    upsert_document_pages(cur, tenant_id, document_id, changed)
+    cur.execute(f"""
+        DELETE FROM {tenant_id}.document_pages
+        WHERE document_id = %s AND page_number >= %s
+    """, (document_id, len(page_hashes)))
+    return len(changed)
+
+
+class PageRecorder:
+    """
+    Guarda las páginas extraídas durante una ingesta completa en
+    {tenant}.document_pages, en lotes y con una conexión propia, para que una
+    futura versión del documento pueda reutilizar su texto.
+    """
+
+    def __init__(self, connect, tenant_id, document_id, batch_size=50):
+        self.connect = connect
+        self.tenant_id = tenant_id
+        self.document_id = document_id
+        self.batch_size = batch_size
+        self.pages_written = 0
+
+        self._conn = None
+        self._buffer = []
+        self._lock = threading.RLock()
+
+    def add(self, page_number, page_hash, page_text):
+        with self._lock:
+            self._buffer.append((page_number, page_hash, page_text))
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        """
+        Confirma las páginas pendientes. Se puede invocar desde otro thread
+        (p. ej. antes de un checkpoint) mientras la extracción sigue agregando.
+        """
+        with self._lock:
+            if not self._buffer:
+                return
+            if self._conn is None:
+                self._conn = self.connect()
+            with self._conn.cursor() as cur:
+                upsert_document_pages(cur, self.tenant_id, self.document_id, self._buffer)
+            self._conn.commit()
+            self.pages_written += len(self._buffer)
+            self._buffer = []
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.discard()
+        logger.info(f"Páginas guardadas para re-indexado incremental: {self.pages_written}")
+
+    def discard(self):
+        """
+        Descarta lo pendiente y cierra la conexión (ingesta fallida).
+        """
+        with self._lock:
+            self._buffer = []
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
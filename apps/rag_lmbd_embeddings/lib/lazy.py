@@ -0,0 +1,76 @@
+# lib/lazy.py
+#
+# Inicialización diferida de clientes AWS y módulos pesados: el objeto se crea
+# en el primer uso, así el cold start no paga por lo que la invocación no usa.
+# Con LAZY_INIT=false (p. ej. con SnapStart) el handler los crea en la fase de
+# init con preload(), para que queden en el snapshot.
+# Mantener este archivo idéntico en apps/rag_lmbd_embeddings/lib y apps/rag_lmbd_query/lib.
+import importlib
+import os
+import threading
+
+# Un solo lock para todas las inicializaciones: boto3 no garantiza que crear
+# clientes desde varios threads a la vez sea seguro
+_INIT_LOCK = threading.RLock()
+
+
+def _reset_lock_after_fork():
+    # Un proceso hijo (extracción / shards) no hereda el lock tomado por otro thread del padre
+    global _INIT_LOCK
+    _INIT_LOCK = threading.RLock()
+
+
+os.register_at_fork(after_in_child=_reset_lock_after_fork)
+
+
+class LazyObject:
+    """
+    Proxy que construye el objeto con `factory()` en el primer acceso a un
+    atributo y a partir de ahí delega en él (thread-safe).
+
+        textract = LazyObject(lambda: boto3.client("textract"), "textract")
+        textract.start_document_text_detection(...)   # el cliente se crea aquí
+    """
+
+    def __init__(self, factory, name=None):
+        self._factory = factory
+        self._name = name or repr(factory)
+        self._value = None
+        self._loaded = False
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self):
+        if not self._loaded:
+            with _INIT_LOCK:
+                if not self._loaded:
+                    self._value = self._factory()
+                    self._loaded = True
+        return self._value
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            # copy / pickle consultan atributos del proxy antes de __init__
+            raise AttributeError(name)
+        return getattr(self.get(), name)
+
+    def __repr__(self):
+        state = "cargado" if self._loaded else "sin cargar"
+        return f"<LazyObject {self._name} ({state})>"
+
+
+def lazy_module(name: str) -> LazyObject:
+    """
+    Módulo que se importa en el primer acceso a uno de sus atributos.
+    """
+    return LazyObject(lambda: importlib.import_module(name), name)
+
+
+def preload(*objects):
+    """
+    Crea ya los objetos diferidos (fase de init / antes del snapshot).
+    """
+    for obj in objects:
+        obj.get()
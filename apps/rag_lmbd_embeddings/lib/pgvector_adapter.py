@@ -0,0 +1,302 @@
+# lib/pgvector_adapter.py
+#
+# Adaptador de pgvector compartido por los Lambdas de embeddings y query.
+# Mantener este archivo idéntico en ambos (apps/*/lib/pgvector_adapter.py).
+import os
+import struct
+import time
+import uuid
+
+import numpy as np
+from psycopg2.extensions import ISQLQuote
+
+# Formato binario de pgvector (vector_send/vector_recv):
+#   int16 dim | int16 unused | float4[dim] big-endian
+# halfvec (halfvec_send/halfvec_recv) usa el mismo header con float2[dim]
+_VECTOR_HEADER = struct.Struct(">HH")
+_FLOAT4_BE = np.dtype(">f4")
+_FLOAT2_BE = np.dtype(">f2")
+
+# Tipos de columna soportados para los embeddings y su opclass de coseno
+VECTOR_OPCLASSES = {
+    "vector": "vector_cosine_ops",
+    "halfvec": "halfvec_cosine_ops",
+}
+
+# Formato binario de COPY: firma + flags + longitud de extensión del header
+COPY_BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+COPY_BINARY_TRAILER = struct.pack(">h", -1)
+
+_INT16 = struct.Struct(">h")
+_INT32 = struct.Struct(">i")
+_NULL_FIELD = _INT32.pack(-1)
+
+
+def as_float32(vec):
+    """
+    Devuelve el vector como np.ndarray float32 1-D (sin copia si ya lo es).
+    """
+    arr = np.asarray(vec, dtype=np.float32)
+    if arr.ndim != 1:
+        arr = arr.reshape(-1)
+    return arr
+
+
+def truncate_embedding(vec, dims) -> np.ndarray:
+    """
+    Primeras `dims` dimensiones re-normalizadas (truncado Matryoshka: los
+    embeddings de Cohere v4 se entrenan para que el prefijo siga siendo útil).
+    """
+    arr = as_float32(vec)[:dims]
+    norm = np.linalg.norm(arr)
+    return arr if norm == 0 else arr / norm
+
+
+def encode_vector(vec) -> bytes:
+    """
+    Codifica un vector float32 en el formato binario de pgvector.
+    """
+    arr = as_float32(vec)
+    return _VECTOR_HEADER.pack(arr.shape[0], 0) + arr.astype(_FLOAT4_BE, copy=False).tobytes()
+
+
+def encode_halfvec(vec) -> bytes:
+    """
+    Codifica un vector en el formato binario de halfvec (float16; pgvector >= 0.7).
+    """
+    arr = as_float32(vec)
+    return _VECTOR_HEADER.pack(arr.shape[0], 0) + arr.astype(_FLOAT2_BE).tobytes()
+
+
+def decode_vector(data) -> np.ndarray:
+    """
+    Decodifica el formato binario de pgvector a np.ndarray float32.
+    """
+    dim, _ = _VECTOR_HEADER.unpack_from(data, 0)
+    return np.frombuffer(data, dtype=_FLOAT4_BE, count=dim, offset=_VECTOR_HEADER.size).astype(np.float32)
+
+
+_LITERAL_FORMATS = {}
+
+
+def vector_literal(vec) -> str:
+    """
+    Representación textual '[x,y,...]' exacta para float32 (9 dígitos significativos).
+    Solo para paths que no admiten parámetros binarios (psycopg2 interpola en texto).
+
+    Convierte el vector a floats de Python (tolist) y los formatea con un único
+    `%` con formato cacheado por dimensión: sigue siendo texto, ~10 bytes por
+    dimensión contra 4 de encode_vector.
+    """
+    arr = as_float32(vec)
+    fmt = _LITERAL_FORMATS.get(arr.shape[0])
+    if fmt is None:
+        fmt = _LITERAL_FORMATS[arr.shape[0]] = "[" + ",".join(["%.9g"] * arr.shape[0]) + "]"
+    return fmt % tuple(arr.tolist())
+
+
+class VectorParam:
+    """
+    Parámetro de psycopg2 para un vector float32: se interpola como el literal
+    de texto '[...]'::vector (ver vector_literal). psycopg2 arma la query del
+    lado del cliente, así que no puede enviar el vector en el formato binario de
+    encode_vector; el binario solo se usa en COPY (encode_copy_rows).
+
+        cur.execute("... ORDER BY embedding <=> %s LIMIT 10", (VectorParam(q),))
+
+    Con type_name="halfvec" el literal se castea a halfvec (columnas halfvec(n)):
+    el operador <=> y el índice halfvec_cosine_ops requieren ambos lados del mismo tipo.
+    """
+
+    def __init__(self, vec, type_name="vector"):
+        self.value = as_float32(vec)
+        self.type_name = type_name
+
+    def __conform__(self, proto):
+        if proto is ISQLQuote:
+            return self
+        return None
+
+    def getquoted(self) -> bytes:
+        return f"'{vector_literal(self.value)}'::{self.type_name}".encode("ascii")
+
+
+class BitParam:
+    """
+    Cuantización binaria de un embedding (1 bit por dimensión: 1 si el valor
+    es > 0, como binary_quantize() de pgvector y el tipo `ubinary` de Cohere),
+    empaquetada de a 8 bits con el más significativo primero.
+
+    Como parámetro de psycopg2 se interpola como B'0101...'; en COPY binario
+    se codifica con encode_bit (formato de bit_send: int32 largo | bytes).
+    """
+
+    def __init__(self, packed, length):
+        self.packed = packed
+        self.length = length
+
+    @classmethod
+    def quantize(cls, vec) -> "BitParam":
+        arr = as_float32(vec)
+        return cls(np.packbits(arr > 0), arr.shape[0])
+
+    def __conform__(self, proto):
+        if proto is ISQLQuote:
+            return self
+        return None
+
+    def getquoted(self) -> bytes:
+        bits = np.unpackbits(self.packed, count=self.length)
+        return b"B'" + (bits + ord("0")).astype(np.uint8).tobytes() + b"'"
+
+
+# --- Campos de COPY ... FROM STDIN (FORMAT binary) ---
+
+def _encode_uuid(value) -> bytes:
+    return value.bytes if isinstance(value, uuid.UUID) else uuid.UUID(str(value)).bytes
+
+
+def _encode_text(value) -> bytes:
+    return str(value).encode("utf-8")
+
+
+def _encode_int4(value) -> bytes:
+    return _INT32.pack(int(value))
+
+
+def _encode_bytea(value) -> bytes:
+    return bytes(value)
+
+
+def encode_bit(value: BitParam) -> bytes:
+    return _INT32.pack(value.length) + value.packed.tobytes()
+
+
+COPY_FIELD_ENCODERS = {
+    "uuid": _encode_uuid,
+    "text": _encode_text,
+    "int4": _encode_int4,
+    "bytea": _encode_bytea,
+    "vector": encode_vector,
+    "halfvec": encode_halfvec,
+    "bit": encode_bit,
+}
+
+
+# Segundos durante los que se reutilizan las columnas leídas del catálogo: después
+# de una migración (p. ej. vector → halfvec) los contenedores calientes la ven a
+# más tardar en este tiempo (o antes, ver invalidate_table_columns)
+TABLE_COLUMNS_TTL_SECONDS = float(os.getenv("TABLE_COLUMNS_TTL_SECONDS", "300"))
+
+_TABLE_COLUMNS = {}     # {tabla: (columnas, vence)}
+
+# Espera máxima por el lock ACCESS EXCLUSIVE de un ALTER TABLE de migración: con
+# consultas largas sobre la tabla el ALTER falla (y se reintenta en la próxima
+# verificación) en lugar de bloquear detrás suyo todas las lecturas y escrituras
+MIGRATION_LOCK_TIMEOUT_MS = int(os.getenv("MIGRATION_LOCK_TIMEOUT_MS", "5000"))
+
+
+def invalidate_table_columns(table=None):
+    """
+    Olvida las columnas cacheadas de `table` (o de todas las tablas), p. ej.
+    después de un error que puede deberse a una columna o tipo que cambió.
+    """
+    if table is None:
+        _TABLE_COLUMNS.clear()
+    else:
+        _TABLE_COLUMNS.pop(table, None)
+
+
+def _table_columns(cur, table) -> dict:
+    """
+    {columna: (tipo, typmod)} de `table`, leído del catálogo y cacheado por
+    proceso durante TABLE_COLUMNS_TTL_SECONDS.
+    """
+    cached = _TABLE_COLUMNS.get(table)
+    if cached is None or time.monotonic() >= cached[1]:
+        cur.execute(
+            """
+            SELECT a.attname, t.typname, a.atttypmod
+            FROM pg_attribute a
+            JOIN pg_type t ON t.oid = a.atttypid
+            WHERE a.attrelid = to_regclass(%s) AND a.attnum > 0 AND NOT a.attisdropped
+            """,
+            (table,)
+        )
+        columns = {name: (type_name, typmod) for name, type_name, typmod in cur.fetchall()}
+        if not columns:
+            # La tabla todavía no existe: no se cachea
+            return columns
+        cached = (columns, time.monotonic() + TABLE_COLUMNS_TTL_SECONDS)
+        _TABLE_COLUMNS[table] = cached
+    return cached[0]
+
+
+def table_column_types(cur, table) -> dict:
+    """
+    {columna: tipo} de `table` (p. ej. "embedding": "halfvec"). Permite que
+    cada tenant tenga su propio modo de almacenamiento sin configurar los
+    Lambdas por tenant.
+    """
+    return {name: type_name for name, (type_name, _) in _table_columns(cur, table).items()}
+
+
+def column_dimension(cur, table, column):
+    """
+    Dimensión declarada de una columna vector / halfvec / bit de `table`
+    (su typmod), o None si la columna no existe o no declara dimensión.
+    """
+    _, typmod = _table_columns(cur, table).get(column, (None, -1))
+    return typmod if typmod > 0 else None
+
+
+def add_column_if_missing(cur, table, column, definition) -> bool:
+    """
+    Agrega `column` a `table` solo si no figura en el catálogo: ALTER TABLE toma
+    un lock ACCESS EXCLUSIVE aun con IF NOT EXISTS, así que no se ejecuta en cada
+    verificación del esquema (ver también ddl.sql). Devuelve True si la agregó.
+    No hace commit; el lock_timeout queda fijado hasta el fin de la transacción.
+    """
+    if column in table_column_types(cur, table):
+        return False
+    cur.execute("SELECT set_config('lock_timeout', %s, true)", (f"{MIGRATION_LOCK_TIMEOUT_MS}ms",))
+    cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {definition}")
+    invalidate_table_columns(table)
+    return True
+
+
+def embedding_column_type(cur, table, column="embedding") -> str:
+    """
+    Tipo de la columna de embeddings de `table`: "vector" o "halfvec".
+    """
+    type_name = table_column_types(cur, table).get(column, "vector")
+    if type_name not in VECTOR_OPCLASSES:
+        raise ValueError(f"Tipo de columna no soportado para {table}.{column}: {type_name}")
+    return type_name
+
+
+def encode_copy_rows(rows, field_types) -> bytes:
+    """
+    Codifica filas completas para COPY ... FROM STDIN WITH (FORMAT binary),
+    incluyendo header y trailer.
+
+    Args:
+        rows: iterable de tuplas con los valores de cada fila
+        field_types: tipos de cada columna (claves de COPY_FIELD_ENCODERS)
+    """
+    encoders = [COPY_FIELD_ENCODERS[t] for t in field_types]
+    field_count = _INT16.pack(len(encoders))
+
+    parts = [COPY_BINARY_HEADER]
+    for row in rows:
+        parts.append(field_count)
+        for encoder, value in zip(encoders, row):
+            if value is None:
+                parts.append(_NULL_FIELD)
+                continue
+            data = encoder(value)
+            parts.append(_INT32.pack(len(data)))
+            parts.append(data)
+    parts.append(COPY_BINARY_TRAILER)
+
+    return b"".join(parts)
@@ -0,0 +1,133 @@
+# lib/pipeline.py
+import queue
+import threading
+
+_END = object()
+# Intervalo con el que productor y consumidor revisan si la etapa se cerró
+_POLL_SECONDS = 0.1
+
+
+class _StageError:
+    def __init__(self, error):
+        self.error = error
+
+
+class StageClosed(Exception):
+    """
+    Se lanza al leer de una etapa ya cerrada: la etapa que la consume se
+    detiene sin tratarlo como fin normal de los datos.
+    """
+
+
+class Stage:
+    """
+    Etapa de un pipeline: itera `iterable` en un thread propio y entrega sus
+    items a través de una cola acotada (ver `threaded`).
+
+    close() detiene la etapa y espera a que su thread termine; antes cierra
+    (y espera) la etapa `upstream` de la que lee, así cerrar la última etapa
+    de la cadena detiene todas. Al volver de close() ningún thread del
+    pipeline sigue ejecutando código de las etapas.
+    """
+
+    def __init__(self, iterable, maxsize=4, name=None, upstream=None):
+        self._items = queue.Queue(maxsize=maxsize)
+        self._stop = threading.Event()
+        self._finished = False
+        self._upstream = upstream
+        self._worker = threading.Thread(target=self._run, args=(iterable,), name=name, daemon=True)
+        self._worker.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._items.put(item, timeout=_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self, iterable):
+        try:
+            for item in iterable:
+                if not self._put(item):
+                    return
+            self._put(_END)
+        except BaseException as e:
+            self._put(_StageError(e))
+        finally:
+            # El generador se cierra en su propio thread: corren sus finally
+            # (conexiones, executors, procesos de extracción)
+            close = getattr(iterable, "close", None)
+            if close is not None:
+                close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._finished:
+            raise StopIteration
+        while True:
+            if self._stop.is_set():
+                raise StageClosed(f"La etapa {self._worker.name} fue cerrada")
+            try:
+                item = self._items.get(timeout=_POLL_SECONDS)
+                break
+            except queue.Empty:
+                continue
+
+        if item is _END:
+            self._finished = True
+            raise StopIteration
+        if isinstance(item, _StageError):
+            self._finished = True
+            raise item.error
+        return item
+
+    def close(self):
+        self._stop.set()
+        if self._upstream is not None:
+            self._upstream.close()
+        if self._worker is not threading.current_thread():
+            self._worker.join()
+        # Liberar los items que quedaron en la cola
+        while True:
+            try:
+                self._items.get_nowait()
+            except queue.Empty:
+                break
+
+
+def threaded(iterable, maxsize=4, name=None, upstream=None) -> Stage:
+    """
+    Itera `iterable` en un thread propio y entrega sus items a través de una
+    cola acotada (backpressure): el productor se bloquea si el consumidor se atrasa.
+
+    Encadenando etapas con `threaded` cada una corre en paralelo; `upstream`
+    es la etapa de la que lee `iterable`:
+
+        chunks = threaded(iter_chunks(pages), name="chunk")
+        embedded = threaded(iter_embeddings(chunks), name="embed", upstream=chunks)
+        try:
+            for item in embedded: ...
+        finally:
+            embedded.close()    # detiene y espera embed y chunk
+
+    Las excepciones del productor se re-lanzan en el consumidor.
+    """
+    return Stage(iterable, maxsize=maxsize, name=name, upstream=upstream)
+
+
+def batched(iterable, size):
+    """
+    Agrupa los items de `iterable` en listas de hasta `size` elementos.
+    """
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,272 @@
+# lib/s3_range_file.py
+#
+# Archivo de solo lectura sobre un objeto S3: cada lectura se resuelve con GETs
+# por rango (Range: bytes=a-b) en bloques de tamaño fijo, con un cache LRU de
+# bloques. pdfplumber/pdfminer solo leen el xref y los objetos que necesitan,
+# así que contar páginas o extraer algunas no requiere descargar el PDF completo.
+import hashlib
+import io
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+from botocore.exceptions import ClientError
+from lib.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_BLOCK_SIZE = 256 * 1024
+DEFAULT_CACHE_BLOCKS = 256
+# Lecturas secuenciales: se piden hasta este número de bloques por GET
+MAX_READAHEAD_BLOCKS = 16
+
+
+class _BlockCache:
+    """
+    Bloques descargados de un objeto, compartidos por todas las vistas del archivo.
+    """
+
+    def __init__(self, client, bucket, key, size, etag, block_size, max_blocks):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.size = size
+        self.etag = etag
+        self.block_size = block_size
+        self.max_blocks = max_blocks
+
+        self.requests = 0
+        self.bytes_fetched = 0
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, index, readahead=1) -> bytes:
+        with self._lock:
+            block = self._blocks.get(index)
+            if block is not None:
+                self._blocks.move_to_end(index)
+                return block
+
+            # Se piden en un único GET los bloques siguientes que tampoco estén en cache
+            last_block = (self.size - 1) // self.block_size
+            end = index
+            while end < min(last_block, index + readahead - 1) and end + 1 not in self._blocks:
+                end += 1
+
+        data = self.fetch(index * self.block_size, min(self.size, (end + 1) * self.block_size))
+
+        with self._lock:
+            for offset, block_index in enumerate(range(index, end + 1)):
+                self._blocks[block_index] = data[offset * self.block_size:(offset + 1) * self.block_size]
+                self._blocks.move_to_end(block_index)
+            while len(self._blocks) > self.max_blocks:
+                self._blocks.popitem(last=False)
+            return self._blocks.get(index) or data[:self.block_size]
+
+    def fetch(self, start, end) -> bytes:
+        """
+        GET por rango de [start, end). Con el ETag conocido se usa IfMatch: si el
+        objeto cambia durante la lectura, S3 responde 412 en lugar de mezclar versiones.
+        """
+        params = {"Bucket": self.bucket, "Key": self.key, "Range": f"bytes={start}-{end - 1}"}
+        if self.etag:
+            params["IfMatch"] = self.etag
+        data = self.client.get_object(**params)["Body"].read()
+
+        with self._lock:
+            self.requests += 1
+            self.bytes_fetched += len(data)
+        return data
+
+
+class S3RangeFile(io.RawIOBase):
+    """
+    Archivo seekable de solo lectura sobre s3://bucket/key.
+
+        f = S3RangeFile(s3, bucket, key)
+        with pdfplumber.open(f) as pdf:
+            len(pdf.pages)      # lee solo el trailer / xref
+
+    Cada vista (`view()`) tiene su propia posición y comparte el cache de
+    bloques: p. ej. pdfplumber y pypdfium2 pueden leer el mismo objeto sin
+    interferir entre sí. `client` es un cliente S3 de boto3 o cualquier objeto
+    con head_object / get_object (ver LocalDirectoryS3).
+    """
+
+    def __init__(
+        self,
+        client,
+        bucket,
+        key,
+        size=None,
+        etag=None,
+        block_size=DEFAULT_BLOCK_SIZE,
+        cache_blocks=DEFAULT_CACHE_BLOCKS,
+        _cache=None,
+    ):
+        super().__init__()
+        if _cache is None:
+            if size is None:
+                head = client.head_object(Bucket=bucket, Key=key)
+                size = head["ContentLength"]
+                etag = etag or head.get("ETag")
+            _cache = _BlockCache(client, bucket, key, size, etag, block_size, cache_blocks)
+
+        self._cache = _cache
+        self._position = 0
+        self._last_block = None
+        self._readahead = 1
+
+    @property
+    def size(self) -> int:
+        return self._cache.size
+
+    @property
+    def etag(self):
+        """
+        ETag con el que se leen los bloques (IfMatch), o None.
+        """
+        return self._cache.etag
+
+    @property
+    def name(self) -> str:
+        return f"s3://{self._cache.bucket}/{self._cache.key}"
+
+    def view(self) -> "S3RangeFile":
+        """
+        Nueva vista del mismo objeto (posición propia, cache compartido).
+        """
+        return S3RangeFile(None, None, None, _cache=self._cache)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "requests": self._cache.requests,
+            "bytes_fetched": self._cache.bytes_fetched,
+            "cached_blocks": len(self._cache._blocks),
+        }
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"whence inválido: {whence}")
+        if position < 0:
+            raise ValueError(f"Posición negativa: {position}")
+        self._position = position
+        return position
+
+    def read(self, size=-1) -> bytes:
+        if size is None or size < 0:
+            size = self.size - self._position
+        end = min(self.size, self._position + size)
+        if end <= self._position:
+            return b""
+
+        block_size = self._cache.block_size
+        parts = []
+        position = self._position
+        while position < end:
+            index = position // block_size
+            block = self._cache.get(index, self._next_readahead(index))
+            offset = position - index * block_size
+            part = block[offset:offset + end - position]
+            if not part:
+                break
+            parts.append(part)
+            position += len(part)
+
+        self._position = position
+        return b"".join(parts)
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def _next_readahead(self, index) -> int:
+        # Acceso secuencial: se duplica la lectura anticipada; acceso aleatorio: se reinicia
+        if self._last_block is not None and index == self._last_block + 1:
+            self._readahead = min(MAX_READAHEAD_BLOCKS, self._readahead * 2)
+        elif index != self._last_block:
+            self._readahead = 1
+        self._last_block = index
+        return self._readahead
+
+    def iter_bytes(self, chunk_size=8 * 1024 * 1024):
+        """
+        Recorre el objeto completo en GETs de `chunk_size` sin pasar por el
+        cache de bloques (p. ej. para calcular su huella con memoria acotada).
+        """
+        for start in range(0, self.size, chunk_size):
+            yield self._cache.fetch(start, min(self.size, start + chunk_size))
+
+
+class LocalDirectoryS3:
+    """
+    Reemplazo local de S3 para pruebas y benchmarks: el objeto s3://bucket/key
+    es el archivo <root>/<bucket>/<key>. Implementa las llamadas que usan
+    S3RangeFile y PdfDocument (head_object, get_object con Range/IfMatch y
+    download_file).
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.calls = []
+        self._etags = {}
+
+    def _path(self, bucket, key):
+        return os.path.join(self.root, bucket, key)
+
+    def _etag(self, path):
+        stat = os.stat(path)
+        cache_key = (path, stat.st_size, stat.st_mtime_ns)
+        if cache_key not in self._etags:
+            with open(path, "rb") as f:
+                self._etags[cache_key] = f'"{hashlib.md5(f.read()).hexdigest()}"'
+        return self._etags[cache_key]
+
+    def head_object(self, Bucket, Key):
+        path = self._path(Bucket, Key)
+        self.calls.append(("head_object", Key, None))
+        return {"ContentLength": os.path.getsize(path), "ETag": self._etag(path)}
+
+    def get_object(self, Bucket, Key, Range=None, IfMatch=None):
+        path = self._path(Bucket, Key)
+        self.calls.append(("get_object", Key, Range))
+        if IfMatch is not None and IfMatch.strip('"') != self._etag(path).strip('"'):
+            # Mismo error que S3 (412) cuando el objeto ya no tiene ese ETag
+            raise ClientError(
+                {
+                    "Error": {"Code": "PreconditionFailed", "Message": f"{Key} cambió (ETag {IfMatch})"},
+                    "ResponseMetadata": {"HTTPStatusCode": 412},
+                },
+                "GetObject"
+            )
+
+        with open(path, "rb") as f:
+            if Range is None:
+                data = f.read()
+            else:
+                start, end = Range[len("bytes="):].split("-")
+                f.seek(int(start))
+                data = f.read(int(end) - int(start) + 1)
+        return {"Body": io.BytesIO(data), "ContentLength": len(data)}
+
+    def download_file(self, Bucket, Key, Filename):
+        self.calls.append(("download_file", Key, None))
+        shutil.copyfile(self._path(Bucket, Key), Filename)
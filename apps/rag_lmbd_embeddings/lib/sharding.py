@@ -0,0 +1,102 @@
+# lib/sharding.py
+#
+# Fan-out por rangos de páginas para PDFs muy grandes. Cada shard extrae el
+# texto de su rango en paralelo (otra invocación del Lambda o, localmente, un
+# proceso); el reductor pasa las páginas de todos los shards, en orden, por el
+# mismo chunker en streaming que la ingesta secuencial. Los chunks dependen de
+# dónde empezó el chunk anterior, así que chunkear cada shard por separado no
+# coincidiría con el documento completo; el chunking es además una fracción
+# mínima del costo frente a la extracción (pdfplumber / OCR).
+import multiprocessing
+from typing import NamedTuple
+
+from lib.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class ShardPages(NamedTuple):
+    start: int      # índice de la primera página del shard
+    texts: list     # texto de cada página del rango, en orden
+
+
+def shard_ranges(num_pages: int, shard_pages: int) -> list:
+    """
+    Rangos [inicio, fin) de hasta `shard_pages` páginas que cubren el documento.
+    """
+    return [(start, min(num_pages, start + shard_pages)) for start in range(0, num_pages, shard_pages)]
+
+
+def merge_shards(shards, chunk_pages):
+    """
+    Reductor: genera los chunks del documento en orden a partir de los shards
+    (en orden de páginas), a medida que llegan.
+
+    Args:
+        chunk_pages: chunker de la ingesta secuencial, iterable de textos de
+            página → chunks; los chunks son los mismos que sin fan-out
+    """
+    return chunk_pages(_iter_shard_pages(shards))
+
+
+def _iter_shard_pages(shards):
+    expected = 0
+    for shard in shards:
+        if shard.start != expected:
+            raise ValueError(
+                f"Shard fuera de orden: empieza en la página {shard.start + 1}, se esperaba la {expected + 1}"
+            )
+        expected += len(shard.texts)
+        yield from shard.texts
+
+
+def _run_in_child(fn, args, conn):
+    try:
+        conn.send(("ok", fn(*args)))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+def iter_process_results(fn, args_list: list, max_workers: int):
+    """
+    Ejecuta fn(*args) para cada elemento de `args_list` en procesos hijos
+    (hasta `max_workers` a la vez) y genera los resultados en orden.
+
+    Como en lib/document.py se usa Process + Pipe con fork (Lambda no tiene
+    /dev/shm, así que Pool y Queue no funcionan). Los procesos no son daemon
+    para que cada shard pueda a su vez lanzar procesos de extracción.
+    """
+    ctx = multiprocessing.get_context("fork")
+    running = {}
+    next_start = 0
+
+    try:
+        for index in range(len(args_list)):
+            while next_start < len(args_list) and next_start < index + max(1, max_workers):
+                reader, writer = ctx.Pipe(duplex=False)
+                process = ctx.Process(target=_run_in_child, args=(fn, args_list[next_start], writer))
+                process.start()
+                writer.close()
+                running[next_start] = (process, reader)
+                next_start += 1
+
+            process, reader = running.pop(index)
+            try:
+                status, payload = reader.recv()
+            except EOFError:
+                status, payload = "error", "el proceso terminó sin respuesta"
+            finally:
+                reader.close()
+                process.join()
+
+            if status == "error":
+                raise RuntimeError(f"Falló el shard {index}: {payload}")
+            yield payload
+    finally:
+        for process, reader in running.values():
+            reader.close()
+            if process.is_alive():
+                process.terminate()
+            process.join()
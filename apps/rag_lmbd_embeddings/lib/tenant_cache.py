@@ -0,0 +1,76 @@
+# lib/tenant_cache.py
+#
+# Cache por proceso de los pares (tenant, agente) cuyo esquema y agente ya se
+# verificaron en Postgres. Un Lambda caliente que recibe una ráfaga de
+# documentos del mismo agente verifica el esquema una sola vez (por TTL): las
+# llamadas siguientes no hacen ningún round trip a la base.
+import threading
+import time
+
+from lib.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class VerifiedTenantCache:
+    """
+    Pares (tenant, agente) verificados, cada uno válido por `ttl_seconds`.
+
+        cache.ensure(tenant_id, agent_id, verify)   # verify() solo si no está en cache
+
+    Los threads que piden el mismo par a la vez esperan a una única
+    verificación (lock por par) en lugar de repetirla.
+    """
+
+    def __init__(self, ttl_seconds: float, clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._expires = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def is_verified(self, tenant_id, agent_id) -> bool:
+        expires = self._expires.get((tenant_id, agent_id))
+        return expires is not None and self.clock() < expires
+
+    def mark_verified(self, tenant_id, agent_id):
+        if self.ttl_seconds > 0:
+            self._expires[(tenant_id, agent_id)] = self.clock() + self.ttl_seconds
+
+    def invalidate(self, tenant_id):
+        """
+        Olvida todos los agentes del tenant (p. ej. después de un error que
+        puede deberse a un esquema borrado o modificado).
+        """
+        with self._lock:
+            for key in [key for key in self._expires if key[0] == tenant_id]:
+                del self._expires[key]
+
+    def ensure(self, tenant_id, agent_id, verify):
+        if self.is_verified(tenant_id, agent_id):
+            self.hits += 1
+            return
+
+        with self._lock:
+            key_lock = self._locks.setdefault((tenant_id, agent_id), threading.Lock())
+
+        with key_lock:
+            # Otro thread pudo completar la verificación mientras se esperaba
+            if self.is_verified(tenant_id, agent_id):
+                self.hits += 1
+                return
+            self.misses += 1
+            verify()
+            self.mark_verified(tenant_id, agent_id)
+            logger.info(f"Esquema/agente verificado: {tenant_id}/{agent_id} (TTL {self.ttl_seconds:.0f} s)")
+
+
+def lock_tenant_schema(cur, tenant_id):
+    """
+    Advisory lock de la transacción actual sobre el esquema del tenant: las
+    invocaciones concurrentes que crean / migran el mismo esquema se
+    serializan (se libera con el commit o rollback).
+    """
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"tenant_schema:{tenant_id}",))
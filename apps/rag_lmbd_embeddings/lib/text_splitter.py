@@ -0,0 +1,200 @@
+# lib/text_splitter.py
+#
+# Splitter estructural en tiempo lineal. Reemplaza a RecursiveCharacterTextSplitter
+# con la misma semántica de chunk_size / chunk_overlap, pero trabajando sobre
+# offsets: los separadores de cada nivel se buscan una sola vez sobre todo el
+# texto y los chunks se devuelven como spans (inicio, fin) sin copiar strings.
+import re
+from collections import deque
+from typing import NamedTuple
+
+# Separadores base ordenados por prioridad semántica (después de los títulos)
+BASE_SEPARATORS = [
+    "\n\n\n",           # Triple salto = cambio de sección mayor
+    "\n\n",             # Doble salto = nuevo párrafo/sección
+    "\n",               # Salto de línea simple
+    ". ",               # Fin de oración
+    "? ",               # Pregunta
+    "! ",               # Exclamación
+    "; ",               # Punto y coma
+    ", ",               # Coma
+    " ",                # Espacio
+]
+
+
+class ChunkSpan(NamedTuple):
+    start: int
+    end: int
+
+    def text(self, source: str) -> str:
+        return source[self.start:self.end]
+
+
+class _Level:
+    """
+    Posiciones (ordenadas) de los separadores de un nivel en todo el texto, con
+    un cursor que solo avanza: los segmentos se consultan de izquierda a
+    derecha, así que cada posición se visita una sola vez.
+    """
+
+    __slots__ = ("positions", "lengths", "cursor")
+
+    def __init__(self, positions, lengths):
+        self.positions = positions
+        self.lengths = lengths
+        self.cursor = 0
+
+    def boundaries(self, start, end) -> list:
+        """
+        Posiciones de separadores contenidos por completo en [start, end).
+        """
+        positions, lengths = self.positions, self.lengths
+        i = self.cursor
+        while i < len(positions) and positions[i] < start:
+            i += 1
+
+        found = []
+        while i < len(positions) and positions[i] + lengths[i] <= end:
+            found.append(positions[i])
+            i += 1
+
+        self.cursor = i
+        return found
+
+
+def _strip_span(text, start, end):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+class StructureAwareSplitter:
+    """
+    Divide un texto en chunks de hasta `chunk_size` (caracteres o tokens) priorizando
+    cortes estructurales: títulos, luego párrafos, líneas, oraciones, etc.
+
+    Misma semántica que RecursiveCharacterTextSplitter (keep_separator="start",
+    strip_whitespace=True): un segmento se corta por el primer nivel de
+    separadores presente en él; las piezas menores a chunk_size se empaquetan
+    en orden con hasta chunk_overlap de solapamiento y las demás se
+    cortan con los niveles siguientes. A diferencia de langchain, todos los
+    títulos forman un único nivel (en lugar de un separador por título) y cada
+    nivel se busca una sola vez: el costo es O(n) en el largo del texto.
+
+    `length_function(text, start, end)` mide un span (por defecto en
+    caracteres); con un tokenizer (lib.tokenizer) chunk_size y chunk_overlap
+    se expresan en tokens.
+    """
+
+    def __init__(self, chunk_size, chunk_overlap, separators=None, length_function=None):
+        if chunk_overlap > chunk_size:
+            raise ValueError(
+                f"chunk_overlap ({chunk_overlap}) no puede ser mayor que chunk_size ({chunk_size})"
+            )
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = BASE_SEPARATORS if separators is None else separators
+        self.length_function = length_function
+
+    def split_spans(self, text: str, title_lines=()) -> list:
+        """
+        Devuelve [ChunkSpan] (sin espacios de borde, no vacíos) en orden.
+
+        Args:
+            title_lines: títulos detectados (lib.title_detector.TitleLine); el
+                separador de cada título es "\\n<título>\\n", como antes.
+        """
+        self._text = text
+        self._levels = []
+        self._pending = list(self.separators)
+
+        titles = [
+            (t.start - 1, t.end - t.start + 2)
+            for t in title_lines
+            if t.start > 0 and text[t.start - 1] == "\n" and text[t.end:t.end + 1] == "\n"
+        ]
+        if titles:
+            self._levels.append(_Level([p for p, _ in titles], [n for _, n in titles]))
+
+        spans = []
+        self._split(0, len(text), 0, spans)
+        self._text = None
+        return spans
+
+    def split_text(self, text: str, title_lines=()) -> list:
+        return [span.text(text) for span in self.split_spans(text, title_lines)]
+
+    def _length(self, start, end):
+        if self.length_function is None:
+            return end - start
+        return self.length_function(self._text, start, end)
+
+    def _level(self, index):
+        # Los niveles base se indexan recién cuando un segmento los necesita
+        while index >= len(self._levels) and self._pending:
+            sep = self._pending.pop(0)
+            positions = [m.start() for m in re.finditer(re.escape(sep), self._text)]
+            self._levels.append(_Level(positions, [len(sep)] * len(positions)))
+        return self._levels[index] if index < len(self._levels) else None
+
+    def _split(self, start, end, level_index, spans):
+        # Primer nivel con algún separador dentro del segmento
+        level = self._level(level_index)
+        boundaries = []
+        while level is not None:
+            boundaries = level.boundaries(start, end)
+            level_index += 1
+            if boundaries:
+                break
+            level = self._level(level_index)
+
+        pieces = []
+        previous = start
+        for position in boundaries:
+            if position > previous:
+                pieces.append((previous, position))
+            previous = position
+        if end > previous:
+            pieces.append((previous, end))
+
+        good = []
+        for piece_start, piece_end in pieces:
+            length = self._length(piece_start, piece_end)
+            if length < self.chunk_size:
+                good.append((piece_start, piece_end, length))
+                continue
+            if good:
+                self._merge(good, spans)
+                good = []
+            if level is None or self._level(level_index) is None:
+                self._emit(piece_start, piece_end, spans)
+            else:
+                self._split(piece_start, piece_end, level_index, spans)
+        if good:
+            self._merge(good, spans)
+
+    def _merge(self, pieces, spans):
+        """
+        Empaqueta piezas contiguas (inicio, fin, largo) hasta chunk_size; al
+        cerrar un chunk se conservan las últimas piezas (hasta chunk_overlap)
+        como inicio del siguiente.
+        """
+        current = deque()
+        total = 0
+        for piece in pieces:
+            length = piece[2]
+            if total + length > self.chunk_size and current:
+                self._emit(current[0][0], current[-1][1], spans)
+                while total > self.chunk_overlap or (total + length > self.chunk_size and total > 0):
+                    total -= current.popleft()[2]
+            current.append(piece)
+            total += length
+        if current:
+            self._emit(current[0][0], current[-1][1], spans)
+
+    def _emit(self, start, end, spans):
+        start, end = _strip_span(self._text, start, end)
+        if end > start:
+            spans.append(ChunkSpan(start, end))
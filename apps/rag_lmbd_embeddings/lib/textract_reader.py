@@ -0,0 +1,105 @@
+# lib/textract_reader.py
+import random
+import time
+
+from lib.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+SUCCESS_STATUSES = {"SUCCEEDED", "PARTIAL_SUCCESS"}
+
+
+class TextractTimeoutError(Exception):
+    pass
+
+
+def _wait_for_job(client, job_id, deadline_seconds, poll_initial, poll_max, sleep, clock):
+    """
+    Hace polling del job con backoff exponencial acotado y jitter, bajo un deadline total.
+    Devuelve la primera página de resultados (la respuesta que indicó el éxito).
+    """
+    started = clock()
+    delay = poll_initial
+
+    while True:
+        result = client.get_document_text_detection(JobId=job_id)
+        status = result["JobStatus"]
+
+        if status in SUCCESS_STATUSES:
+            if status == "PARTIAL_SUCCESS":
+                logger.warning(f"Textract job {job_id} terminó con PARTIAL_SUCCESS: {result.get('Warnings')}")
+            return result
+
+        if status == "FAILED":
+            raise Exception(f"Textract job failed: {result.get('StatusMessage', '')}")
+
+        remaining = deadline_seconds - (clock() - started)
+        if remaining <= 0:
+            raise TextractTimeoutError(
+                f"Textract job {job_id} no terminó en {deadline_seconds}s (estado {status})"
+            )
+
+        sleep(min(remaining, random.uniform(delay / 2, delay)))
+        delay = min(poll_max, delay * 2)
+
+
+def iter_textract_pages(
+    client,
+    bucket,
+    key,
+    deadline_seconds=600,
+    poll_initial=1.0,
+    poll_max=10.0,
+    sleep=time.sleep,
+    clock=time.monotonic,
+    job_id=None,
+    on_job_started=None,
+):
+    """
+    Ejecuta detect_document_text asincrónico sobre un PDF en S3 y genera el texto
+    de cada página (líneas unidas por "\\n") a medida que llegan las páginas de
+    resultados (NextToken).
+
+    - Reutiliza la respuesta que indicó el éxito del job como primera página.
+    - No acumula el documento: cada página se emite cuando aparece un bloque
+      de la página siguiente (Textract devuelve los bloques ordenados por página).
+    - `client`, `sleep` y `clock` son inyectables para probar con un Textract local.
+    - Con `job_id` se reutilizan los resultados de un job previo (Textract los
+      conserva 7 días) en lugar de iniciar otro; `on_job_started(job_id)` se
+      invoca al iniciar un job nuevo, para poder guardarlo como checkpoint.
+    """
+    if job_id is None:
+        response = client.start_document_text_detection(
+            DocumentLocation={
+                "S3Object": {"Bucket": bucket, "Name": key}
+            }
+        )
+        job_id = response["JobId"]
+        if on_job_started is not None:
+            on_job_started(job_id)
+    else:
+        logger.info(f"Reutilizando resultados del Textract job {job_id}")
+
+    result = _wait_for_job(client, job_id, deadline_seconds, poll_initial, poll_max, sleep, clock)
+
+    current_page = None
+    lines = []
+
+    while True:
+        for block in result.get("Blocks", []):
+            if block["BlockType"] != "LINE":
+                continue
+            page = block["Page"]
+            if current_page is not None and page != current_page and lines:
+                yield "\n".join(lines)
+                lines = []
+            current_page = page
+            lines.append(block["Text"])
+
+        next_token = result.get("NextToken")
+        if not next_token:
+            break
+        result = client.get_document_text_detection(JobId=job_id, NextToken=next_token)
+
+    if lines:
+        yield "\n".join(lines)
@@ -0,0 +1,84 @@
+# lib/title_detector.py
+#
+# Detección de títulos y subtítulos para usarlos como separadores de chunking.
+# Todos los patrones se combinan en una única expresión precompilada: cada
+# línea se evalúa una sola vez y el grupo que coincide indica la clase del título.
+import re
+from collections import Counter
+from typing import NamedTuple
+
+# (grupo, clase, patrón) en orden de prioridad: gana el primero que coincide
+TITLE_PATTERNS = [
+    ("markdown", "markdown", r'#{1,6}\s+.+'),                          # Markdown headers
+    ("numeric", "numeric", r'\d+\.[\d\.]*\s+[A-ZÁÉÍÓÚÑ].*'),           # Numeración: 1. Título, 1.1 Subtítulo
+    ("roman", "roman", r'[IVXLCDM]+\.\s+.+'),                          # Numeración romana: I. Título
+    ("uppercase", "uppercase", r'[A-Z][A-Z\s]{3,}'),                   # TÍTULOS EN MAYÚSCULAS (mín 4 chars)
+    ("keyword_es", "keyword", r'(?:Capítulo|Sección|Artículo|Anexo)\s+\d*.*'),  # Palabras clave de sección
+    ("keyword_en", "keyword", r'(?:Chapter|Section|Article|Annex)\s+\d*.*'),    # Palabras clave en inglés
+]
+
+TITLE_CLASSES = {group: kind for group, kind, _ in TITLE_PATTERNS}
+
+# Cada alternativa lleva su propio ancla de fin: si una no cubre la línea
+# completa se prueba la siguiente, igual que evaluar los patrones en secuencia
+TITLE_REGEX = re.compile(
+    "|".join(f"(?P<{group}>{pattern})$" for group, _, pattern in TITLE_PATTERNS)
+)
+
+# Longitud mínima (sin espacios de borde) de una línea para considerarla título
+MIN_TITLE_LENGTH = 4
+
+
+class TitleLine(NamedTuple):
+    start: int   # offset del título (sin espacios de borde) en el texto
+    end: int
+    kind: str    # markdown, numeric, roman, uppercase o keyword
+
+
+def find_title_lines(text: str) -> list:
+    """
+    Detecta en una sola pasada las líneas que son títulos.
+    Devuelve [TitleLine] en orden de aparición (incluye títulos repetidos).
+    """
+    titles = []
+    match = TITLE_REGEX.match
+    line_start = 0
+
+    for line in text.split("\n"):
+        line_stripped = line.strip()
+        if len(line_stripped) >= MIN_TITLE_LENGTH:
+            hit = match(line_stripped)
+            if hit is not None:
+                start = line_start + len(line) - len(line.lstrip())
+                titles.append(TitleLine(start, start + len(line_stripped), TITLE_CLASSES[hit.lastgroup]))
+        line_start += len(line) + 1
+
+    return titles
+
+
+def detect_title_separators(text: str, title_lines=None) -> dict:
+    """
+    Separadores de títulos del texto.
+
+    Returns:
+        dict {separador: clase} en orden de aparición, sin duplicados. El
+        separador es "\\n<título>\\n" y la clase una de markdown, numeric,
+        roman, uppercase o keyword.
+    """
+    if title_lines is None:
+        title_lines = find_title_lines(text)
+
+    separators = {}
+    for title in title_lines:
+        sep = f"\n{text[title.start:title.end]}\n"
+        if sep not in separators:
+            separators[sep] = title.kind
+
+    return separators
+
+
+def count_title_classes(separators: dict) -> Counter:
+    """
+    Cantidad de títulos detectados por clase.
+    """
+    return Counter(separators.values())
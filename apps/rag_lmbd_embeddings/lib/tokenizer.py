@@ -0,0 +1,70 @@
+# lib/tokenizer.py
+#
+# Conteo de tokens para dimensionar chunks y presupuestar contexto.
+# Por defecto se usa una aproximación rápida sin dependencias; se puede
+# enchufar un tokenizer real con TOKENIZER=tiktoken:<encoding> o
+# TOKENIZER=hf:<modelo> (requieren tiktoken / tokenizers instalados).
+import re
+
+# Palabras (incluye acentos y ñ) o signos sueltos
+_WORD_RE = re.compile(r"\w+|[^\w\s]")
+
+
+class ApproximateTokenizer:
+    """
+    Aproximación de un tokenizer BPE/sentencepiece para español e inglés:
+    cada signo de puntuación es un token y cada palabra ocupa un token cada
+    `chars_per_token` caracteres (las palabras cortas y frecuentes, uno solo).
+    Cuenta sobre offsets del texto sin copiarlo.
+    """
+
+    name = "approx"
+
+    def __init__(self, chars_per_token=4):
+        self.chars_per_token = chars_per_token
+
+    def count(self, text: str, start: int = 0, end: int = None) -> int:
+        if end is None:
+            end = len(text)
+        step = self.chars_per_token
+        return sum(1 + (len(w) - 1) // step for w in _WORD_RE.findall(text, start, end))
+
+
+class TiktokenTokenizer:
+    def __init__(self, encoding_name):
+        import tiktoken  # dependencia opcional
+
+        self.name = f"tiktoken:{encoding_name}"
+        self._encoding = tiktoken.get_encoding(encoding_name)
+
+    def count(self, text: str, start: int = 0, end: int = None) -> int:
+        return len(self._encoding.encode_ordinary(text[start:end]))
+
+
+class HuggingFaceTokenizer:
+    def __init__(self, model_name):
+        from tokenizers import Tokenizer  # dependencia opcional
+
+        self.name = f"hf:{model_name}"
+        self._tokenizer = Tokenizer.from_pretrained(model_name)
+
+    def count(self, text: str, start: int = 0, end: int = None) -> int:
+        return len(self._tokenizer.encode(text[start:end], add_special_tokens=False).ids)
+
+
+def get_tokenizer(spec: str = "approx"):
+    """
+    Crea un tokenizer a partir de su especificación:
+    "approx" | "tiktoken:<encoding>" | "hf:<modelo>".
+    """
+    kind, _, arg = (spec or "approx").partition(":")
+    try:
+        if kind == "approx":
+            return ApproximateTokenizer(int(arg) if arg else 4)
+        if kind == "tiktoken":
+            return TiktokenTokenizer(arg or "cl100k_base")
+        if kind == "hf":
+            return HuggingFaceTokenizer(arg)
+    except ImportError as e:
+        raise RuntimeError(f"El tokenizer '{spec}' requiere una dependencia no instalada: {e}") from e
+    raise ValueError(f"Tokenizer no soportado: {spec}")
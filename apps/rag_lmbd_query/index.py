@@ -2,11 +2,23 @@ import os
 import json
 import boto3
 from botocore.exceptions import ClientError
-import psycopg2
 from lib.llmClient import LLMClient
 from string import Template
 import numpy as np
+import psycopg2
 from pgvector.psycopg2 import register_vector
+from lib.db_pool import ConnectionPool
+from lib.lazy import LazyObject, preload
+from lib.pgvector_adapter import (
+    BitParam,
+    VectorParam,
+    column_dimension,
+    embedding_column_type,
+    invalidate_table_columns,
+    table_column_types,
+    truncate_embedding,
+)
+from lib.tokenizer import get_tokenizer
 # AWS Session Setup (for local testing)
 AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
 AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID_DEV', "")
@@ -21,10 +33,13 @@ if AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY:
         "region_name": AWS_REGION 
     })
 
-endpoint_url = f"https://s3.{AWS_REGION}.amazonaws.com"
-s3 = boto3.client('s3', endpoint_url=endpoint_url, **session_args)
+# El cliente se crea en el primer uso; LAZY_INIT=false lo crea en la fase de init
+# (SnapStart / provisioned concurrency: queda listo antes de la primera consulta)
+LAZY_INIT = os.getenv("LAZY_INIT", "true").lower() == "true"
 
-bedrock = boto3.client("bedrock-runtime", **session_args)
+bedrock = LazyObject(lambda: boto3.client("bedrock-runtime", **session_args), "bedrock-runtime")
+if not LAZY_INIT:
+    preload(bedrock)
 
 # 🔐 Se deben pasar estas variables al Lambda (ENV VARS)
 DB_NAME = os.getenv("DB_NAME","postgres")
@@ -32,35 +47,57 @@ DB_USER = os.getenv("DB_USER","postgres")
 DB_PASSWORD = os.getenv("DB_PASSWORD","postgres")
 DB_HOST = os.getenv("DB_HOST","localhost")
 DB_PORT = os.getenv("DB_PORT", "5432")
+# Pool de conexiones reutilizado entre invocaciones calientes: conexiones inactivas
+# conservadas, y segundos de inactividad a partir de los cuales se validan antes de usarlas
+DB_POOL_MAX_IDLE = int(os.getenv("DB_POOL_MAX_IDLE", "2"))
+DB_POOL_HEALTH_CHECK_SECONDS = float(os.getenv("DB_POOL_HEALTH_CHECK_SECONDS", "30"))
 MAIN_LLM_MODEL = os.getenv("MAIN_LLM_MODEL", "openai.gpt-oss-120b-1:0")
 FALLBACK_LLM_MODEL = os.getenv("FALLBACK_LLM_MODEL", "openai.gpt-oss-20b-1:0")
 #EMBEDDINGS_MODEL = os.getenv("EMBEDDINGS_MODEL", "amazon.titan-embed-text-v2:0")
 EMBEDDINGS_MODEL = os.getenv("EMBEDDINGS_MODEL", "cohere.embed-v4:0")
 OUTPUT_TOKENS = os.getenv("OUTPUT_TOKENS", "2048")
 MAX_EMBED_TEXT_LENGTH = 20000
+# Presupuesto de tokens para el contexto del prompt (se usa el token_count guardado por chunk)
+MAX_CONTEXT_TOKENS = int(os.getenv("MAX_CONTEXT_TOKENS", "12000"))
+# Solo para chunks ingestados antes de guardar token_count
+tokenizer = get_tokenizer(os.getenv("TOKENIZER", "approx"))
+# Búsqueda en dos etapas para tenants con embedding_bits: candidatos por distancia
+# de Hamming sobre la cuantización binaria y re-ranking exacto con el vector completo
+# (0 desactiva el pre-filtro). Es también el ef_search del índice HNSW (máx. 1000)
+BINARY_PREFILTER_CANDIDATES = int(os.getenv("BINARY_PREFILTER_CANDIDATES", "400"))
+# Idem para tenants con embedding_low (prefijo Matryoshka): candidatos de la primera
+# pasada de baja dimensión, re-puntuados con las 1536 dimensiones (0 la desactiva)
+LOW_DIM_CANDIDATES = int(os.getenv("LOW_DIM_CANDIDATES", "400"))
 
 
 
 # --- Database connection helper ---
+# El tipo vector se registra una sola vez por conexión física (al abrirla)
+db_pool = ConnectionPool(
+    {
+        "dbname": DB_NAME,
+        "user": DB_USER,
+        "password": DB_PASSWORD,
+        "host": DB_HOST,
+        "port": DB_PORT,
+    },
+    max_idle=DB_POOL_MAX_IDLE,
+    health_check_after=DB_POOL_HEALTH_CHECK_SECONDS,
+    on_connect=register_vector,
+)
+
+
 def get_connection():
-    conn = psycopg2.connect(
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        host=DB_HOST,
-        port=DB_PORT,
-    )
-    register_vector(conn)
-    return conn
+    """
+    Conexión del pool del módulo: close() la devuelve al pool en lugar de cerrarla.
+    """
+    return db_pool.getconn()
 
 def normalize(v):
     v = np.array(v, dtype=np.float32).squeeze()
     n = np.linalg.norm(v)
     return v if n == 0 else v / n
 
-def to_pgvector(vec):
-    return "(" + ",".join(str(v) for v in vec) + ")"
-
 def embed(text: str):
     if len(text) > MAX_EMBED_TEXT_LENGTH:
         text = text[:MAX_EMBED_TEXT_LENGTH]
@@ -103,84 +140,159 @@ def embed(text: str):
     else:
         raise RuntimeError(f"No se encontró un vector de embeddings en: {result}")
 
-    # normalizar
-    return normalize(vec).tolist()
+    # normalizar (np.ndarray float32)
+    return normalize(vec)
 
 
 
 
+def _first_pass(cur, table, q_emb, k):
+    """
+    Primera pasada de la búsqueda en dos etapas según las columnas del tenant:
+    (expresión ORDER BY, parámetro, candidatos), o None para la búsqueda directa.
+    Con ambas columnas se usa la binaria (192 bytes por fila).
+    """
+    columns = table_column_types(cur, table)
+    if "embedding_bits" in columns and BINARY_PREFILTER_CANDIDATES > k:
+        return "embedding_bits <~> %s", BitParam.quantize(q_emb), BINARY_PREFILTER_CANDIDATES
+
+    if "embedding_low" in columns and LOW_DIM_CANDIDATES > k:
+        dims = column_dimension(cur, table, "embedding_low")
+        q_low = VectorParam(truncate_embedding(q_emb, dims), columns["embedding_low"])
+        return "embedding_low <=> %s", q_low, LOW_DIM_CANDIDATES
+
+    return None
+
+
 # --- Semantic Search adaptado al nuevo esquema ---
 def semantic_search(query, tenant_id, document_id=None, agent_id=None, k=50):
     # 1) Obtener embedding del query
     q_emb = embed(query)  # <-- tu función embed()
     
-    if not isinstance(q_emb, list):
-        raise ValueError("El embedding debe ser una lista")
-    if len(q_emb) != 1536:
-        raise ValueError(f"Embedding query tiene {len(q_emb)} dims y deben ser 1536")
-
-    # Convertimos a formato pgvector: [0.1,0.2,...]
-    q_emb_str = "[" + ",".join(str(float(x)) for x in q_emb) + "]"
+    if not isinstance(q_emb, np.ndarray):
+        raise ValueError("El embedding debe ser un np.ndarray")
+    if q_emb.shape != (1536,):
+        raise ValueError(f"Embedding query tiene {q_emb.size} dims y deben ser 1536")
 
     schema = f"tenant_{tenant_id}"
-    conn = get_connection()
-    cur = conn.cursor()
-
-    # Base query
-    sql = f"""
-        SELECT 
-            chunk_text,
-            embedding <=> %s::vector AS distance
-        FROM {schema}.documents
-    """
-
-    params = [q_emb_str]
 
     # Filtros opcionales
     filters = []
+    filter_params = []
     if document_id:
         filters.append("document_id = %s")
-        params.append(document_id)
+        filter_params.append(document_id)
 
     if agent_id:
         filters.append("agent_id = %s")
-        params.append(agent_id)
+        filter_params.append(agent_id)
 
-    if filters:
-        sql += " WHERE " + " AND ".join(filters)
+    where = " WHERE " + " AND ".join(filters) if filters else ""
 
-    sql += " ORDER BY embedding <=> %s::vector LIMIT %s"
-
-    params.append(q_emb_str)
-    params.append(k)
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
 
-    cur.execute(sql, params)
-    rows = cur.fetchall()
+        # Parámetro adaptado directamente a pgvector (sin listas ni str() por elemento),
+        # casteado al tipo de la columna del tenant (vector / halfvec) para usar su índice
+        q_param = VectorParam(q_emb, embedding_column_type(cur, f"{schema}.documents"))
 
-    cur.close()
-    conn.close()
+        # Tenants que todavía no ingestaron con token_count: build_context lo estima
+        if "token_count" in table_column_types(cur, f"{schema}.documents"):
+            token_count = "token_count"
+        else:
+            token_count = "NULL::int AS token_count"
+
+        first_pass = _first_pass(cur, f"{schema}.documents", q_emb, k)
+        if first_pass:
+            # 1) Candidatos con la representación reducida (índice HNSW propio)
+            # 2) Re-ranking exacto de los candidatos por distancia coseno
+            order_by, first_param, candidates = first_pass
+            cur.execute(f"SET LOCAL hnsw.ef_search = {min(candidates, 1000)}")
+            sql = f"""
+                WITH candidates AS MATERIALIZED (
+                    SELECT chunk_text, {token_count}, embedding
+                    FROM {schema}.documents
+                    {where}
+                    ORDER BY {order_by}
+                    LIMIT %s
+                )
+                SELECT
+                    chunk_text,
+                    embedding <=> %s AS distance,
+                    token_count
+                FROM candidates
+                ORDER BY distance
+                LIMIT %s
+            """
+            params = filter_params + [first_param, candidates, q_param, k]
+        else:
+            sql = f"""
+                SELECT 
+                    chunk_text,
+                    embedding <=> %s AS distance,
+                    {token_count}
+                FROM {schema}.documents
+                {where}
+                ORDER BY embedding <=> %s LIMIT %s
+            """
+            params = [q_param] + filter_params + [q_param, k]
+
+        try:
+            cur.execute(sql, params)
+        except psycopg2.Error:
+            # Puede deberse a una columna o tipo que cambió (p. ej. migración a halfvec)
+            invalidate_table_columns(f"{schema}.documents")
+            raise
+        rows = cur.fetchall()
+
+        cur.close()
+    finally:
+        # Vuelve al pool también si la consulta falla (el pool descarta la transacción)
+        conn.close()
 
     return rows
 
 
 
 
+def build_context(rows, max_tokens=MAX_CONTEXT_TOKENS) -> str:
+    """
+    Arma el contexto con los chunks en orden de relevancia hasta completar
+    `max_tokens`, usando el token_count guardado en la ingesta (sin re-tokenizar).
+    """
+    parts = []
+    used = 0
+    for chunk_text, _, token_count in rows:
+        if token_count is None:
+            token_count = tokenizer.count(chunk_text)
+        if parts and used + token_count > max_tokens:
+            break
+        parts.append(chunk_text)
+        used += token_count
+
+    print(f"[INFO] Contexto: {len(parts)} de {len(rows)} chunks, ~{used} tokens")
+    return "\n\n".join(parts)
+
+
 # --- Get prompt template of the agent ---
 def get_prompt_template(tenant_id, agent_id):
     schema = f"tenant_{tenant_id}"
 
     conn = get_connection()
-    cur = conn.cursor()
+    try:
+        cur = conn.cursor()
 
-    cur.execute(
-        f"SELECT prompt_template FROM {schema}.agents WHERE agent_id = %s",
-        (agent_id,)
-    )
+        cur.execute(
+            f"SELECT prompt_template FROM {schema}.agents WHERE agent_id = %s",
+            (agent_id,)
+        )
 
-    row = cur.fetchone()
+        row = cur.fetchone()
 
-    cur.close()
-    conn.close()
+        cur.close()
+    finally:
+        conn.close()
 
     if not row:
         raise Exception("Agente no encontrado para ese tenant.")
@@ -243,7 +355,7 @@ def handler(event, context):
 
     # Obtener chunks relevantes
     contexts = semantic_search(query, tenant_id, document_id , agent_id)
-    context_text = "\n\n".join([c[0] for c in contexts])
+    context_text = build_context(contexts)
 
     # Obtener prompt del agente
     agent_prompt = get_prompt_template(tenant_id, agent_id)
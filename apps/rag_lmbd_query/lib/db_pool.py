@@ -0,0 +1,191 @@
+# lib/db_pool.py
+#
+# Pool de conexiones a Postgres a nivel de módulo: sobrevive entre invocaciones
+# calientes, así cada operación reutiliza una conexión TLS ya establecida en
+# lugar de abrir una nueva. Mantener este archivo idéntico en ambos Lambdas
+# (apps/*/lib/db_pool.py); los tests están en apps/agent/tests/unit/test_db_pool.py.
+import os
+import threading
+import time
+
+import psycopg2
+from psycopg2 import extensions
+
+_TRANSACTION_OPEN = (extensions.TRANSACTION_STATUS_INTRANS, extensions.TRANSACTION_STATUS_INERROR)
+
+
+class PooledConnection:
+    """
+    Conexión prestada por el pool. Se usa igual que una conexión de psycopg2
+    (cursor, commit, rollback, `with conn:` ...); close() la devuelve al pool
+    (descartando la transacción abierta) en lugar de cerrarla.
+    """
+
+    def __init__(self, pool, raw, created):
+        self._pool = pool
+        self._raw = raw
+        self._created = created
+
+    @property
+    def raw(self):
+        return self._raw
+
+    @property
+    def closed(self):
+        return self._raw is None or self._raw.closed
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise psycopg2.InterfaceError("La conexión ya fue devuelta al pool")
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        self._raw.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._raw.__exit__(exc_type, exc, tb)
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool.release(raw, self._created)
+
+
+class ConnectionPool:
+    """
+    Pool thread-safe de conexiones psycopg2.
+
+        pool = ConnectionPool(DB_CONFIG, on_connect=register_vector)
+        conn = pool.getconn()
+        try:
+            ...
+        finally:
+            conn.close()        # vuelve al pool
+
+    - Las conexiones nuevas se abren a demanda (no hay límite de préstamo);
+      al devolverlas se conservan hasta `max_idle` y el resto se cierra.
+    - Una conexión inactiva por más de `health_check_after` segundos se valida
+      con SELECT 1 antes de prestarla; si está caída (p. ej. cerrada por el
+      servidor mientras el Lambda estaba congelado) se reemplaza por una nueva.
+    - Las conexiones se renuevan después de `max_lifetime` segundos.
+    - `on_connect(raw)` se ejecuta una sola vez por conexión física
+      (p. ej. registrar el tipo vector).
+    - Después de un fork, el proceso hijo no reutiliza las conexiones del padre.
+    """
+
+    def __init__(
+        self,
+        connect_kwargs: dict,
+        max_idle: int = 4,
+        health_check_after: float = 30.0,
+        max_lifetime: float = 3600.0,
+        on_connect=None,
+        connect=psycopg2.connect,
+        clock=time.monotonic,
+    ):
+        self.connect_kwargs = dict(connect_kwargs)
+        self.max_idle = max_idle
+        self.health_check_after = health_check_after
+        self.max_lifetime = max_lifetime
+        self.on_connect = on_connect
+        self.connect = connect
+        self.clock = clock
+
+        self._idle = []     # [(raw, created, last_used)], la más reciente al final
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._stats = {"connects": 0, "reuses": 0, "health_checks": 0, "discarded": 0}
+
+    def getconn(self) -> PooledConnection:
+        self._check_fork()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                raw, created, last_used = self._idle.pop()
+
+            if self._usable(raw, created, last_used):
+                self._count("reuses")
+                return PooledConnection(self, raw, created)
+            self._discard(raw)
+
+        raw = self.connect(**self.connect_kwargs)
+        try:
+            if self.on_connect is not None:
+                self.on_connect(raw)
+        except Exception:
+            self._discard(raw)
+            raise
+        self._count("connects")
+        return PooledConnection(self, raw, self.clock())
+
+    def release(self, raw, created):
+        """
+        Devuelve una conexión física al pool (la usa PooledConnection.close).
+        """
+        if os.getpid() != self._pid or raw.closed:
+            return
+
+        try:
+            status = raw.get_transaction_status()
+            if status in _TRANSACTION_OPEN:
+                raw.rollback()
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                self._discard(raw)
+                return
+        except psycopg2.Error:
+            self._discard(raw)
+            return
+
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append((raw, created, self.clock()))
+                return
+        self._discard(raw)
+
+    def closeall(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for raw, _, _ in idle:
+            self._discard(raw)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "idle": len(self._idle)}
+
+    def _usable(self, raw, created, last_used) -> bool:
+        if raw.closed:
+            return False
+        now = self.clock()
+        if self.max_lifetime and now - created > self.max_lifetime:
+            return False
+        if now - last_used < self.health_check_after:
+            return True
+
+        self._count("health_checks")
+        try:
+            with raw.cursor() as cur:
+                cur.execute("SELECT 1")
+            raw.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
+
+    def _discard(self, raw):
+        self._count("discarded")
+        try:
+            raw.close()
+        except psycopg2.Error:
+            pass
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _check_fork(self):
+        # Las conexiones heredadas comparten el socket con el padre: se olvidan sin cerrarlas
+        if os.getpid() != self._pid:
+            with self._lock:
+                self._idle = []
+                self._pid = os.getpid()
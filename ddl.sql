@@ -15,6 +15,8 @@ CREATE TABLE IF NOT EXISTS {tenant_name}.documents (
     document_id     UUID  NOT NULL,     -- mismo valor para todos los chunks del documento
     document_name   TEXT NOT NULL,     -- nombre del archivo original
     chunk_text      TEXT          NOT NULL,     -- contenido del chunk
+    chunk_hash      BYTEA,                      -- sha256 del chunk (re-indexado incremental)
+    token_count     INT,                        -- tokens del chunk (presupuesto de contexto en la consulta)
     embedding       VECTOR(1536),    -- posición del chunk en el documento
     created_at      TIMESTAMP     DEFAULT NOW(),
     CONSTRAINT documents_pkey PRIMARY KEY (id)
@@ -22,6 +24,70 @@ CREATE TABLE IF NOT EXISTS {tenant_name}.documents (
 
 CREATE INDEX ON {tenant_name}.documents USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100);
 
+-- Modo halfvec (EMBEDDING_STORAGE=halfvec, pgvector >= 0.7): embeddings en float16,
+-- la mitad de almacenamiento y de índice. En lugar de la columna e índice anteriores:
+--     embedding       HALFVEC(1536),
+-- CREATE INDEX ON {tenant_name}.documents USING ivfflat (embedding halfvec_cosine_ops) WITH (lists = 100);
+
+-- Migración de esquemas existentes
+ALTER TABLE {tenant_name}.documents ADD COLUMN IF NOT EXISTS chunk_hash BYTEA;
+ALTER TABLE {tenant_name}.documents ADD COLUMN IF NOT EXISTS token_count INT;
+
+-- Migración opcional de un tenant existente a halfvec (los Lambdas detectan el tipo de la columna)
+-- DROP INDEX IF EXISTS {tenant_name}.idx_{tenant_name}_documents_embedding;
+-- ALTER TABLE {tenant_name}.documents ALTER COLUMN embedding TYPE HALFVEC(1536) USING embedding::halfvec(1536);
+-- CREATE INDEX idx_{tenant_name}_documents_embedding ON {tenant_name}.documents
+--     USING ivfflat (embedding halfvec_cosine_ops) WITH (lists = 100);
+
+-- Pre-filtro binario (BINARY_PREFILTER_ENABLED=true, pgvector >= 0.7): cuantización a 1 bit
+-- por dimensión con índice HNSW por Hamming; la consulta toma BINARY_PREFILTER_CANDIDATES
+-- candidatos por Hamming y los re-rankea con el embedding completo
+-- ALTER TABLE {tenant_name}.documents ADD COLUMN IF NOT EXISTS embedding_bits BIT(1536);
+-- UPDATE {tenant_name}.documents SET embedding_bits = binary_quantize(embedding)::bit(1536)
+--     WHERE embedding_bits IS NULL;
+-- CREATE INDEX IF NOT EXISTS idx_{tenant_name}_documents_embedding_bits ON {tenant_name}.documents
+--     USING hnsw (embedding_bits bit_hamming_ops);
+
+-- Primera pasada de baja dimensión (LOW_DIM_EMBEDDING_DIMS=256): prefijo Matryoshka
+-- re-normalizado con su propio índice HNSW; la consulta re-puntúa LOW_DIM_CANDIDATES
+-- candidatos con las 1536 dimensiones. Usar HALFVEC(256) / halfvec_cosine_ops en modo halfvec
+-- ALTER TABLE {tenant_name}.documents ADD COLUMN IF NOT EXISTS embedding_low VECTOR(256);
+-- UPDATE {tenant_name}.documents SET embedding_low = l2_normalize(subvector(embedding, 1, 256))
+--     WHERE embedding_low IS NULL;
+-- CREATE INDEX IF NOT EXISTS idx_{tenant_name}_documents_embedding_low ON {tenant_name}.documents
+--     USING hnsw (embedding_low vector_cosine_ops);
+
+-- Registro de documentos ingestados (idempotencia por huella sha256 del contenido)
+CREATE TABLE IF NOT EXISTS {tenant_name}.document_registry (
+    agent_id        UUID NOT NULL,
+    fingerprint     TEXT NOT NULL,     -- sha256 del PDF
+    etag            TEXT,              -- ETag de S3 (chequeo rápido)
+    document_id     UUID NOT NULL,     -- derivado de la huella (uuid5)
+    document_name   TEXT NOT NULL,
+    status          TEXT NOT NULL,     -- PROCESSING / COMPLETED / FAILED
+    created_at      TIMESTAMP DEFAULT NOW(),
+    updated_at      TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (agent_id, fingerprint)
+);
+
+-- Huella y texto de cada página (re-indexado incremental de nuevas versiones)
+CREATE TABLE IF NOT EXISTS {tenant_name}.document_pages (
+    document_id     UUID NOT NULL,
+    page_number     INT NOT NULL,
+    page_hash       BYTEA NOT NULL,    -- sha256 de los content streams de la página
+    page_text       TEXT NOT NULL,     -- texto extraído (pdfplumber u OCR)
+    PRIMARY KEY (document_id, page_number)
+);
+
+-- Cache de embeddings por (modelo, sha256 del texto del chunk)
+CREATE TABLE IF NOT EXISTS {tenant_name}.embedding_cache (
+    model           TEXT NOT NULL,
+    text_hash       BYTEA NOT NULL,
+    embedding       VECTOR(1536) NOT NULL,
+    created_at      TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (model, text_hash)
+);
+
 
 
 CREATE INDEX IF NOT EXISTS idx_agents 
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Perfil del cold start de los Lambdas RAG: costo de importar el handler
+(apps/<lambda>/index.py) desglosado por módulo.
+
+Para cada Lambda importa index.py en un intérprete nuevo con `python -X importtime`
+y reporta:
+  - el tiempo total de import (lo que paga la fase de init del Lambda)
+  - el código de nivel de módulo de index.py (clientes, pools, constantes)
+  - el costo acumulado de cada import directo del handler
+  - los módulos con mayor tiempo propio
+Con --runs > 1 se toma la mediana de cada valor.
+
+Uso (desde la raíz del repo):
+    python scripts/profile_cold_start.py
+    python scripts/profile_cold_start.py rag_lmbd_query --runs 5 --top 15
+    python scripts/profile_cold_start.py --env LAZY_INIT=false     # init completa (SnapStart)
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+APPS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "apps")
+LAMBDAS = ("rag_lmbd_embeddings", "rag_lmbd_query")
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def profile_once(lambda_name, env):
+    """
+    Importa index.py del Lambda en un proceso nuevo.
+    Devuelve [(nombre, propio_us, acumulado_us, nivel)] en el orden de -X importtime.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import index"],
+        cwd=os.path.join(APPS_DIR, lambda_name),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Falló el import de {lambda_name}/index.py:\n{result.stderr[-2000:]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return entries
+
+
+def summarize(entries):
+    """
+    Separa la entrada de index, sus imports directos (nivel 1 dentro de index)
+    y el tiempo propio de cada módulo.
+    """
+    index_at = max(i for i, (name, _, _, level) in enumerate(entries) if name == "index" and level == 0)
+    _, index_self, index_total, _ = entries[index_at]
+
+    # -X importtime lista los hijos antes que el padre: los imports directos de
+    # index son las entradas de nivel 1 entre la entrada de nivel 0 anterior e index
+    start = index_at
+    while start > 0 and entries[start - 1][3] > 0:
+        start -= 1
+    direct = {name: cumulative for name, _, cumulative, level in entries[start:index_at] if level == 1}
+    own = {name: self_us for name, self_us, _, _ in entries[start:index_at + 1]}
+    return index_total, index_self, direct, own
+
+
+def median_by_key(dicts):
+    values = defaultdict(list)
+    for d in dicts:
+        for key, value in d.items():
+            values[key].append(value)
+    return {key: statistics.median(v) for key, v in values.items()}
+
+
+def report(lambda_name, runs, top, env):
+    summaries = [summarize(profile_once(lambda_name, env)) for _ in range(runs)]
+    total = statistics.median(s[0] for s in summaries)
+    index_self = statistics.median(s[1] for s in summaries)
+    direct = median_by_key(s[2] for s in summaries)
+    own = median_by_key(s[3] for s in summaries)
+
+    print(f"== {lambda_name} ({runs} corrida{'s' if runs > 1 else ''}, mediana) ==")
+    print(f"import total de index.py:            {total / 1000:8.1f} ms")
+    print(f"código de módulo de index.py:        {index_self / 1000:8.1f} ms")
+    print()
+    print(f"{'import directo del handler':40s} {'acumulado (ms)':>15s} {'%':>6s}")
+    for name, cumulative in sorted(direct.items(), key=lambda item: -item[1])[:top]:
+        print(f"{name:40s} {cumulative / 1000:15.1f} {100 * cumulative / total:6.1f}")
+    print()
+    print(f"{'módulo (tiempo propio)':40s} {'propio (ms)':>15s}")
+    for name, self_us in sorted(own.items(), key=lambda item: -item[1])[:top]:
+        print(f"{name:40s} {self_us / 1000:15.1f}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("lambdas", nargs="*", default=list(LAMBDAS), help="Lambdas en apps/ (por defecto ambos)")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--env", action="append", default=[], help="variable KEY=VALUE para el import (repetible)")
+    args = parser.parse_args()
+
+    env = {**os.environ, "AWS_REGION": os.environ.get("AWS_REGION", "us-east-1")}
+    env.update(item.split("=", 1) for item in args.env)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+
+    for lambda_name in args.lambdas:
+        report(lambda_name, max(1, args.runs), args.top, env)
+
+
+if __name__ == "__main__":
+    main()
@@ -57,9 +57,16 @@ locals {
     DB_PASSWORD = var.master_password
   }
 
+  lambda_embeddings_function_name = "rag_lmbd_embeddings-${var.environment}"
+
   # Merged environment variables for each lambda
   lambda_embeddings_env = merge(
     local.base_db_env_vars,
+    {
+      # Fan-out de PDFs grandes: los shards son invocaciones sincrónicas de este mismo Lambda
+      SHARD_EXECUTOR      = "lambda"
+      SHARD_FUNCTION_NAME = local.lambda_embeddings_function_name
+    },
     var.lambda_embeddings_env_vars
   )
 
@@ -200,7 +207,7 @@ module "aurora" {
 module "lambda_embeddings" {
   source = "./modules/lambda"
 
-  function_name = "rag_lmbd_embeddings-${var.environment}"
+  function_name = local.lambda_embeddings_function_name
   description   = "Processes PDF documents, generates embeddings and stores in PostgreSQL"
   handler       = "index.handler"
   runtime       = "python3.12"
@@ -251,9 +258,22 @@ module "lambda_embeddings" {
       effect = "Allow"
       actions = [
         "textract:StartDocumentTextDetection",
-        "textract:GetDocumentTextDetection"
+        "textract:GetDocumentTextDetection",
+        # OCR por página de las páginas escaneadas (modo híbrido)
+        "textract:DetectDocumentText"
       ]
       resources = ["*"]
+    },
+    {
+      # Shards del fan-out (y continuaciones, si se habilitan): el Lambda se invoca a sí mismo
+      effect = "Allow"
+      actions = [
+        "lambda:InvokeFunction"
+      ]
+      resources = [
+        "arn:aws:lambda:${var.region}:${data.aws_caller_identity.current.account_id}:function:${local.lambda_embeddings_function_name}",
+        "arn:aws:lambda:${var.region}:${data.aws_caller_identity.current.account_id}:function:${local.lambda_embeddings_function_name}:*"
+      ]
     }
   ]
 